@@ -0,0 +1,160 @@
+"""
+Admission control before a browser launch: checks the memory and PID headroom of
+the container's cgroup (v2 or v1) and defers runs while it is too low, so that a
+busy container queues work instead of crashing browsers at mem_limit / pids_limit.
+"""
+import logging
+import os
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+# Limits at or above this are treated as "no limit" (cgroup v1 reports a huge number)
+UNLIMITED = 2 ** 60
+
+MEMORY_HEADROOM = Gauge(
+    'container_memory_headroom_bytes',
+    'Memory left below the cgroup limit (working set, without reclaimable page cache)'
+)
+PIDS_HEADROOM = Gauge(
+    'container_pids_headroom',
+    'Processes/threads left below the cgroup pids limit'
+)
+ADMISSION_DEFERRED = Counter(
+    'transaction_admission_deferred_total',
+    'Runs deferred before browser launch because of low headroom, by pressure (memory, pids)',
+    ['usecase', 'reason']
+)
+ADMISSION_REJECTED = Counter(
+    'transaction_admission_rejected_total',
+    'Runs skipped because headroom stayed too low for the whole admission wait',
+    ['usecase', 'reason']
+)
+
+# Seconds each thread has spent deferred in admit(), see admission_wait()
+_deferred = threading.local()
+
+
+def admission_wait() -> float:
+    """Total seconds the calling thread has spent deferred in AdmissionController.admit()"""
+    return getattr(_deferred, 'seconds', 0.0)
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_int(path: str) -> int | None:
+    value = _read(path)
+    if value is None or value == 'max':
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    return number if number < UNLIMITED else None
+
+
+def _inactive_file(stat_path: str, key: str) -> int:
+    """Reclaimable page cache from memory.stat, subtracted like the kubelet's working set"""
+    stat = _read(stat_path) or ''
+    for line in stat.splitlines():
+        name, _, value = line.partition(' ')
+        if name == key:
+            return int(value)
+    return 0
+
+
+def memory_headroom(root: str = CGROUP_ROOT) -> int | None:
+    """Bytes left below the memory limit, or None if the cgroup has no limit"""
+    limit = _read_int(os.path.join(root, 'memory.max'))
+    if limit is not None:
+        usage = _read_int(os.path.join(root, 'memory.current')) or 0
+        usage -= _inactive_file(os.path.join(root, 'memory.stat'), 'inactive_file')
+        return limit - max(usage, 0)
+    # cgroup v1
+    limit = _read_int(os.path.join(root, 'memory', 'memory.limit_in_bytes'))
+    if limit is not None:
+        usage = _read_int(os.path.join(root, 'memory', 'memory.usage_in_bytes')) or 0
+        usage -= _inactive_file(os.path.join(root, 'memory', 'memory.stat'), 'total_inactive_file')
+        return limit - max(usage, 0)
+    return None
+
+
+def pids_headroom(root: str = CGROUP_ROOT) -> int | None:
+    """Tasks left below the pids limit, or None if the cgroup has no limit"""
+    for directory in (root, os.path.join(root, 'pids')):
+        limit = _read_int(os.path.join(directory, 'pids.max'))
+        if limit is not None:
+            return limit - (_read_int(os.path.join(directory, 'pids.current')) or 0)
+    return None
+
+
+class AdmissionController:
+    """
+    Admits a run once the cgroup has at least 'min_memory_bytes' and 'min_pids' of
+    headroom. While it hasn't, the run is deferred and re-checked every 'poll' seconds,
+    for at most 'max_wait' seconds. A deferred run gives up as soon as 'shutdown' is set.
+    """
+
+    def __init__(self, min_memory_bytes: int, min_pids: int, max_wait: float = 120,
+                 poll: float = 5, root: str = CGROUP_ROOT,
+                 shutdown: threading.Event | None = None) -> None:
+        self.min_memory_bytes = min_memory_bytes
+        self.min_pids = min_pids
+        self.max_wait = max_wait
+        self.poll = poll
+        self.root = root
+        self.shutdown = shutdown or threading.Event()
+
+    def pressure(self) -> str | None:
+        """'memory' or 'pids' if that headroom is below its minimum, else None"""
+        headroom: dict[str, int | None] = {
+            'memory': memory_headroom(self.root),
+            'pids': pids_headroom(self.root),
+        }
+        if headroom['memory'] is not None:
+            MEMORY_HEADROOM.set(headroom['memory'])
+        if headroom['pids'] is not None:
+            PIDS_HEADROOM.set(headroom['pids'])
+        if headroom['memory'] is not None and headroom['memory'] < self.min_memory_bytes:
+            return 'memory'
+        if headroom['pids'] is not None and headroom['pids'] < self.min_pids:
+            return 'pids'
+        return None
+
+    def admit(self, usecase: str) -> bool:
+        """Waits until there is enough headroom; False if it didn't come within max_wait or a shutdown began"""
+        reason = self.pressure()
+        if reason is None:
+            return True
+        ADMISSION_DEFERRED.labels(usecase=usecase, reason=reason).inc()
+        logger.warning(f"[{usecase}] Low {reason} headroom, deferring browser launch")
+        started = time.monotonic()
+        try:
+            return self._wait_for_headroom(usecase, reason, started + self.max_wait)
+        finally:
+            _deferred.seconds = admission_wait() + time.monotonic() - started
+
+    def _wait_for_headroom(self, usecase: str, reason: str, deadline: float) -> bool:
+        while time.monotonic() < deadline:
+            if self.shutdown.wait(self.poll):
+                logger.info(f"[{usecase}] Shutting down, deferred run not started")
+                return False
+            current = self.pressure()
+            if current is None:
+                logger.info(f"[{usecase}] Headroom recovered, starting run")
+                return True
+            reason = current
+        ADMISSION_REJECTED.labels(usecase=usecase, reason=reason).inc()
+        logger.error(f"[{usecase}] {reason.capitalize()} headroom still too low after {self.max_wait:.0f}s, "
+                     f"skipping run")
+        return False
@@ -0,0 +1,180 @@
+"""
+Rolling baseline and anomaly score per usecase and step.
+
+Durations are compared in log space, so a score means the same for a 0.5s page load
+and a 20s login: how many standard deviations the step was off its expected duration.
+The expectation is an EWMA level plus an offset for the hour of the week, which learns
+that logins on Monday 9am are slower than on Sunday night. Outliers are clipped before
+they update the baseline, so a slow run doesn't become the new normal.
+
+A lasting shift (new release, provider moved data centers) is found by a two-sided
+CUSUM on the scores. The level then jumps to the new value instead of scoring every
+run as an anomaly until the EWMA catches up, and the change is counted.
+"""
+import logging
+import math
+import statistics
+import threading
+from datetime import datetime
+from typing import Any
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_SCORE = Gauge(
+    'transaction_step_anomaly_score',
+    'Deviation of the last step duration from its baseline in standard deviations (log scale)',
+    ['usecase', 'step']
+)
+EXPECTED_DURATION = Gauge(
+    'transaction_step_expected_seconds',
+    'Expected step duration for the current hour of the week',
+    ['usecase', 'step']
+)
+CHANGE_POINTS = Counter(
+    'transaction_step_change_points_total',
+    'Lasting shifts of a step duration (direction up or down)',
+    ['usecase', 'step', 'direction']
+)
+
+# Durations below this are treated as equal (log of 0 is undefined)
+MIN_DURATION = 0.001
+# Floor for the standard deviation in log space, ~5%: very stable steps don't score every jitter
+MIN_STD = 0.05
+# Residuals are clipped to this many standard deviations before updating the baseline
+CLIP = 3.0
+# CUSUM slack in standard deviations: drift below it never accumulates
+CUSUM_SLACK = 0.5
+# Samples an hour-of-week bucket needs before its offset is used
+SEASONAL_MIN_SAMPLES = 3
+
+
+def hour_of_week(timestamp: float) -> int:
+    """0 = Monday 00:00-00:59 local time, 167 = Sunday 23:00-23:59"""
+    moment = datetime.fromtimestamp(timestamp)
+    return moment.weekday() * 24 + moment.hour
+
+
+def _clip(value: float, limit: float) -> float:
+    return max(-limit, min(limit, value))
+
+
+class BaselineEngine:
+    """
+    Baselines of all steps. The state per step is a plain dict (see export()), so it can
+    be stored as JSON and restored after a restart: seasonal offsets take weeks to learn.
+    """
+
+    def __init__(self, alpha: float = 0.05, min_samples: int = 12, threshold: float = 8.0) -> None:
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._steps: dict[tuple[str, str], dict[str, Any]] = {}
+        self._changed: set[tuple[str, str]] = set()
+
+    def observe(self, usecase: str, step: str, duration: float,
+                timestamp: float | None = None) -> float | None:
+        """
+        Scores a successful step and updates its baseline. Returns the anomaly score,
+        None while the step has fewer than 'min_samples' durations.
+        """
+        if timestamp is None:
+            timestamp = datetime.now().timestamp()
+        value = math.log(max(duration, MIN_DURATION))
+        bucket = str(hour_of_week(timestamp))
+        with self._lock:
+            self._changed.add((usecase, step))
+            state = self._steps.get((usecase, step))
+            if state is None:
+                self._steps[usecase, step] = {'n': 1, 'level': value, 'var': 0.0, 'pos': 0.0, 'neg': 0.0,
+                                              'seasonal': {bucket: [1, 0.0, [0.0]]}, 'changed': None}
+                return None
+            # [samples, offset, deviations from the level until the offset is set]
+            seasonal = state['seasonal'].setdefault(bucket, [0, 0.0, []])
+            learning = seasonal[0] < SEASONAL_MIN_SAMPLES
+            offset = 0.0 if learning else seasonal[1]
+            expected = state['level'] + offset
+            std = max(math.sqrt(state['var']), MIN_STD)
+            residual = value - expected
+            score: float = residual / std
+            warm = state['n'] >= self.min_samples
+            state['n'] += 1
+            seasonal[0] += 1
+            if learning:
+                # Median of the first deviations: clipping would hide the offset, a mean would take in spikes
+                seasonal[2].append(residual)
+                if seasonal[0] == SEASONAL_MIN_SAMPLES:
+                    seasonal[1] = statistics.median(seasonal[2])
+                    seasonal[2] = []
+            if warm:
+                residual = _clip(residual, CLIP * std)
+            if warm and not learning:
+                # Clipped, so a single spike can't pass for a shift
+                bounded = _clip(score, CLIP)
+                state['pos'] = max(0.0, state['pos'] + bounded - CUSUM_SLACK)
+                state['neg'] = max(0.0, state['neg'] - bounded - CUSUM_SLACK)
+                if max(state['pos'], state['neg']) > self.threshold:
+                    # The new level starts from this run, variance and offsets stay
+                    self._change_point(usecase, step, state, value - offset, timestamp)
+                    residual = 0.0
+            # Plain averages until the weights are settled, then exponential
+            alpha = max(self.alpha, 1 / state['n'])
+            state['level'] += alpha * residual
+            state['var'] = (1 - alpha) * (state['var'] + alpha * residual * residual)
+            if not learning:
+                # A bucket only gets the runs of one hour a week, it averages plainly for longer
+                seasonal[1] += max(self.alpha, 1 / seasonal[0]) * residual
+            if not warm:
+                return None
+        ANOMALY_SCORE.labels(usecase=usecase, step=step).set(score)
+        EXPECTED_DURATION.labels(usecase=usecase, step=step).set(math.exp(expected))
+        return score
+
+    def _change_point(self, usecase: str, step: str, state: dict[str, Any], level: float,
+                      timestamp: float) -> None:
+        direction = 'up' if state['pos'] > state['neg'] else 'down'
+        logger.warning(f"[{usecase}] Step '{step}' duration shifted {direction}: "
+                       f"{math.exp(state['level']):.2f}s -> {math.exp(level):.2f}s")
+        CHANGE_POINTS.labels(usecase=usecase, step=step, direction=direction).inc()
+        state['level'] = level
+        state['pos'] = state['neg'] = 0.0
+        state['changed'] = timestamp
+
+    def expected(self, usecase: str, step: str, timestamp: float | None = None) -> float | None:
+        """
+        Expected duration in seconds at 'timestamp' (default now), None while the step has
+        fewer than 'min_samples' durations (not scored yet)
+        """
+        if timestamp is None:
+            timestamp = datetime.now().timestamp()
+        with self._lock:
+            state = self._steps.get((usecase, step))
+            if state is None or state['n'] < self.min_samples:
+                return None
+            seasonal = state['seasonal'].get(str(hour_of_week(timestamp)), [0, 0.0, []])
+            offset = seasonal[1] if seasonal[0] >= SEASONAL_MIN_SAMPLES else 0.0
+            return math.exp(state['level'] + offset)
+
+    def export(self, changed_only: bool = False) -> dict[tuple[str, str], dict[str, Any]]:
+        """
+        Copy of the state per (usecase, step). changed_only=True returns the steps
+        observed since the last such call, for saving them incrementally.
+        """
+        with self._lock:
+            keys = self._changed if changed_only else set(self._steps)
+            states = {key: {**self._steps[key], 'seasonal': {bucket: [entry[0], entry[1], list(entry[2])] for bucket, entry
+                                                             in self._steps[key]['seasonal'].items()}}
+                      for key in keys}
+            if changed_only:
+                self._changed = set()
+        return states
+
+    def restore(self, states: dict[tuple[str, str], dict[str, Any]]) -> None:
+        """Loads state saved by a previous process (see export())"""
+        with self._lock:
+            for key, state in states.items():
+                if {'n', 'level', 'var', 'pos', 'neg', 'seasonal'} <= set(state):
+                    self._steps[key] = {**state, 'seasonal': {str(bucket): list(entry) for bucket, entry
+                                                              in state['seasonal'].items()}}
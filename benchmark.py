@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the monitor's own overhead per run: browser startup, measure_step(),
+metric label updates, /metrics scrapes with thousands of series, artifact writes,
+transaction imports in PythonRunner and dispatcher latency. Browser benchmarks load
+a page of the local stand-in (standin_server.py) and are skipped without Chromium.
+
+Results are compared with a baseline JSON file. A benchmark whose median is more
+than 'threshold' slower than its baseline counts as a regression (exit code 1).
+
+Usage:
+    python benchmark.py --save-baseline            # measure and store the baseline
+    python benchmark.py                            # measure and compare
+    python benchmark.py --only measure_step,metrics_scrape --threshold 0.3
+"""
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from prometheus_client import CollectorRegistry, Gauge, generate_latest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 0.2
+# Transaction imported by the module_import benchmark
+IMPORT_FILE = Path(__file__).parent / 'transactions' / 'hidrive-next' / 'picture_test.py'
+
+
+class BenchmarkUnavailableError(Exception):
+    """Raised by a benchmark that can't run here (e.g. no browser installed)"""
+
+
+class BenchEnvironment:
+    """Scratch directory and, on first use, the stand-in server for browser benchmarks"""
+
+    def __init__(self) -> None:
+        self.workdir = Path(tempfile.mkdtemp(prefix='monitor-bench-'))
+        self._servers: dict[str, Any] | None = None
+
+    def page_url(self) -> str:
+        from standin_server import start_standin_servers
+        if self._servers is None:
+            self._servers = start_standin_servers(port=0)
+        return f"http://127.0.0.1:{self._servers['ionos-managed-nextcloud'].server_port}/apps/files/"
+
+    def close(self) -> None:
+        for server in (self._servers or {}).values():
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def _monitor(env: BenchEnvironment, usecase: str) -> Any:
+    from monitor_base import MonitorBase
+
+    class BenchMonitor(MonitorBase):
+        def run(self) -> None:
+            pass
+
+    monitor = BenchMonitor(usecase_name=usecase)
+    monitor.screenshots_dir = env.workdir
+    return monitor
+
+
+def _browser_monitor(env: BenchEnvironment, usecase: str) -> Any:
+    """Monitor with a started browser on the stand-in page"""
+    monitor = _monitor(env, usecase)
+    try:
+        monitor.setup()
+    except Exception as e:
+        monitor.teardown()
+        raise BenchmarkUnavailableError(f"browser not available: {str(e).splitlines()[0]}") from e
+    monitor.page.goto(env.page_url())
+    return monitor
+
+
+def bench_browser_startup(env: BenchEnvironment, rounds: int) -> list[float]:
+    """Playwright start, Chromium launch, first page load and teardown"""
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        monitor = _browser_monitor(env, 'bench_browser_startup')
+        monitor.teardown()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_measure_step(env: BenchEnvironment, rounds: int) -> list[float]:
+    """Bookkeeping of measure_step() around an empty action"""
+    monitor = _monitor(env, 'bench_measure_step')
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        monitor.measure_step("01_Bench", lambda: None)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_metric_labels(env: BenchEnvironment, rounds: int) -> list[float]:
+    """One labels().set() on a gauge shaped like transaction_duration_seconds"""
+    gauge = Gauge('bench_duration_seconds', 'Benchmark gauge', ['usecase', 'step'], registry=CollectorRegistry())
+    samples = []
+    for i in range(rounds):
+        usecase, step = f"usecase_{i % 50}", f"{i % 20:02d}_Step"
+        started = time.perf_counter()
+        gauge.labels(usecase=usecase, step=step).set(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_metrics_scrape(env: BenchEnvironment, rounds: int, series: int = 5000) -> list[float]:
+    """Text exposition of a registry with 'series' step series, as served on /metrics"""
+    registry = CollectorRegistry()
+    gauge = Gauge('bench_duration_seconds', 'Benchmark gauge', ['usecase', 'step'], registry=registry)
+    for i in range(series):
+        gauge.labels(usecase=f"usecase_{i // 50}", step=f"{i % 50:02d}_Step").set(i)
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_latest(registry)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_error_stack_write(env: BenchEnvironment, rounds: int) -> list[float]:
+    """Error stack file written for a failed step"""
+    monitor = _monitor(env, 'bench_error_stack_write')
+    samples = []
+    for _ in range(rounds):
+        try:
+            raise RuntimeError("benchmark")
+        except RuntimeError as exc:
+            started = time.perf_counter()
+            monitor._save_error_stack("01_Bench", "step_failure", exc)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_artifact_capture(env: BenchEnvironment, rounds: int) -> list[float]:
+    """Screenshot and page HTML of a failed step, captured from the stand-in page"""
+    monitor = _browser_monitor(env, 'bench_artifact_capture')
+    samples = []
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            monitor._take_screenshot("01_Bench", "step_failure")
+            monitor._save_page_html("01_Bench", "step_failure")
+            samples.append(time.perf_counter() - started)
+    finally:
+        monitor.teardown()
+    return samples
+
+
+def bench_module_import(env: BenchEnvironment, rounds: int) -> list[float]:
+    """PythonRunner importing a transaction file and instantiating its monitor"""
+    from runners.python_runner import PythonRunner
+    runner = PythonRunner()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        runner._load_monitors(str(IMPORT_FILE), 'bench_module_import')
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_dispatch_latency(env: BenchEnvironment, rounds: int) -> list[float]:
+    """Time from PriorityDispatcher.submit() until a worker starts the run"""
+    from scheduling import PriorityDispatcher
+    dispatcher = PriorityDispatcher(workers=1)
+    dispatcher.start()
+    samples = []
+    try:
+        for _ in range(rounds):
+            started_run = threading.Event()
+            times: dict[str, float] = {}
+
+            def run(times: dict[str, float] = times, started_run: threading.Event = started_run) -> None:
+                times['started'] = time.perf_counter()
+                started_run.set()
+
+            times['submitted'] = time.perf_counter()
+            dispatcher.submit('bench', 'bench_dispatch_latency', run)
+            if not started_run.wait(5):
+                raise RuntimeError("dispatcher did not start the run within 5s")
+            samples.append(times['started'] - times['submitted'])
+            # Let the worker finish the run before the next submit
+            while dispatcher.state('bench'):
+                time.sleep(0.0001)
+    finally:
+        dispatcher.stop(timeout=5)
+    return samples
+
+
+# name -> (function, default rounds)
+BENCHMARKS: dict[str, tuple[Callable[[BenchEnvironment, int], list[float]], int]] = {
+    'browser_startup': (bench_browser_startup, 5),
+    'measure_step': (bench_measure_step, 2000),
+    'metric_labels': (bench_metric_labels, 5000),
+    'metrics_scrape': (bench_metrics_scrape, 50),
+    'error_stack_write': (bench_error_stack_write, 200),
+    'artifact_capture': (bench_artifact_capture, 10),
+    'module_import': (bench_module_import, 50),
+    'dispatch_latency': (bench_dispatch_latency, 200),
+}
+
+
+def summarize(samples: list[float]) -> dict[str, Any]:
+    """Median, p95, min and max of the samples in seconds"""
+    ordered = sorted(samples)
+    return {
+        'rounds': len(ordered),
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'min': ordered[0],
+        'max': ordered[-1],
+    }
+
+
+def run_benchmarks(names: list[str], rounds: int | None = None) -> dict[str, Any]:
+    """Runs the benchmarks by name; skipped ones get {'skipped': reason}"""
+    env = BenchEnvironment()
+    results: dict[str, Any] = {}
+    try:
+        for name in names:
+            func, default_rounds = BENCHMARKS[name]
+            try:
+                results[name] = summarize(func(env, rounds or default_rounds))
+            except BenchmarkUnavailableError as e:
+                results[name] = {'skipped': str(e)}
+                logger.warning(f"{name}: skipped ({e})")
+                continue
+            logger.info(f"{name}: median {results[name]['median'] * 1000:.3f}ms, "
+                        f"p95 {results[name]['p95'] * 1000:.3f}ms ({results[name]['rounds']} rounds)")
+    finally:
+        env.close()
+    return results
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Regression messages for benchmarks whose median grew by more than 'threshold'"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if 'median' not in result or not reference or not reference.get('median'):
+            continue
+        change = result['median'] / reference['median'] - 1
+        if change > threshold:
+            regressions.append(f"{name}: median {result['median'] * 1000:.3f}ms vs. baseline "
+                               f"{reference['median'] * 1000:.3f}ms (+{change:.0%}, threshold {threshold:.0%})")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks for the monitor's own overhead")
+    parser.add_argument('--only', default='',
+                        help=f"Comma-separated benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--rounds', type=int, default=None,
+                        help='Rounds per benchmark (default: per benchmark)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help=f'Baseline JSON file (default: {DEFAULT_BASELINE})')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Allowed slowdown of the median before failing (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.only.split(',') if name.strip()] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        logger.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+        return 2
+
+    results = run_benchmarks(names, args.rounds)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        # Skipped benchmarks keep their previous baseline
+        baseline.update({name: result for name, result in results.items() if 'median' in result})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        logger.info(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        logger.warning(f"No baseline at {args.baseline}, run with --save-baseline first")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for message in regressions:
+        logger.error(f"REGRESSION {message}")
+    if not regressions:
+        logger.info(f"No regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Per-round log lines of the benchmarked code would dominate the output (and the timings)
+    for name in ('monitor_base', 'runners.python_runner', 'har_replay'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    sys.exit(main())
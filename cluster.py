@@ -0,0 +1,158 @@
+"""
+Multi-node coordination: several monitor instances share a SQLite database (on a
+shared volume) to divide the jobs between them. Every node heartbeats into the
+'nodes' table; a job belongs to the live node with the highest rendezvous hash, so
+a dead node's jobs move to the remaining nodes once its heartbeat is older than
+'node_timeout'. A short lease per job guards against double runs while nodes join
+or leave.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+
+from prometheus_client import REGISTRY, Gauge
+from prometheus_client.registry import CollectorRegistry
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_NODES = Gauge(
+    'cluster_live_nodes',
+    'Number of monitor instances with a recent heartbeat'
+)
+CLUSTER_OWNED_JOBS = Gauge(
+    'cluster_owned_jobs',
+    'Number of jobs currently assigned to this instance'
+)
+
+
+def rendezvous_owner(job_id: str, nodes: Iterable[str]) -> str | None:
+    """Highest-random-weight hashing: only jobs of a node that leaves or joins move"""
+    def weight(node: str) -> str:
+        return hashlib.sha1(f"{node}:{job_id}".encode()).hexdigest()
+    return max(nodes, key=weight, default=None)
+
+
+class Cluster:
+    """Heartbeats, job ownership and leases for one monitor instance"""
+
+    def __init__(self, path: str, instance: str, node_timeout: float = 60) -> None:
+        self.path = path
+        self.instance = instance
+        self.node_timeout = node_timeout
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._nodes: list[str] = [instance]
+        self._job_ids: list[str] = []
+        # Autocommit mode, transactions are opened explicitly for lease claims
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS nodes (node_id TEXT PRIMARY KEY, heartbeat REAL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS leases (job_id TEXT PRIMARY KEY, owner TEXT, expires REAL)')
+
+    def start(self) -> None:
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._loop, name="cluster-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops heartbeating and leaves the cluster so other nodes take over right away"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            with self._lock:
+                self._conn.execute('DELETE FROM nodes WHERE node_id = ?', (self.instance,))
+                self._conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not leave cluster cleanly: {e}")
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.node_timeout / 3):
+            self.heartbeat()
+
+    def register_jobs(self, job_ids: Iterable[str]) -> None:
+        """Job ids known to this instance, used for the cluster_owned_jobs metric"""
+        self._job_ids = list(job_ids)
+        CLUSTER_OWNED_JOBS.set(sum(1 for job_id in self._job_ids if self.owns(job_id)))
+
+    def heartbeat(self) -> None:
+        """Refreshes this node's heartbeat and the list of live nodes"""
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute('INSERT OR REPLACE INTO nodes (node_id, heartbeat) VALUES (?, ?)',
+                                   (self.instance, now))
+                rows = self._conn.execute('SELECT node_id FROM nodes WHERE heartbeat >= ?',
+                                          (now - self.node_timeout,)).fetchall()
+        except sqlite3.Error as e:
+            # Keep the last known membership, a short outage of the shared volume shouldn't stop monitoring
+            logger.warning(f"Cluster heartbeat failed: {e}")
+            return
+        nodes = sorted({row[0] for row in rows} | {self.instance})
+        if nodes != self._nodes:
+            logger.info(f"Cluster membership changed: {', '.join(nodes)}")
+        self._nodes = nodes
+        CLUSTER_NODES.set(len(nodes))
+        CLUSTER_OWNED_JOBS.set(sum(1 for job_id in self._job_ids if self.owns(job_id)))
+
+    def live_nodes(self) -> list[str]:
+        return list(self._nodes)
+
+    def owns(self, job_id: str) -> bool:
+        return rendezvous_owner(job_id, self._nodes) == self.instance
+
+    def claim(self, job_id: str, ttl: float) -> bool:
+        """
+        True if this node should run the job now: it owns the job and holds its lease
+        for the next 'ttl' seconds. A lease still held by another node (e.g. the previous
+        owner right after a membership change) blocks the run.
+        """
+        if not self.owns(job_id):
+            return False
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    row = self._conn.execute('SELECT owner, expires FROM leases WHERE job_id = ?',
+                                             (job_id,)).fetchone()
+                    if row and row[0] != self.instance and row[1] > now:
+                        self._conn.execute('ROLLBACK')
+                        logger.info(f"[{job_id}] Lease held by {row[0]}, skipping run")
+                        return False
+                    self._conn.execute('INSERT OR REPLACE INTO leases (job_id, owner, expires) VALUES (?, ?, ?)',
+                                       (job_id, self.instance, now + ttl))
+                    self._conn.execute('COMMIT')
+                except sqlite3.Error:
+                    self._conn.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as e:
+            # Prefer a possible double run over not monitoring at all
+            logger.warning(f"[{job_id}] Lease claim failed, running anyway: {e}")
+        return True
+
+
+class InstanceLabelCollector:
+    """Re-exports all metrics of a registry with an additional 'instance' label"""
+
+    def __init__(self, instance: str, registry: CollectorRegistry = REGISTRY) -> None:
+        self.instance = instance
+        self.registry = registry
+
+    def collect(self):
+        for metric in self.registry.collect():
+            metric.samples = [sample._replace(labels={**sample.labels, 'instance': self.instance})
+                              for sample in metric.samples]
+            yield metric
+
+
+def instance_registry(instance: str) -> CollectorRegistry:
+    """Registry for start_http_server() that labels every metric with the instance id"""
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(InstanceLabelCollector(instance))
+    return registry
@@ -12,10 +12,24 @@ chmod +x /app/cleanup_processes.sh 2>/dev/null || true
   done
 ) &
 
+# Forward SIGTERM/SIGINT (docker stop) to main.py so it can drain in-flight runs, then exit
+MAIN_PID=""
+shutdown() {
+  echo "[$(date)] Stop signal received, waiting for main.py to drain..."
+  if [ -n "$MAIN_PID" ]; then
+    kill -TERM "$MAIN_PID" 2>/dev/null
+    wait "$MAIN_PID"
+  fi
+  exit 0
+}
+trap shutdown TERM INT
+
 # Start main application with auto-restart on crash
 while true; do
   echo "[$(date)] Starting main.py..."
-  python main.py
+  python main.py &
+  MAIN_PID=$!
+  wait "$MAIN_PID"
   EXIT_CODE=$?
   echo "[$(date)] main.py exited with code $EXIT_CODE. Restarting in 10 seconds..."
   sleep 10
@@ -0,0 +1,126 @@
+"""
+HAR record-and-replay for regression runs without provider-side noise.
+
+'record' lets Playwright write every response of a run to har/<usecase>.har.
+'replay' serves the run from that file. Playwright's route_from_har() answers
+immediately, so HarReplay routes the requests itself and holds each response for its
+recorded time. Runs against the replay keep the original network profile.
+"""
+import base64
+import json
+import logging
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+HAR_MODES = ('off', 'record', 'replay')
+
+HAR_REPLAY_MISSES = Counter(
+    'har_replay_misses_total',
+    'Requests of a replayed run without a recorded response (aborted)',
+    ['usecase']
+)
+
+# Set by the browser from the response body, not valid for the decoded replay body
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+def har_path(har_dir: str, usecase: str) -> Path:
+    return Path(har_dir) / f"{usecase}.har"
+
+
+def _without_query(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+
+
+def response_time_ms(entry: dict[str, Any]) -> float:
+    """
+    Recorded time of an entry without 'blocked' (queueing in the browser, which the
+    replaying browser does itself). Falls back to the entry's total time.
+    """
+    timings = entry.get('timings') or {}
+    phases = [timings.get(phase, -1) for phase in ('dns', 'connect', 'send', 'wait', 'receive')]
+    if any(value >= 0 for value in phases):
+        # 'ssl' is already part of 'connect'
+        return float(sum(value for value in phases if value > 0))
+    return float(max(entry.get('time', 0), 0))
+
+
+class HarReplay:
+    """
+    Responses of one HAR file, matched by method and URL. Repeated requests get the
+    recorded responses in order (the last one repeats), so a listing fetched before and
+    after creating a file is replayed the same way. URLs that only differ in the query
+    string (cache busters) fall back to the first recording of the path.
+    """
+
+    def __init__(self, path: Path, usecase: str, time_scale: float = 1.0) -> None:
+        self.path = path
+        self.usecase = usecase
+        self.time_scale = time_scale
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)['log']['entries']
+        self._exact: dict[tuple[str, str], deque[dict[str, Any]]] = defaultdict(deque)
+        self._by_path: dict[tuple[str, str], dict[str, Any]] = {}
+        for entry in entries:
+            request = entry['request']
+            self._exact[(request['method'], request['url'])].append(entry)
+            self._by_path.setdefault((request['method'], _without_query(request['url'])), entry)
+        logger.info(f"[{usecase}] Replaying {len(entries)} recorded responses from {path}")
+
+    def lookup(self, method: str, url: str) -> dict[str, Any] | None:
+        recorded = self._exact.get((method, url))
+        if recorded:
+            return recorded.popleft() if len(recorded) > 1 else recorded[0]
+        return self._by_path.get((method, _without_query(url)))
+
+    def attach(self, context: Any) -> None:
+        """Routes all requests of the context (pages opened later included) through the replay"""
+        context.route('**/*', self.fulfill)
+
+    def fulfill(self, route: Any) -> None:
+        request = route.request
+        entry = self.lookup(request.method, request.url)
+        if entry is None:
+            HAR_REPLAY_MISSES.labels(usecase=self.usecase).inc()
+            logger.debug(f"[{self.usecase}] No recorded response for {request.method} {request.url}")
+            route.abort()
+            return
+        delay_ms = response_time_ms(entry) * self.time_scale
+        try:
+            page = request.frame.page
+        except Exception:
+            # Service worker requests have no frame, they are answered without delay
+            page = None
+        try:
+            if delay_ms > 0 and page is not None:
+                # Every route handler runs in its own greenlet, waiting here doesn't hold back
+                # the other requests (time.sleep() would)
+                page.wait_for_timeout(delay_ms)
+            route.fulfill(**self.response(entry))
+        except Exception as e:
+            # Page closed while the response was held back
+            logger.debug(f"[{self.usecase}] Replay of {request.url} dropped: {e}")
+
+    @staticmethod
+    def response(entry: dict[str, Any]) -> dict[str, Any]:
+        """route.fulfill() arguments of a HAR entry"""
+        response = entry['response']
+        content = response.get('content') or {}
+        text = content.get('text') or ''
+        body = base64.b64decode(text) if content.get('encoding') == 'base64' else text.encode('utf-8')
+        headers: dict[str, str] = {}
+        for header in response.get('headers', []):
+            name = header['name'].lower()
+            if name in _DROPPED_HEADERS:
+                continue
+            # Repeated headers are joined, Set-Cookie with newlines as Playwright expects
+            separator = '\n' if name == 'set-cookie' else ', '
+            headers[name] = f"{headers[name]}{separator}{header['value']}" if name in headers else header['value']
+        return {'status': response['status'], 'headers': headers, 'body': body}
@@ -1,17 +1,69 @@
 import os
 import time
 import glob
+import random
+import signal
+import socket
 import logging
-from typing import Optional
+from typing import Any
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.executors.pool import ThreadPoolExecutor
-from prometheus_client import start_http_server
+from prometheus_client import REGISTRY
+from cluster import Cluster, instance_registry
+from trigger_api import RunRegistry, TriggerApp, start_api_server
 from runners.python_runner import PythonRunner
+from admission import AdmissionController
+from monitor_base import (CACHE_MODES, DEFAULT_CACHE_MODES, HAR_MODE, SLO_TRACKER, STEP_BASELINES,
+                          abort_active_runs, begin_shutdown, shutdown_event)
+from scheduling import (AdaptiveInterval, AdaptiveJobs, CapacityPlanner, PriorityDispatcher, RateLimiter,
+                        StateStore, CATCH_UP_POLICIES, load_schedule, merge_schedules, parse_rate_limits)
 
 # Configuration
 METRICS_PORT = int(os.getenv('PROMETHEUS_PORT', 8000))
 CHECK_INTERVAL_SECONDS = int(os.getenv('SCHEDULE_INTERVAL', 300)) # Default 5 mins
+# Journey mode: chain all transactions of a provider directory in one browser session
+JOURNEY_MODE = os.getenv('JOURNEY_MODE', 'false').lower() in ('true', '1', 'yes')
+# Adaptive scheduling: re-check failures quickly, stretch stable usecases toward MAX_INTERVAL
+ADAPTIVE_SCHEDULING = os.getenv('ADAPTIVE_SCHEDULING', 'true').lower() in ('true', '1', 'yes')
+RECHECK_INTERVAL_SECONDS = int(os.getenv('RECHECK_INTERVAL', 60))
+RECHECK_CONFIRMATIONS = int(os.getenv('RECHECK_CONFIRMATIONS', 2))
+MAX_INTERVAL_SECONDS = int(os.getenv('MAX_INTERVAL', 4 * CHECK_INTERVAL_SECONDS))
+STABLE_RUNS_BEFORE_BACKOFF = int(os.getenv('STABLE_RUNS_BEFORE_BACKOFF', 12))
+BACKOFF_FACTOR = float(os.getenv('BACKOFF_FACTOR', 1.5))
+# Browser workers pulling runs from the priority queue (1 = sequential)
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 1))
+# Capacity planning: utilization from the last CAPACITY_WINDOW runs per job, optional pool autoscaling
+CAPACITY_WINDOW = int(os.getenv('CAPACITY_WINDOW', 10))
+TARGET_UTILIZATION = float(os.getenv('TARGET_UTILIZATION', 0.7))
+AUTOSCALE_WORKERS = os.getenv('AUTOSCALE_WORKERS', 'false').lower() in ('true', '1', 'yes')
+AUTOSCALE_THRESHOLD = float(os.getenv('AUTOSCALE_THRESHOLD', 0.8))
+MIN_WORKERS = int(os.getenv('MIN_WORKERS', 1))
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', max(SCHEDULER_WORKERS, 4)))
+# Admission control: defer browser launches while cgroup headroom is below these minimums
+ADMISSION_MIN_MEMORY_MB = int(os.getenv('ADMISSION_MIN_MEMORY_MB', 400))
+ADMISSION_MIN_PIDS = int(os.getenv('ADMISSION_MIN_PIDS', 64))
+ADMISSION_MAX_WAIT = int(os.getenv('ADMISSION_MAX_WAIT', 120))
+# Default for jobs that fire while their previous run is pending: skip, once or spread
+CATCH_UP_POLICY = os.getenv('CATCH_UP_POLICY', 'once').lower()
+if CATCH_UP_POLICY not in CATCH_UP_POLICIES:
+    CATCH_UP_POLICY = 'once'
+# Max run starts per rate group (shared identity provider), e.g. "ionos-id:6/60" = 6 per minute
+RATE_LIMITS = parse_rate_limits(os.getenv('RATE_LIMITS', 'ionos-id:6/60,telekom-idm:6/60'))
+# Spread first runs randomly across their interval instead of starting all jobs at once
+START_SPREAD = os.getenv('START_SPREAD', 'true').lower() in ('true', '1', 'yes')
+# SQLite file with last run times, adaptive state, step baselines and SLO runs, so restarts resume them (empty = off)
+STATE_DB = os.getenv('STATE_DB', 'state/scheduler.db')
+# Multi-node mode: instances sharing CLUSTER_DB divide the jobs between them (empty = single node)
+CLUSTER_DB = os.getenv('CLUSTER_DB', '')
+INSTANCE_ID = os.getenv('INSTANCE_ID') or socket.gethostname()
+NODE_TIMEOUT_SECONDS = int(os.getenv('NODE_TIMEOUT', 60))
+# Seconds in-flight runs may keep running after SIGTERM before their browsers are killed
+SHUTDOWN_GRACE_SECONDS = int(os.getenv('SHUTDOWN_GRACE', 20))
+# Seconds aborted runs get to tear down and report after their browsers were killed
+ABORT_TIMEOUT_SECONDS = 10
+# Bearer token required for POST /runs (empty = no authentication)
+TRIGGER_TOKEN = os.getenv('TRIGGER_TOKEN', '')
 
 # Logging - respect DEBUG environment variable
 debug_mode = os.getenv('DEBUG', 'false').lower() in ('true', '1', 'yes')
@@ -33,43 +85,139 @@ else:
 
 logger = logging.getLogger(__name__)
 
-def load_and_schedule_usecases(scheduler: BackgroundScheduler) -> None:
+def load_and_schedule_usecases(scheduler: BackgroundScheduler,
+                               dispatcher: PriorityDispatcher | None = None,
+                               store: StateStore | None = None,
+                               cluster: Cluster | None = None) -> AdaptiveJobs:
     transactions_dir = os.path.join(os.path.dirname(__file__), 'transactions')
     logger.info(f"Scanning for transactions in {transactions_dir}")
     
-    python_runner = PythonRunner()
+    python_runner = PythonRunner(AdmissionController(
+        min_memory_bytes=ADMISSION_MIN_MEMORY_MB * 1024 * 1024,
+        min_pids=ADMISSION_MIN_PIDS,
+        max_wait=ADMISSION_MAX_WAIT,
+        shutdown=shutdown_event()
+    ))
+    policy = AdaptiveInterval(
+        recheck=RECHECK_INTERVAL_SECONDS,
+        maximum=MAX_INTERVAL_SECONDS,
+        factor=BACKOFF_FACTOR,
+        stable_runs=STABLE_RUNS_BEFORE_BACKOFF,
+        confirmations=RECHECK_CONFIRMATIONS
+    ) if ADAPTIVE_SCHEDULING else None
+    planner = CapacityPlanner(
+        dispatcher,
+        window=CAPACITY_WINDOW,
+        target=TARGET_UTILIZATION,
+        threshold=AUTOSCALE_THRESHOLD,
+        min_workers=MIN_WORKERS,
+        max_workers=MAX_WORKERS,
+        autoscale=AUTOSCALE_WORKERS
+    )
+    jobs = AdaptiveJobs(scheduler, policy, dispatcher, store, cluster, planner)
     
+    # HAR files are recorded and replayed per transaction, a journey shares one context
+    journey_mode = JOURNEY_MODE and HAR_MODE == 'off'
+    if JOURNEY_MODE and not journey_mode:
+        logger.warning(f"JOURNEY_MODE is not supported with HAR_MODE={HAR_MODE}, "
+                       f"running every transaction in its own session")
+
     # Discover Python files (Recursively)
     py_files = glob.glob(os.path.join(transactions_dir, '**', '*.py'), recursive=True)
-    for i, py_file in enumerate(py_files):
+    journeys: dict[str, list[tuple[str, str, dict[str, Any]]]] = {}
+    pending: list[dict[str, Any]] = []
+    for py_file in py_files:
         if os.path.basename(py_file).startswith('__'): 
             continue
         # Create a cleaner job ID from path relative to transactions dir
         rel_path = os.path.relpath(py_file, transactions_dir)
         # Flatten path to name: subdir/test.py -> subdir_test
         name = os.path.splitext(rel_path)[0].replace(os.sep, '_')
-        job_id = f"python_{name}"
-        # Stagger start times by 1 second to ensure sequential execution doesn't skip
-        start_time = datetime.now() + timedelta(seconds=i)
+
+        # Interval, jitter, priority, windows and catch-up from class attributes / schedule.json
+        attributes = python_runner.read_monitor_attributes(py_file)
+        schedule = load_schedule(py_file, attributes, CHECK_INTERVAL_SECONDS, CATCH_UP_POLICY)
+        # Cold and warm cache runs are separate jobs; warm runs get the "_warm" usecase suffix
+        cache_modes = attributes.get('cache_modes', DEFAULT_CACHE_MODES) if attributes is not None else ('cold',)
+        provider = os.path.dirname(rel_path).split(os.sep)[0]
         
-        scheduler.add_job(
-            python_runner.run,
-            'interval',
-            seconds=CHECK_INTERVAL_SECONDS,
-            next_run_time=start_time,
-            args=[py_file, name],
-            id=job_id,
-            replace_existing=True
+        for cache_mode in cache_modes:
+            if cache_mode not in CACHE_MODES:
+                logger.warning(f"Ignoring unknown cache mode '{cache_mode}' for {name}")
+                continue
+            if cache_mode == 'cold' and journey_mode and provider:
+                journeys.setdefault(provider, []).append((py_file, name, schedule))
+                continue
+            usecase = name if cache_mode == 'cold' else f"{name}_{cache_mode}"
+            pending.append({
+                'job_id': f"python_{usecase}",
+                'name': usecase,
+                'func': python_runner.run,
+                'args': [py_file, usecase, cache_mode],
+                'schedule': schedule,
+                'usecases': [usecase],
+            })
+
+    # One job per provider in journey mode, usecase names stay per transaction
+    for provider, entries in sorted(journeys.items()):
+        entries.sort()
+        pending.append({
+            'job_id': f"journey_{provider}",
+            'name': f"journey_{provider}",
+            'func': python_runner.run_journey,
+            'args': [provider, [(py_file, name) for py_file, name, _ in entries]],
+            'schedule': merge_schedules([schedule for _, _, schedule in entries]),
+            'usecases': [name for _, name, _ in entries],
+        })
+
+    # Most urgent jobs start first
+    pending.sort(key=lambda job: (job['schedule']['priority'], job['name']))
+    for i, job in enumerate(pending):
+        schedule = job['schedule']
+        # Stagger start times by 1 second to ensure sequential execution doesn't skip,
+        # plus a random phase within the interval so providers don't see bursts of logins
+        offset = i + (random.uniform(0, schedule['interval']) if START_SPREAD else 0)
+        start_time = datetime.now() + timedelta(seconds=offset)
+        jobs.add(
+            job['job_id'],
+            job['name'],
+            job['func'],
+            job['args'],
+            interval=schedule['interval'],
+            start_time=start_time,
+            usecases=job['usecases'],
+            jitter=schedule['jitter'],
+            active_windows=schedule['active_windows'],
+            priority=schedule['priority'],
+            deadline=schedule['deadline'],
+            catch_up=schedule['catch_up'],
+            rate_group=schedule['rate_group']
         )
-        logger.info(f"Scheduled Python Monitor: {name} (starting at {start_time})")
+        logger.info(f"Scheduled {job['name']} every {schedule['interval']}s "
+                    f"(priority {schedule['priority']}, starting at {start_time})")
+    if cluster:
+        cluster.register_jobs(job['job_id'] for job in pending)
+    return jobs
+
+def save_state(store: StateStore) -> None:
+    """Persists the step baselines and SLO buckets that changed since the last call"""
+    store.save_baselines(STEP_BASELINES.export(changed_only=True))
+    # Without SLOs (e.g. slo.json missing for a moment) the saved runs are kept
+    if SLO_TRACKER.slos:
+        store.save_slo_buckets(SLO_TRACKER.buckets(changed_only=True), time.time() - SLO_TRACKER.horizon())
+
+def _handle_sigterm(signum: int, frame: Any) -> None:
+    # Turn 'docker stop' into the same clean shutdown path as Ctrl+C
+    raise SystemExit(0)
 
 def main() -> None:
-    logger.info(f"Starting Metrics Server on port {METRICS_PORT}...")
-    start_http_server(METRICS_PORT)
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    cluster = Cluster(CLUSTER_DB, INSTANCE_ID, NODE_TIMEOUT_SECONDS) if CLUSTER_DB else None
     
-    # Configure scheduler for SEQUENTIAL execution
+    # APScheduler only queues runs; the dispatcher executes them by priority
+    dispatcher = PriorityDispatcher(workers=SCHEDULER_WORKERS, limiter=RateLimiter(RATE_LIMITS))
     executors = {
-        'default': ThreadPoolExecutor(1)  # Only 1 worker means jobs run one after another
+        'default': ThreadPoolExecutor(1)  # Triggers only enqueue, one thread is enough
     }
     job_defaults = {
         'coalesce': True,  # Combine multiple missed runs into one
@@ -78,9 +226,22 @@ def main() -> None:
     }
     
     scheduler = BackgroundScheduler(executors=executors, job_defaults=job_defaults)
-    load_and_schedule_usecases(scheduler)
+    store = StateStore(STATE_DB) if STATE_DB else None
+    if store:
+        STEP_BASELINES.restore(store.load_baselines())
+        SLO_TRACKER.restore(store.load_slo_buckets(time.time() - SLO_TRACKER.horizon()))
+    jobs = load_and_schedule_usecases(scheduler, dispatcher, store, cluster)
+
+    logger.info(f"Starting Metrics Server on port {METRICS_PORT}...")
+    # Every series carries the instance label in multi-node mode so the nodes can be told apart
+    registry = instance_registry(INSTANCE_ID) if cluster else REGISTRY
+    start_api_server(METRICS_PORT, TriggerApp(RunRegistry(jobs), registry, TRIGGER_TOKEN or None))
     
-    logger.info("Starting Scheduler (Sequential Mode)...")
+    logger.info(f"Starting Scheduler ({SCHEDULER_WORKERS} worker(s), catch-up '{CATCH_UP_POLICY}')...")
+    if cluster:
+        logger.info(f"Joining cluster as {INSTANCE_ID} ({CLUSTER_DB})")
+        cluster.start()
+    dispatcher.start()
     scheduler.start()
     
     # Keep main thread alive with periodic health check
@@ -90,6 +251,11 @@ def main() -> None:
             time.sleep(60)  # Check every minute
             current_time = time.time()
             
+            # SLO windows move on without runs; persist what changed since the last check
+            SLO_TRACKER.export()
+            if store:
+                save_state(store)
+
             # Log heartbeat every 5 minutes
             if current_time - last_heartbeat >= 300:
                 logger.info(f"Scheduler heartbeat: {scheduler.running}, active jobs: {len(scheduler.get_jobs())}")
@@ -103,7 +269,19 @@ def main() -> None:
     except (KeyboardInterrupt, SystemExit):
         logger.info("Shutdown signal received")
     finally:
-        scheduler.shutdown()
+        # Drain: no new runs, in-flight runs get SHUTDOWN_GRACE seconds, then their browsers are killed
+        scheduler.shutdown(wait=False)
+        begin_shutdown()
+        if not dispatcher.stop(timeout=SHUTDOWN_GRACE_SECONDS):
+            killed = abort_active_runs()
+            logger.warning(f"Runs still in flight after {SHUTDOWN_GRACE_SECONDS}s, aborted them "
+                           f"({killed} browser processes killed)")
+            dispatcher.stop(timeout=ABORT_TIMEOUT_SECONDS)
+        if store:
+            save_state(store)
+            store.close()
+        if cluster:
+            cluster.stop()
         logger.info("Scheduler stopped")
 
 if __name__ == "__main__":
@@ -2,11 +2,21 @@ from abc import ABC, abstractmethod
 import time
 import logging
 import os
+import shutil
+import threading
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from pathlib import Path
-from typing import Callable, Optional
-from playwright.sync_api import sync_playwright, Page, Browser
+from typing import Any, Literal
+from collections.abc import Callable, Iterator
+from playwright.sync_api import sync_playwright, Page, Browser, BrowserContext, TimeoutError as PlaywrightTimeoutError
 from prometheus_client import Gauge, Counter
+from proc_sampler import ProcessTreeSampler, child_pids, kill_process_tree, proc_available
+from har_replay import HAR_MODES, HarReplay, har_path
+from step_profiler import PROFILE_MODES, StepProfiler, matches, parse_patterns
+from slow_capture import SlowStepDetector, StepRecorder, parse_rate
+from anomaly import BaselineEngine
+from slo import SloTracker, load_slos
 
 # Configure logging based on DEBUG environment variable
 logger = logging.getLogger(__name__)
@@ -15,6 +25,66 @@ debug_mode = os.getenv('DEBUG', 'false').lower() in ('true', '1', 'yes')
 # Note: The actual log level is set in main.py/run_test.py
 # This just provides the debug_mode flag for conditional logging
 
+# Quiet window for wait_for_network_quiet() (same default as Playwright's "networkidle")
+NETWORK_IDLE_MS = int(os.getenv('NETWORK_IDLE_MS', 500))
+# Interval (seconds) for sampling the browser process tree from /proc, 0 disables it
+RESOURCE_SAMPLE_INTERVAL = float(os.getenv('RESOURCE_SAMPLE_INTERVAL', 0.5))
+# Teardown watchdog (seconds): after this the browser process tree is killed
+TEARDOWN_TIMEOUT = float(os.getenv('TEARDOWN_TIMEOUT', 30))
+
+# Step labels for the browser lifecycle phases (sorted before/after the numbered steps)
+STEP_BROWSER_LAUNCH = "00_Browser launch"
+STEP_PAGE_CREATION = "00_Page creation"
+STEP_TEARDOWN = "99_Teardown"
+LIFECYCLE_STEPS = (STEP_BROWSER_LAUNCH, STEP_PAGE_CREATION, STEP_TEARDOWN)
+
+# Cache modes: "cold" = fresh profile per run, "warm" = persistent user-data dir per usecase
+CACHE_MODES = ('cold', 'warm')
+DEFAULT_CACHE_MODES = tuple(
+    mode.strip() for mode in os.getenv('CACHE_MODES', 'cold').split(',') if mode.strip() in CACHE_MODES
+) or ('cold',)
+WARM_CACHE_DIR = os.getenv('WARM_CACHE_DIR', 'browser_cache')
+WARM_CACHE_MAX_MB = int(os.getenv('WARM_CACHE_MAX_MB', 500))
+WARM_CACHE_MAX_AGE_HOURS = float(os.getenv('WARM_CACHE_MAX_AGE_HOURS', 24))
+
+# HAR mode: "record" saves each successful run to HAR_DIR/<usecase>.har, "replay" serves runs from it
+HAR_MODE = os.getenv('HAR_MODE', 'off').strip().lower()
+if HAR_MODE not in HAR_MODES:
+    HAR_MODE = 'off'
+HAR_DIR = os.getenv('HAR_DIR', 'har')
+# Factor for the recorded response times during replay (0 = answer immediately)
+HAR_REPLAY_TIME_SCALE = float(os.getenv('HAR_REPLAY_TIME_SCALE', 1.0))
+
+# Opt-in profiling of measure_step() for usecases and steps matching these patterns (empty = off)
+PROFILE_USECASES = parse_patterns(os.getenv('PROFILE_USECASES', ''))
+PROFILE_STEPS = parse_patterns(os.getenv('PROFILE_STEPS', '*'))
+# "sample" = stack sampling every PROFILE_INTERVAL_MS (collapsed stacks), "cprofile" = pstats file
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'sample').strip().lower()
+if PROFILE_MODE not in PROFILE_MODES:
+    PROFILE_MODE = 'sample'
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+
+# Slow step capture: a step slower than SLOW_STEP_FACTOR x its expected duration (the anomaly
+# baseline below) gets a screenshot, and the next DEEP_CAPTURE_RUNS runs record trace, HAR and
+# CPU profile of every step (factor 0 = off)
+SLOW_STEP_FACTOR = float(os.getenv('SLOW_STEP_FACTOR', 2.0))
+DEEP_CAPTURE_RUNS = int(os.getenv('DEEP_CAPTURE_RUNS', 1))
+# Captures across all usecases as "captures/seconds"
+DEEP_CAPTURE_RATE = parse_rate(os.getenv('DEEP_CAPTURE_RATE', '4/3600'))
+SLOW_STEP_DETECTOR = SlowStepDetector(SLOW_STEP_FACTOR, DEEP_CAPTURE_RUNS, DEEP_CAPTURE_RATE)
+
+# Anomaly scoring: EWMA baseline per step with hour-of-week offsets, scored after BASELINE_MIN_SAMPLES
+# runs; a CUSUM over CHANGE_POINT_THRESHOLD moves the baseline to a lasting shift
+ANOMALY_DETECTION = os.getenv('ANOMALY_DETECTION', 'true').lower() in ('true', '1', 'yes')
+BASELINE_ALPHA = float(os.getenv('BASELINE_ALPHA', 0.05))
+BASELINE_MIN_SAMPLES = int(os.getenv('BASELINE_MIN_SAMPLES', 12))
+CHANGE_POINT_THRESHOLD = float(os.getenv('CHANGE_POINT_THRESHOLD', 8.0))
+STEP_BASELINES = BaselineEngine(BASELINE_ALPHA, BASELINE_MIN_SAMPLES, CHANGE_POINT_THRESHOLD)
+
+# SLOs per provider or usecase pattern with availability / latency objectives (missing file = none)
+SLO_CONFIG = os.getenv('SLO_CONFIG', 'slo.json')
+SLO_TRACKER = SloTracker(load_slos(SLO_CONFIG))
+
 # METRICS DEFINITION
 TRANS_DURATION = Gauge(
     'transaction_duration_seconds', 
@@ -36,8 +106,119 @@ STEP_FAILURE = Counter(
     "Total number of failures per step",
     ["usecase", "step"]
 )
+TRANS_STEP_WAIT = Gauge(
+    'transaction_step_wait_seconds',
+    'Time a step spent waiting, by kind (sleep = fixed sleeps, idle = network quiet, event = selector/url/response)',
+    ['usecase', 'step', 'kind']
+)
+BROWSER_PEAK_RSS = Gauge(
+    'transaction_browser_peak_rss_bytes',
+    'Peak resident memory of the browser process tree (step="total" for the whole run)',
+    ['usecase', 'step']
+)
+BROWSER_CPU = Gauge(
+    'transaction_browser_cpu_seconds',
+    'CPU seconds used by the browser process tree (step="total" for the whole run)',
+    ['usecase', 'step']
+)
+BROWSER_PROCESSES = Gauge(
+    'transaction_browser_peak_processes',
+    'Peak number of processes in the browser process tree (step="total" for the whole run)',
+    ['usecase', 'step']
+)
+BROWSER_OPEN_FDS = Gauge(
+    'transaction_browser_peak_open_fds',
+    'Peak number of open file descriptors of the browser process tree (step="total" for the whole run)',
+    ['usecase', 'step']
+)
+CACHE_DIR_SIZE = Gauge(
+    'transaction_cache_dir_bytes',
+    'Size of the persistent browser profile used by warm-cache runs',
+    ['usecase']
+)
+CACHE_RECYCLED = Counter(
+    'transaction_cache_recycled_total',
+    'Number of times a warm-cache profile was wiped, by reason (size, age)',
+    ['usecase', 'reason']
+)
+TEARDOWN_TIMEOUTS = Counter(
+    'transaction_teardown_timeout_total',
+    'Number of teardowns that exceeded TEARDOWN_TIMEOUT and had the browser killed',
+    ['usecase']
+)
+
+TRANS_ABORTED = Counter(
+    'transaction_aborted_total',
+    'Number of runs interrupted by a shutdown (not counted as failures)',
+    ['usecase']
+)
+
+# Kinds of waits tracked per step by the MonitorBase wait helpers
+WAIT_KINDS = ('sleep', 'idle', 'event')
+
+# Runs currently inside execute(), so a shutdown can abort them (see abort_active_runs)
+_active_monitors: set['MonitorBase'] = set()
+_active_lock = threading.Lock()
+_shutting_down = threading.Event()
+# Callbacks notified with every finished run (see trigger_api.JobWatch)
+_run_observers: list[Callable[['MonitorBase'], None]] = []
+# Serializes Playwright driver starts, so the child process that appears belongs to this run
+_driver_start_lock = threading.Lock()
+
+
+def begin_shutdown() -> None:
+    """Stops new transactions from starting; running ones continue"""
+    _shutting_down.set()
+
+
+def add_run_observer(callback: Callable[['MonitorBase'], None]) -> None:
+    """Calls 'callback' with the monitor after each execute(), including failed runs"""
+    with _active_lock:
+        _run_observers.append(callback)
+
+
+def remove_run_observer(callback: Callable[['MonitorBase'], None]) -> None:
+    with _active_lock:
+        if callback in _run_observers:
+            _run_observers.remove(callback)
+
+
+def shutdown_event() -> threading.Event:
+    """Set by begin_shutdown(), for code that waits and should stop waiting on shutdown"""
+    return _shutting_down
+
+
+def abort_active_runs() -> int:
+    """
+    Marks all running transactions as aborted and kills their browser process trees,
+    so their steps fail fast and are reported as aborted. Returns the number of
+    processes killed.
+    """
+    with _active_lock:
+        monitors = list(_active_monitors)
+    killed = 0
+    for monitor in monitors:
+        monitor.aborted = True
+        killed += kill_process_tree(monitor._browser_pids)
+    return killed
 
 class MonitorBase(ABC):
+    # Steps that establish / end the logged-in session. Transactions declaring them can
+    # be chained in a journey (see PythonRunner.run_journey) and share a single login.
+    login_steps: tuple[str, ...] = ()
+    logout_steps: tuple[str, ...] = ()
+    # Cache modes this transaction is scheduled in; warm runs get the usecase suffix "_warm"
+    cache_modes: tuple[str, ...] = DEFAULT_CACHE_MODES
+    # Scheduling hints read by main.py without importing the transaction; a schedule.json
+    # in the transaction's directory overrides them (see scheduling.load_schedule)
+    schedule_interval: int | None = None  # seconds, None = SCHEDULE_INTERVAL
+    schedule_jitter: float = 0  # seconds of random offset per run
+    priority: int = 5  # lower = more urgent
+    active_windows: tuple[tuple[str, ...], ...] = ()  # e.g. (("07:00", "20:00", "mon-fri"),), empty = always
+    schedule_deadline: float | None = None  # seconds a run may wait in the queue, None = one interval
+    catch_up: str | None = None  # 'skip', 'once' or 'spread' while a run is pending, None = CATCH_UP_POLICY
+    rate_group: str | None = None  # RATE_LIMITS group, e.g. the shared identity provider
+
     def _save_error_stack(self, step_name: str, error_type: str, exc: Exception) -> str:
         """
         Saves the error stack trace to a text file with timestamp and step name.
@@ -60,10 +241,35 @@ class MonitorBase(ABC):
     def __init__(self, usecase_name: str, headless: bool = True) -> None:
         self.usecase_name = usecase_name
         self.headless = headless
-        self.playwright: Optional[object] = None
-        self.browser: Optional[Browser] = None
-        self.page: Optional[Page] = None
+        self.playwright: object | None = None
+        self.browser: Browser | None = None
+        self.context: BrowserContext | None = None  # only set for warm-cache and HAR runs
+        self.page: Page | None = None
+        self.cache_mode = 'cold'
+        self.har_mode = HAR_MODE
+        # Set by abort_active_runs() when a shutdown interrupts this run
+        self.aborted = False
         
+        # (step, seconds, success) of every step and phase of the current run, in order
+        self.step_timings: list[tuple[str, float, bool]] = []
+        # Wait accounting for the current step (kind -> seconds)
+        self._wait_times: dict[str, float] = {}
+        # Network activity tracking for wait_for_network_quiet()
+        self._inflight_requests: set[Any] = set()
+        self._last_network_activity = 0.0
+
+        # Journey state, set by PythonRunner.run_journey() when sharing a browser session
+        self.session_active = False  # login_steps already done in this browser context
+        self.keep_session = False  # skip logout_steps, a later segment continues the session
+        self.session_home_url: str | None = None  # page URL right after login
+
+        # Samples the Playwright driver + Chromium processes while the browser is up
+        self.resource_sampler: ProcessTreeSampler | None = None
+        # Records trace, requests and CPU profile of every step in runs armed by a slow step
+        self.step_recorder: StepRecorder | None = None
+        # Playwright driver process(es) of this run, root of the browser process tree
+        self._browser_pids: set[int] = set()
+
         # Create screenshots directory if it doesn't exist
         self.screenshots_dir = Path("screenshots")
         self.screenshots_dir.mkdir(exist_ok=True)
@@ -131,15 +337,296 @@ Error Type: {error_type}
             logger.error(f"[{self.usecase_name}] Failed to take screenshot: {e}")
             return ""
 
+    @contextmanager
+    def _measure_phase(self, step_name: str) -> Iterator[None]:
+        """Times a browser lifecycle phase (setup/teardown) as its own step"""
+        started = time.perf_counter()
+        success = False
+        try:
+            yield
+            success = True
+        except Exception:
+            STEP_FAILURE.labels(usecase=self.usecase_name, step=step_name).inc()
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            TRANS_DURATION.labels(usecase=self.usecase_name, step=step_name).set(duration)
+            self.step_timings.append((step_name, duration, success))
+            if success:
+                self._score_step(step_name, duration)
+            if debug_mode:
+                logger.info(f"[{self.usecase_name}] Phase '{step_name}' took {duration:.2f}s")
+
     def setup(self) -> None:
         """Initializes Playwright"""
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=self.headless)
-        # Use default system locale for language-independent testing
-        self.page = self.browser.new_page()
+        tracking = proc_available()
+        with self._measure_phase(STEP_BROWSER_LAUNCH):
+            with _driver_start_lock:
+                known_children = child_pids(os.getpid()) if tracking else set()
+                self.playwright = sync_playwright().start()
+                if tracking:
+                    # The Playwright driver is the child process that appeared during start();
+                    # the browser runs below it
+                    self._browser_pids = child_pids(os.getpid()) - known_children
+            if self.cache_mode == 'warm':
+                self.context = self.playwright.chromium.launch_persistent_context(
+                    str(self._prepare_cache_dir()), headless=self.headless, **self._har_options()
+                )
+            else:
+                self.browser = self.playwright.chromium.launch(headless=self.headless)
+
+        with self._measure_phase(STEP_PAGE_CREATION):
+            if self.context:
+                # Keep HTTP cache, service workers and IndexedDB, but start logged out
+                # with a fresh consent state like a cold run
+                self.context.clear_cookies()
+                self.page = self.context.pages[0] if self.context.pages else self.context.new_page()
+            elif self.har_mode != 'off':
+                assert self.browser is not None
+                # HAR recording and routing need an explicit context
+                self.context = self.browser.new_context(**self._har_options())
+                self.page = self.context.new_page()
+            else:
+                assert self.browser is not None
+                # Use default system locale for language-independent testing
+                self.page = self.browser.new_page()
+            if self.har_mode == 'replay':
+                HarReplay(har_path(HAR_DIR, self.usecase_name), self.usecase_name,
+                          HAR_REPLAY_TIME_SCALE).attach(self.context)
+        self._track_network(self.page)
+        if SLOW_STEP_DETECTOR.take_armed(self.usecase_name):
+            self.step_recorder = StepRecorder(self.page, self.screenshots_dir, self.usecase_name)
+            self.step_recorder.start()
+
+        if self._browser_pids and RESOURCE_SAMPLE_INTERVAL > 0:
+            self.resource_sampler = ProcessTreeSampler(self._browser_pids, RESOURCE_SAMPLE_INTERVAL)
+            self.resource_sampler.start()
+
+    def _har_options(self) -> dict[str, Any]:
+        """
+        Context options for HAR recording. The run is recorded to a temporary file that
+        only replaces the usecase's HAR when the run succeeds (see _finish_har()).
+        """
+        if self.har_mode != 'record':
+            return {}
+        path = har_path(HAR_DIR, self.usecase_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return {'record_har_path': str(path.with_suffix('.har.tmp')), 'record_har_content': 'embed'}
+
+    def _finish_har(self, success: bool) -> None:
+        """Keeps the recording of a successful run, the context wrote it on close"""
+        path = har_path(HAR_DIR, self.usecase_name)
+        recording = path.with_suffix('.har.tmp')
+        if not recording.exists():
+            return
+        if success:
+            os.replace(recording, path)
+            logger.info(f"[{self.usecase_name}] HAR recorded: {path}")
+        else:
+            recording.unlink()
+            logger.warning(f"[{self.usecase_name}] Run failed, HAR recording discarded")
+
+    def _prepare_cache_dir(self) -> Path:
+        """
+        Returns the persistent user-data dir for warm-cache runs. The dir is wiped when
+        it outgrows WARM_CACHE_MAX_MB or is older than WARM_CACHE_MAX_AGE_HOURS.
+        """
+        cache_dir = Path(WARM_CACHE_DIR) / self.usecase_name
+        marker = cache_dir / '.created'
+        size = sum(f.stat().st_size for f in cache_dir.rglob('*') if f.is_file()) if cache_dir.exists() else 0
+
+        reason = None
+        if size > WARM_CACHE_MAX_MB * 1024 * 1024:
+            reason = 'size'
+        elif marker.exists() and time.time() - marker.stat().st_mtime > WARM_CACHE_MAX_AGE_HOURS * 3600:
+            reason = 'age'
+        if reason:
+            logger.info(f"[{self.usecase_name}] Recycling warm cache ({reason}, {size / 1024 / 1024:.0f} MB)")
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            CACHE_RECYCLED.labels(usecase=self.usecase_name, reason=reason).inc()
+            size = 0
+
+        if not marker.exists():
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+        CACHE_DIR_SIZE.labels(usecase=self.usecase_name).set(size)
+        return cache_dir
+
+    def _export_resources(self, window: str, step_name: str) -> None:
+        """Closes a resource sampler window and exports it under the given step label"""
+        if not self.resource_sampler:
+            return
+        stats = self.resource_sampler.end(window)
+        if not stats:
+            return
+        labels = {'usecase': self.usecase_name, 'step': step_name}
+        BROWSER_PEAK_RSS.labels(**labels).set(stats['peak_rss_bytes'])
+        BROWSER_CPU.labels(**labels).set(stats['cpu_seconds'])
+        BROWSER_PROCESSES.labels(**labels).set(stats['peak_processes'])
+        BROWSER_OPEN_FDS.labels(**labels).set(stats['peak_open_fds'])
+
+    def attach_session(self, host: "MonitorBase") -> None:
+        """Borrows the Playwright/browser/page of another monitor (journey mode)"""
+        self.playwright = host.playwright
+        self.browser = host.browser
+        self.context = host.context
+        self.page = host.page
+        self.resource_sampler = host.resource_sampler
+        self._browser_pids = host._browser_pids
+        self._track_network(self._active_page)
+        # The host took its arming in setup(); a later segment records on the shared page,
+        # and after new_session_page() its recording moves to the fresh page
+        if self is not host and (self.step_recorder or SLOW_STEP_DETECTOR.take_armed(self.usecase_name)):
+            if self.step_recorder:
+                self.step_recorder.stop()
+            self.step_recorder = StepRecorder(self.page, self.screenshots_dir, self.usecase_name)
+            self.step_recorder.start()
+
+    def new_session_page(self) -> None:
+        """Replaces the page with one in a fresh browser context (logged out, empty storage)"""
+        if self.step_recorder:
+            self.step_recorder.stop()
+        if self.page:
+            try:
+                self.page.close()
+            except Exception as e:
+                logger.warning(f"[{self.usecase_name}] Failed to close page: {e}")
+        if self.context:
+            # Persistent (warm-cache) or HAR context: dropping cookies is enough to log out
+            self.context.clear_cookies()
+            self.page = self.context.new_page()
+        else:
+            assert self.browser is not None
+            self.page = self.browser.new_page()
+        self._track_network(self.page)
+        if self.step_recorder:
+            self.step_recorder = StepRecorder(self.page, self.screenshots_dir, self.usecase_name)
+            self.step_recorder.start()
+
+    def _track_network(self, page: Page) -> None:
+        """Registers request listeners used by wait_for_network_quiet()"""
+        self._inflight_requests = set()
+        self._last_network_activity = time.perf_counter()
+
+        def on_request(request: Any) -> None:
+            self._inflight_requests.add(request)
+            self._last_network_activity = time.perf_counter()
+
+        def on_request_done(request: Any) -> None:
+            self._inflight_requests.discard(request)
+            self._last_network_activity = time.perf_counter()
+
+        page.on("request", on_request)
+        page.on("requestfinished", on_request_done)
+        page.on("requestfailed", on_request_done)
+
+    def _record_wait(self, kind: str, started: float) -> None:
+        """Adds the time since 'started' (perf_counter) to the current step's wait bucket"""
+        self._wait_times[kind] = self._wait_times.get(kind, 0.0) + (time.perf_counter() - started)
+
+    @property
+    def _active_page(self) -> Page:
+        """The transaction's page; the wait helpers are only called from steps, after setup()"""
+        assert self.page is not None, "setup() or attach_session() has not been called"
+        return self.page
+
+    def sleep(self, ms: int) -> None:
+        """
+        Fixed sleep, accounted as dead time of the current step.
+        Prefer one of the event-based waits below wherever possible.
+        """
+        started = time.perf_counter()
+        try:
+            self._active_page.wait_for_timeout(ms)
+        finally:
+            self._record_wait('sleep', started)
+
+    def wait_for_selector(self, selector: str,
+                          state: Literal['attached', 'detached', 'hidden', 'visible'] = "visible",
+                          timeout: int = 30000) -> Any:
+        """Waits for a selector to reach 'state'. Raises on timeout."""
+        started = time.perf_counter()
+        try:
+            return self._active_page.wait_for_selector(selector, state=state, timeout=timeout)
+        finally:
+            self._record_wait('event', started)
+
+    def wait_for_url(self, url: Any, timeout: int = 30000) -> None:
+        """Waits until the page URL matches 'url' (string, glob, regex or predicate). Raises on timeout."""
+        started = time.perf_counter()
+        try:
+            self._active_page.wait_for_url(url, timeout=timeout)
+        finally:
+            self._record_wait('event', started)
+
+    def wait_for_response(self, url_or_predicate: Any, action: Callable[[], None] | None = None,
+                          timeout: int = 30000) -> Any:
+        """
+        Runs 'action' (e.g. a click) and waits for the first matching response.
+        Only the time after 'action' returned is accounted as waiting.
+        Returns the Playwright Response. Raises on timeout.
+        """
+        started = time.perf_counter()
+        with self._active_page.expect_response(url_or_predicate, timeout=timeout) as response_info:
+            if action:
+                action()
+            started = time.perf_counter()
+        self._record_wait('event', started)
+        return response_info.value
+
+    def wait_for_network_quiet(self, idle_ms: int = NETWORK_IDLE_MS, timeout: int = 30000) -> None:
+        """
+        Waits until no request has been in flight for 'idle_ms', counted from the last
+        request that started or finished, so an already idle page returns right away.
+        Raises a Playwright TimeoutError like wait_for_load_state("networkidle").
+        """
+        started = time.perf_counter()
+        deadline = started + timeout / 1000
+        poll_ms = min(50, idle_ms)
+        try:
+            while True:
+                now = time.perf_counter()
+                if not self._inflight_requests and (now - self._last_network_activity) * 1000 >= idle_ms:
+                    return
+                if now >= deadline:
+                    raise PlaywrightTimeoutError(
+                        f"Network not quiet after {timeout}ms ({len(self._inflight_requests)} requests in flight)"
+                    )
+                self._active_page.wait_for_timeout(poll_ms)
+        finally:
+            self._record_wait('idle', started)
+
+    def _kill_browser(self) -> None:
+        """Teardown watchdog: kills the browser process tree so hung close() calls return"""
+        TEARDOWN_TIMEOUTS.labels(usecase=self.usecase_name).inc()
+        killed = kill_process_tree(self._browser_pids)
+        logger.error(f"[{self.usecase_name}] Teardown exceeded {TEARDOWN_TIMEOUT:.0f}s, "
+                     f"killed {killed} browser processes")
 
     def teardown(self) -> None:
         """Cleans up Playwright - robust cleanup with error handling"""
+        if self.resource_sampler:
+            self.resource_sampler.stop()
+            self.resource_sampler = None
+        if self.step_recorder:
+            self.step_recorder.stop()
+            self.step_recorder = None
+
+        if not (self.page or self.context or self.browser or self.playwright):
+            return
+
+        watchdog = threading.Timer(TEARDOWN_TIMEOUT, self._kill_browser)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            with self._measure_phase(STEP_TEARDOWN):
+                self._close_browser()
+        finally:
+            watchdog.cancel()
+            self._browser_pids = set()
+
+    def _close_browser(self) -> None:
+        """Closes page, context, browser and Playwright, ignoring individual failures"""
         try:
             if self.page:
                 try:
@@ -149,6 +636,15 @@ Error Type: {error_type}
         except Exception:
             pass
         
+        try:
+            if self.context:
+                try:
+                    self.context.close()
+                except Exception as e:
+                    logger.warning(f"[{self.usecase_name}] Failed to close context: {e}")
+        except Exception:
+            pass
+
         try:
             if self.browser:
                 try:
@@ -169,25 +665,72 @@ Error Type: {error_type}
         
         # Force cleanup of references to help garbage collection
         self.page = None
+        self.context = None
         self.browser = None
         self.playwright = None
 
+    def _drop_step_series(self, step_name: str) -> None:
+        """
+        Removes the duration and wait series of a step skipped in a journey, so a value
+        from an earlier standalone run does not stay exported as if it were current.
+        """
+        series: list[tuple[Gauge, tuple[str, ...]]] = [(TRANS_DURATION, (self.usecase_name, step_name))]
+        series += [(TRANS_STEP_WAIT, (self.usecase_name, step_name, kind)) for kind in WAIT_KINDS]
+        for metric, labels in series:
+            try:
+                metric.remove(*labels)
+            except KeyError:
+                pass
+
     def measure_step(self, step_name: str, action: Callable[[], None]) -> None:
         """
         Executes 'action' (callable), measures time, and records metrics.
         Takes screenshot on error. Raises exception on failure to stop the flow.
         """
+        if self.session_active and step_name in self.login_steps:
+            if debug_mode:
+                logger.info(f"[{self.usecase_name}] Skipping step '{step_name}' (session shared)")
+            self._drop_step_series(step_name)
+            return
+        if self.keep_session and step_name in self.logout_steps:
+            if debug_mode:
+                logger.info(f"[{self.usecase_name}] Skipping step '{step_name}' (session kept)")
+            self._drop_step_series(step_name)
+            return
         if debug_mode:
             logger.info(f"[{self.usecase_name}] Starting step: {step_name}")
+        self._wait_times = {}
+        if self.resource_sampler:
+            self.resource_sampler.begin('step')
+        if self.step_recorder:
+            self.step_recorder.begin_step(step_name)
+        captured = False
         start_time = time.time()
         try:
-            action()
+            with self._profile_step(step_name):
+                action()
             duration = time.time() - start_time
             TRANS_DURATION.labels(usecase=self.usecase_name, step=step_name).set(duration)
+            self.step_timings.append((step_name, duration, True))
+            expected = self._score_step(step_name, duration)
+            captured = self._capture_if_slow(step_name, duration, expected)
+            for kind in WAIT_KINDS:
+                TRANS_STEP_WAIT.labels(usecase=self.usecase_name, step=step_name, kind=kind).set(
+                    self._wait_times.get(kind, 0.0)
+                )
+            if self.login_steps and step_name == self.login_steps[-1]:
+                self.session_home_url = self._active_page.url
             if debug_mode:
-                logger.info(f"[{self.usecase_name}] Step '{step_name}' success ({duration:.2f}s)")
+                dead_time = self._wait_times.get('sleep', 0.0) + self._wait_times.get('idle', 0.0)
+                logger.info(f"[{self.usecase_name}] Step '{step_name}' success ({duration:.2f}s, "
+                            f"dead time {dead_time:.2f}s)")
         except Exception as exc:
             duration = time.time() - start_time
+            self.step_timings.append((step_name, duration, False))
+            if self.aborted:
+                # Browser killed by a shutdown: no artifacts, not a step failure
+                logger.warning(f"[{self.usecase_name}] Step '{step_name}' aborted after {duration:.2f}s")
+                raise
             # Take screenshot, save HTML, and error stack before logging error
             self._take_screenshot(step_name, "step_failure")
             self._save_page_html(step_name, "step_failure")
@@ -196,28 +739,110 @@ Error Type: {error_type}
             logger.error(f"[{self.usecase_name}] Step '{step_name}' FAILED after {duration:.2f}s", exc_info=True)
             STEP_FAILURE.labels(usecase=self.usecase_name, step=step_name).inc()
             raise
+        finally:
+            if self.step_recorder:
+                self.step_recorder.end_step(step_name, keep=captured)
+            self._export_resources('step', step_name)
+
+    def _score_step(self, step_name: str, duration: float) -> float | None:
+        """
+        Anomaly score of a successful step against its baseline (see anomaly.py).
+        Returns the duration the baseline expected, None while the step isn't scored yet.
+        """
+        if not ANOMALY_DETECTION or self.har_mode == 'replay':
+            return None
+        expected = STEP_BASELINES.expected(self.usecase_name, step_name)
+        # Recording inflates the durations of armed runs: compared, but not scored or learned
+        if self.step_recorder:
+            return expected
+        score = STEP_BASELINES.observe(self.usecase_name, step_name, duration)
+        if debug_mode and score is not None:
+            logger.info(f"[{self.usecase_name}] Step '{step_name}' anomaly score {score:.1f}")
+        return expected
+
+    def _capture_if_slow(self, step_name: str, duration: float, expected: float | None) -> bool:
+        """
+        Screenshot of a step that ran over its expected duration, and arms the next run(s)
+        of the usecase to record every step. Returns True if the capture was within the budget.
+        """
+        if not SLOW_STEP_DETECTOR.is_slow(self.usecase_name, step_name, duration, expected):
+            return False
+        logger.warning(f"[{self.usecase_name}] Step '{step_name}' slow: {duration:.2f}s "
+                       f"(expected {expected:.2f}s, factor {SLOW_STEP_FACTOR})")
+        if not SLOW_STEP_DETECTOR.allow_capture(self.usecase_name):
+            logger.info(f"[{self.usecase_name}] Slow step capture skipped (DEEP_CAPTURE_RATE exhausted)")
+            return False
+        self._take_screenshot(step_name, "slow_step")
+        SLOW_STEP_DETECTOR.arm(self.usecase_name)
+        return True
+
+    def _profile_step(self, step_name: str) -> Any:
+        """Profiler for the step if its usecase and name are selected for profiling"""
+        if PROFILE_USECASES and matches(self.usecase_name, PROFILE_USECASES) and matches(step_name, PROFILE_STEPS):
+            return StepProfiler(self.usecase_name, step_name, self.screenshots_dir, PROFILE_MODE, PROFILE_INTERVAL_MS)
+        return nullcontext()
 
-    def execute(self) -> None:
+    def execute(self, reuse_session: bool = False) -> bool | None:
         """
         Full execution wrapper: Setup -> Run -> Teardown -> Record Success/Fail
+        With reuse_session=True the browser attached via attach_session() is used
+        and left open (journey mode). Returns True on success, None if the run was
+        not started or aborted because of a shutdown.
         Note: Screenshots are taken by measure_step() on step failures.
         """
+        if _shutting_down.is_set():
+            logger.info(f"[{self.usecase_name}] Shutting down, transaction not started")
+            return None
         # Always log start of transaction
         logger.info(f"[{self.usecase_name}] Transaction START")
         TRANS_LAST_RUN.labels(usecase=self.usecase_name).set_to_current_time()
         success = False
+        self.step_timings = []
+        with _active_lock:
+            _active_monitors.add(self)
         try:
-            self.setup()
+            if not reuse_session:
+                self.setup()
+            if self.resource_sampler:
+                self.resource_sampler.begin('run')
             self.run()
             success = True
             # Always log successful completion
             logger.info(f"[{self.usecase_name}] Transaction SUCCESS")
         except Exception:
-            # Always log failures (screenshot already taken in measure_step)
-            logger.error(f"[{self.usecase_name}] Transaction FAILED", exc_info=True)
+            if not self.aborted:
+                # Always log failures (screenshot already taken in measure_step)
+                logger.error(f"[{self.usecase_name}] Transaction FAILED", exc_info=True)
         finally:
-            self.teardown()
-            TRANS_SUCCESS.labels(usecase=self.usecase_name).set(1 if success else 0)
+            with _active_lock:
+                _active_monitors.discard(self)
+            self._export_resources('run', 'total')
+            if not reuse_session:
+                self.teardown()
+                if self.har_mode == 'record':
+                    self._finish_har(success)
+            elif self.step_recorder:
+                # The session stays open for the next segment, which may record itself
+                self.step_recorder.stop()
+                self.step_recorder = None
+            # An aborted run keeps the previous success value
+            if not self.aborted:
+                TRANS_SUCCESS.labels(usecase=self.usecase_name).set(1 if success else 0)
+                # Replayed runs don't say anything about the service
+                if self.har_mode != 'replay':
+                    # Latency of the transaction steps only, without browser launch and teardown
+                    SLO_TRACKER.record(self.usecase_name, success,
+                                       sum(duration for step, duration, _ in self.step_timings
+                                           if step not in LIFECYCLE_STEPS))
+            with _active_lock:
+                observers = list(_run_observers)
+            for observer in observers:
+                observer(self)
+        if self.aborted:
+            TRANS_ABORTED.labels(usecase=self.usecase_name).inc()
+            logger.warning(f"[{self.usecase_name}] Transaction ABORTED (shutdown)")
+            return None
+        return success
 
     @abstractmethod
     def run(self) -> None:
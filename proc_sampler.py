@@ -0,0 +1,174 @@
+"""
+Samples CPU, memory, process count and open file descriptors of a process tree
+from /proc. Used by MonitorBase to account the resources of each browser run.
+"""
+import logging
+import os
+import signal
+import threading
+from collections.abc import Iterable
+
+logger = logging.getLogger(__name__)
+
+PROC_ROOT = "/proc"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def proc_available() -> bool:
+    """True if /proc can be used for sampling (Linux)"""
+    return os.path.isdir(os.path.join(PROC_ROOT, "self"))
+
+
+def _read_stat(pid: int) -> tuple[int, int, int] | None:
+    """
+    Returns (ppid, cpu_ticks, rss_pages) for a pid, or None if it is gone.
+    Fields after the command name: state ppid ... utime(14) stime(15) ... rss(24)
+    """
+    try:
+        with open(os.path.join(PROC_ROOT, str(pid), "stat")) as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces and parentheses, so split after the last ')'
+    fields = data[data.rfind(")") + 2:].split()
+    try:
+        return int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[21])
+    except (IndexError, ValueError):
+        return None
+
+
+def _all_pids() -> Iterable[int]:
+    try:
+        return [int(entry) for entry in os.listdir(PROC_ROOT) if entry.isdigit()]
+    except OSError:
+        return []
+
+
+def child_pids(pid: int) -> set[int]:
+    """Direct children of a pid"""
+    children = set()
+    for candidate in _all_pids():
+        stat = _read_stat(candidate)
+        if stat and stat[0] == pid:
+            children.add(candidate)
+    return children
+
+
+def descendant_stats(roots: set[int]) -> dict[int, tuple[int, int]]:
+    """Returns {pid: (cpu_ticks, rss_pages)} for the roots and all their descendants"""
+    stats: dict[int, tuple[int, int, int]] = {}
+    for pid in _all_pids():
+        stat = _read_stat(pid)
+        if stat:
+            stats[pid] = stat
+    tree = {pid for pid in roots if pid in stats}
+    # Walk down until no new children are found
+    frontier = set(tree)
+    while frontier:
+        frontier = {pid for pid, stat in stats.items() if stat[0] in frontier and pid not in tree}
+        tree |= frontier
+    return {pid: (stats[pid][1], stats[pid][2]) for pid in tree}
+
+
+def kill_process_tree(roots: set[int]) -> int:
+    """Sends SIGKILL to the roots and all their descendants. Returns the number of processes signalled."""
+    killed = 0
+    for pid in descendant_stats(roots):
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except OSError:
+            pass
+    return killed
+
+
+def count_fds(pid: int) -> int:
+    try:
+        return len(os.listdir(os.path.join(PROC_ROOT, str(pid), "fd")))
+    except OSError:
+        return 0
+
+
+class ProcessTreeSampler:
+    """
+    Background thread that samples a process tree (e.g. the Playwright driver and its
+    Chromium children) at a fixed interval. Named windows (e.g. 'run', 'step') collect
+    peak RSS, peak process count, peak open fds and CPU seconds between begin() and end().
+    """
+
+    def __init__(self, roots: set[int], interval: float = 0.5) -> None:
+        self.roots = set(roots)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Highest cumulative CPU ticks seen per pid, so exited processes still count
+        self._cpu_seen: dict[int, int] = {}
+        self._windows: dict[str, dict[str, float]] = {}
+        # Values of the most recent sample
+        self._last = {'rss_bytes': 0, 'processes': 0, 'open_fds': 0, 'cpu_seconds': 0.0}
+
+    def start(self) -> None:
+        if not self.roots or not proc_available():
+            return
+        self.sample()
+        self._thread = threading.Thread(target=self._loop, name="proc-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug(f"Process sampling failed: {e}")
+
+    def sample(self) -> None:
+        """Takes one sample and updates all open windows"""
+        tree = descendant_stats(self.roots)
+        rss_bytes = sum(rss for _, rss in tree.values()) * PAGE_SIZE
+        fds = sum(count_fds(pid) for pid in tree)
+        with self._lock:
+            for pid, (cpu_ticks, _) in tree.items():
+                self._cpu_seen[pid] = max(cpu_ticks, self._cpu_seen.get(pid, 0))
+            cpu_seconds = sum(self._cpu_seen.values()) / CLOCK_TICKS
+            self._last = {'rss_bytes': rss_bytes, 'processes': len(tree), 'open_fds': fds,
+                          'cpu_seconds': cpu_seconds}
+            for window in self._windows.values():
+                window['peak_rss_bytes'] = max(window['peak_rss_bytes'], rss_bytes)
+                window['peak_processes'] = max(window['peak_processes'], len(tree))
+                window['peak_open_fds'] = max(window['peak_open_fds'], fds)
+                window['cpu_now'] = cpu_seconds
+
+    def begin(self, name: str) -> None:
+        """Opens (or resets) a named accounting window, starting from a fresh sample"""
+        if self.roots and proc_available():
+            self.sample()
+        with self._lock:
+            last = self._last
+            self._windows[name] = {
+                'peak_rss_bytes': last['rss_bytes'], 'peak_processes': last['processes'],
+                'peak_open_fds': last['open_fds'],
+                'cpu_start': last['cpu_seconds'], 'cpu_now': last['cpu_seconds'],
+            }
+
+    def end(self, name: str) -> dict[str, float] | None:
+        """Closes a window and returns its stats, or None if it was never opened"""
+        if self.roots and proc_available():
+            self.sample()
+        with self._lock:
+            window = self._windows.pop(name, None)
+        if window is None:
+            return None
+        return {
+            'peak_rss_bytes': window['peak_rss_bytes'],
+            'peak_processes': window['peak_processes'],
+            'peak_open_fds': window['peak_open_fds'],
+            'cpu_seconds': window['cpu_now'] - window['cpu_start'],
+        }
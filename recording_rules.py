@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Generates recording_rules.yml for Prometheus: pre-aggregated series for the Grafana
+dashboard, so long ranges read a few recorded points instead of every 15s sample of
+every step over 730 days of retention.
+
+One rule group, evaluated every 5 minutes: success per usecase and provider, total
+duration per usecase, duration and failures per step. The dashboard panels read these.
+
+Every series carries a 'provider' label, the transactions/ directory of its usecase.
+The providers come from the discovered transactions, so run this again after adding
+a provider directory. New transactions and steps of known providers need no changes.
+
+Usage:
+    python recording_rules.py            # write recording_rules.yml
+    python recording_rules.py --check    # exit 1 if recording_rules.yml is out of date
+"""
+import glob
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+TRANSACTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transactions')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recording_rules.yml')
+
+
+def discover_usecases(transactions_dir: str = TRANSACTIONS_DIR) -> dict[str, list[str]]:
+    """Usecase names per provider directory, named like main.py names its jobs"""
+    providers: dict[str, list[str]] = {}
+    for py_file in sorted(glob.glob(os.path.join(transactions_dir, '**', '*.py'), recursive=True)):
+        if os.path.basename(py_file).startswith('__'):
+            continue
+        rel_path = os.path.relpath(py_file, transactions_dir)
+        provider = os.path.dirname(rel_path).split(os.sep)[0]
+        if not provider:
+            continue
+        providers.setdefault(provider, []).append(os.path.splitext(rel_path)[0].replace(os.sep, '_'))
+    return providers
+
+
+def with_provider(expression: str, providers: list[str]) -> str:
+    """Adds the usecase's provider directory as 'provider' label to the series of 'expression'"""
+    # Longest first, so a provider that prefixes another one can't take its usecases
+    names = '|'.join(sorted(providers, key=lambda name: (-len(name), name)))
+    return f'label_replace({expression}, "provider", "$1", "usecase", "({names})_.*")'
+
+
+def rule_groups(providers: list[str]) -> list[tuple[str, str, list[tuple[str, str]]]]:
+    """(group name, evaluation interval, [(record, expression)]) of the rules file"""
+    def labeled(expression: str) -> str:
+        return with_provider(expression, providers)
+
+    return [
+        ('transaction_monitor_5m', '5m', [
+            ('usecase:transaction_success:avg5m',
+             labeled('avg_over_time(transaction_success[5m])')),
+            ('provider:transaction_success:avg5m',
+             'avg by (provider) (usecase:transaction_success:avg5m)'),
+            ('usecase:transaction_duration_seconds:sum_avg5m',
+             f"sum by (provider, usecase) ({labeled('avg_over_time(transaction_duration_seconds[5m])')})"),
+            ('usecase_step:transaction_duration_seconds:avg5m',
+             labeled('avg_over_time(transaction_duration_seconds[5m])')),
+            ('usecase_step:transaction_step_failure:increase5m',
+             f"sum by (provider, usecase, step) ({labeled('increase(transaction_step_failure_total[5m])')})"),
+        ]),
+    ]
+
+
+def render(providers: dict[str, list[str]]) -> str:
+    """recording_rules.yml for the discovered providers"""
+    lines = [
+        '# Generated by recording_rules.py from the transactions/ directory, do not edit.',
+        '# Providers:',
+    ]
+    lines += [f'#   {provider}: {len(usecases)} transaction(s)' for provider, usecases in sorted(providers.items())]
+    lines.append('groups:')
+    for name, interval, rules in rule_groups(sorted(providers)):
+        lines += [f'  - name: {name}', f'    interval: {interval}', '    rules:']
+        for record, expression in rules:
+            lines += [f'      - record: {record}', f"        expr: '{expression}'"]
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate the Prometheus recording rules for the dashboard')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Rules file (default: recording_rules.yml)')
+    parser.add_argument('--check', action='store_true', help='Only check that the rules file is up to date')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    providers = discover_usecases()
+    if not providers:
+        logger.error(f"No transactions found in {TRANSACTIONS_DIR}")
+        return 2
+    rules = render(providers)
+    if args.check:
+        current = ''
+        if os.path.exists(args.output):
+            with open(args.output, encoding='utf-8') as f:
+                current = f.read()
+        if current != rules:
+            logger.error(f"{args.output} is out of date, run 'python recording_rules.py'")
+            return 1
+        logger.info(f"{args.output} is up to date")
+        return 0
+    with open(args.output, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(rules)
+    logger.info(f"Wrote {args.output} ({len(providers)} providers)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
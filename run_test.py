@@ -19,30 +19,46 @@ Usage:
     python run_test.py magentacloud-settings        # Run MagentaCloud Settings Test
     python run_test.py magentacloud-document        # Run MagentaCloud Document Test
     python run_test.py all                          # Run all tests sequentially
+
+    python run_test.py all -j 4                     # 4 tests at a time, headless
+    python run_test.py '*-document' --provider magentacloud --provider hidrive-next
+    python run_test.py all -j 4 --junit results.xml --json results.json
+
+Exit codes: 0 all tests passed, 1 at least one test failed, 2 no test matched.
 """
 import sys
 import os
-from pathlib import Path
+import json
+import time
+import fnmatch
+import argparse
 import importlib.util
 import logging
-import os
+import traceback
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any
 
-# Configure logging - respect DEBUG environment variable
-debug_mode = os.getenv('DEBUG', 'false').lower() in ('true', '1', 'yes')
 
-if debug_mode:
-    # DEBUG mode: Show everything
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-else:
-    # Production mode: Only show transaction START/SUCCESS/FAILED
-    logging.basicConfig(
-        level=logging.ERROR,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    logging.getLogger('monitor_base').setLevel(logging.INFO)
+def configure_logging() -> None:
+    """Configure logging - respect DEBUG environment variable"""
+    debug_mode = os.getenv('DEBUG', 'false').lower() in ('true', '1', 'yes')
+
+    if debug_mode:
+        # DEBUG mode: Show everything
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+    else:
+        # Production mode: Only show transaction START/SUCCESS/FAILED
+        logging.basicConfig(
+            level=logging.ERROR,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        logging.getLogger('monitor_base').setLevel(logging.INFO)
 
 # Add project root to Python path
 project_root = Path(__file__).parent
@@ -53,7 +69,7 @@ def load_env_file():
     """Load environment variables from .env file if it exists."""
     env_file = project_root / '.env'
     if env_file.exists():
-        with open(env_file, 'r', encoding='utf-8') as f:
+        with open(env_file, encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
                 if line and not line.startswith('#') and '=' in line:
@@ -63,8 +79,6 @@ def load_env_file():
     else:
         print("⚠ Warning: .env file not found. Using default values.")
 
-load_env_file()
-
 # Test configuration: test_id -> (directory, file, class_name)
 # Environment variables are read from .env file
 TESTS = {
@@ -145,82 +159,212 @@ TESTS = {
     }
 }
 
-def run_test(test_id: str, headless: bool = False) -> bool:
-    """Run a single test by test_id. Returns True on success, False on failure."""
-    if test_id not in TESTS:
-        print(f"❌ Unknown test: {test_id}")
-        print(f"Available tests: {', '.join(TESTS.keys())}")
-        return False
-    
+# Provider directories, for --provider
+PROVIDERS = sorted({config['dir'] for config in TESTS.values()})
+
+def select_tests(patterns: list[str], providers: list[str] | None = None) -> list[str]:
+    """
+    Test ids matching any of the patterns ('all', a test id or a shell-style pattern such
+    as '*-document'), limited to the given provider directories. Keeps the TESTS order.
+    """
+    selected = []
+    for test_id, config in TESTS.items():
+        if providers and config['dir'] not in providers:
+            continue
+        if any(pattern == 'all' or fnmatch.fnmatchcase(test_id, pattern) for pattern in patterns):
+            selected.append(test_id)
+    return selected
+
+def execute_test(test_id: str, headless: bool = False) -> dict[str, Any]:
+    """
+    Runs one test and returns its result: success, duration, per-step timings and the
+    error of a failed run. Never raises, so a broken test file doesn't stop the others.
+    """
+    config = TESTS[test_id]
+    result: dict[str, Any] = {
+        'test': test_id,
+        'provider': config['dir'],
+        'class': config['class'],
+        'success': False,
+        'duration': 0.0,
+        'steps': [],
+        'error': None,
+    }
+    started = time.perf_counter()
+    test = None
+    try:
+        # Load test module
+        test_file = project_root / "transactions" / config['dir'] / config['file']
+        spec = importlib.util.spec_from_file_location(config['class'], test_file)
+        test_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(test_module)
+
+        test = getattr(test_module, config['class'])()
+        # Set on the instance (overrides the HEADLESS value from .env), parallel tests
+        # must not race on the environment variable
+        test.headless = headless
+        # execute() catches step failures itself: False = failed, None = aborted
+        outcome = test.execute()
+        result['success'] = outcome is True
+        if outcome is None:
+            result['error'] = "Run aborted"
+        elif not outcome:
+            failed = [step for step, _, success in test.step_timings if not success]
+            result['error'] = f"Step '{failed[0]}' failed" if failed else "Transaction failed"
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    if test is not None:
+        result['steps'] = [{'step': step, 'duration': round(duration, 3), 'success': success}
+                           for step, duration, success in test.step_timings]
+    result['duration'] = round(time.perf_counter() - started, 3)
+    return result
+
+def run_test_verbose(test_id: str, headless: bool = False) -> dict[str, Any]:
+    """Runs one test with the banner and result printed around it (sequential runs)"""
     config = TESTS[test_id]
-    
-    # Set HEADLESS for local testing (override .env value)
-    os.environ['HEADLESS'] = 'true' if headless else 'false'
-    
-    # Load test module
-    test_file = project_root / "transactions" / config['dir'] / config['file']
-    spec = importlib.util.spec_from_file_location(config['class'], test_file)
-    test_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(test_module)
-    
-    # Run test
     print(f"\n{'='*60}")
     print(f"Running: {test_id}")
     print(f"Test: {config['class']}")
-    print(f"Browser will open in visible mode")
+    print("Browser runs headless" if headless else "Browser will open in visible mode")
     print('='*60)
-    
-    test_class = getattr(test_module, config['class'])
-    test = test_class()
-    
-    try:
-        test.execute()
-        print('='*60)
-        print(f"✅ {test_id} completed successfully!")
-        print('='*60)
-        return True
-    except Exception as e:
-        print('='*60)
-        print(f"❌ {test_id} failed: {type(e).__name__}: {e}")
-        print('='*60)
-        import traceback
-        traceback.print_exc()
+
+    result = execute_test(test_id, headless)
+
+    print('='*60)
+    if result['success']:
+        print(f"✅ {test_id} completed successfully! ({result['duration']:.1f}s)")
+    else:
+        print(f"❌ {test_id} failed: {result['error']}")
+    print('='*60)
+    if 'traceback' in result:
+        print(result['traceback'])
+    return result
+
+def run_test(test_id: str, headless: bool = False) -> bool:
+    """Run a single test by test_id. Returns True on success, False on failure."""
+    if test_id not in TESTS:
+        print(f"❌ Unknown test: {test_id}")
+        print(f"Available tests: {', '.join(TESTS.keys())}")
         return False
+    return bool(run_test_verbose(test_id, headless)['success'])
+
+def run_tests(test_ids: list[str], jobs: int = 1, headless: bool = False) -> list[dict[str, Any]]:
+    """
+    Runs the tests one after another, or 'jobs' at a time in worker threads. Each test
+    has its own Playwright instance and browser; parallel runs are always headless.
+    Results are returned in the order of 'test_ids'.
+    """
+    if jobs <= 1:
+        return [run_test_verbose(test_id, headless) for test_id in test_ids]
 
-def main():
-    if len(sys.argv) < 2:
+    def run(test_id: str) -> dict[str, Any]:
+        result = execute_test(test_id, headless=True)
+        status = "✅ PASSED" if result['success'] else f"❌ FAILED ({result['error']})"
+        print(f"{status} - {test_id} ({result['duration']:.1f}s)", flush=True)
+        return result
+
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='run_test') as pool:
+        return list(pool.map(run, test_ids))
+
+def junit_xml(results: list[dict[str, Any]], duration: float) -> str:
+    """JUnit XML report; step timings are testcase properties and system-out lines"""
+    failures = sum(1 for result in results if not result['success'])
+    suite = ET.Element('testsuite', name='run_test', tests=str(len(results)), failures=str(failures),
+                       errors='0', skipped='0', time=f"{duration:.3f}",
+                       timestamp=datetime.now().isoformat(timespec='seconds'))
+    for result in results:
+        case = ET.SubElement(suite, 'testcase', name=result['test'],
+                             classname=f"transactions.{result['provider']}.{result['class']}",
+                             time=f"{result['duration']:.3f}")
+        if result['steps']:
+            properties = ET.SubElement(case, 'properties')
+            for step in result['steps']:
+                ET.SubElement(properties, 'property', name=step['step'], value=f"{step['duration']:.3f}")
+        if not result['success']:
+            failure = ET.SubElement(case, 'failure', message=result['error'] or "Failed")
+            failure.text = result.get('traceback')
+        ET.SubElement(case, 'system-out').text = '\n'.join(
+            f"{step['step']}: {step['duration']:.3f}s {'ok' if step['success'] else 'FAILED'}"
+            for step in result['steps']
+        )
+    return ET.tostring(suite, encoding='unicode', xml_declaration=True)
+
+def json_report(results: list[dict[str, Any]], duration: float, jobs: int) -> dict[str, Any]:
+    passed = sum(1 for result in results if result['success'])
+    return {
+        'jobs': jobs,
+        'duration': round(duration, 3),
+        'passed': passed,
+        'failed': len(results) - passed,
+        'tests': results,
+    }
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Runs transactions locally, one at a time with a visible browser or in parallel headless.",
+        epilog=f"Tests: {', '.join(TESTS)}"
+    )
+    parser.add_argument('tests', nargs='*',
+                        help="Test ids, 'all' or patterns such as '*-document' (default with --provider: all)")
+    parser.add_argument('-p', '--provider', action='append', default=[], choices=PROVIDERS,
+                        help='Only tests of this provider directory (repeatable)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of tests run in parallel; more than 1 implies --headless (default: 1)')
+    parser.add_argument('--headless', action='store_true', help='Run without a visible browser')
+    parser.add_argument('--junit', metavar='PATH', help='Write a JUnit XML report')
+    parser.add_argument('--json', metavar='PATH', help='Write a JSON report with per-step timings')
+    parser.add_argument('--list', action='store_true', help='List the selected tests and exit')
+    args = parser.parse_args(argv)
+
+    if not args.tests and not args.provider:
         print(__doc__)
         print(f"\nAvailable tests:")
         for test_id in TESTS.keys():
             print(f"  - {test_id}")
-        sys.exit(1)
-    
-    test_id = sys.argv[1]
-    
-    if test_id == 'all':
-        print(f"\n🚀 Running all {len(TESTS)} tests sequentially...\n")
-        results = {}
-        for tid in TESTS.keys():
-            results[tid] = run_test(tid)
-        
+        return 2
+
+    test_ids = select_tests(args.tests or ['all'], args.provider)
+    if not test_ids:
+        print(f"❌ No test matches: {' '.join(args.tests)}")
+        print(f"Available tests: {', '.join(TESTS.keys())}")
+        return 2
+    if args.list:
+        print('\n'.join(test_ids))
+        return 0
+
+    configure_logging()
+    load_env_file()
+    jobs = max(1, min(args.jobs, len(test_ids)))
+    if len(test_ids) > 1:
+        mode = f"{jobs} in parallel" if jobs > 1 else "sequentially"
+        print(f"\n🚀 Running {len(test_ids)} tests {mode}...\n")
+    started = time.perf_counter()
+    results = run_tests(test_ids, jobs, args.headless or jobs > 1)
+    duration = time.perf_counter() - started
+
+    if args.junit:
+        with open(args.junit, 'w', encoding='utf-8') as f:
+            f.write(junit_xml(results, duration))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(json_report(results, duration, jobs), f, indent=2)
+
+    failed_count = sum(1 for result in results if not result['success'])
+    if len(results) > 1:
         # Summary
         print(f"\n{'='*60}")
         print("SUMMARY")
         print('='*60)
-        for tid, success in results.items():
-            status = "✅ PASSED" if success else "❌ FAILED"
-            print(f"{status} - {tid}")
+        for result in results:
+            status = "✅ PASSED" if result['success'] else "❌ FAILED"
+            print(f"{status} - {result['test']} ({result['duration']:.1f}s)")
         print('='*60)
-        
-        failed_count = sum(1 for success in results.values() if not success)
         if failed_count > 0:
-            print(f"\n❌ {failed_count} test(s) failed")
-            sys.exit(1)
+            print(f"\n❌ {failed_count} test(s) failed ({duration:.0f}s)")
         else:
-            print(f"\n✅ All {len(results)} tests passed!")
-    else:
-        success = run_test(test_id)
-        sys.exit(0 if success else 1)
+            print(f"\n✅ All {len(results)} tests passed! ({duration:.0f}s)")
+    return 1 if failed_count else 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
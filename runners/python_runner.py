@@ -5,38 +5,44 @@ import subprocess
 import importlib.util
 import sys
 import logging
-from typing import Optional
+from typing import Any
 from monitor_base import MonitorBase, TRANS_DURATION, TRANS_SUCCESS, TRANS_LAST_RUN
+from admission import AdmissionController
 
 logger = logging.getLogger(__name__)
 
 class PythonRunner:
-    def __init__(self) -> None:
-        pass
+    def __init__(self, admission: AdmissionController | None = None) -> None:
+        # Checks cgroup memory/PID headroom before a browser is launched
+        self.admission = admission
 
-    def run(self, file_path: str, usecase_name: Optional[str] = None) -> None:
+    def run(self, file_path: str, usecase_name: str | None = None, cache_mode: str = 'cold') -> bool | None:
         """
         Determines if the file contains a MonitorBase subclass or is a raw script,
-        and executes it accordingly.
+        and executes it accordingly. cache_mode ('cold' or 'warm') only applies to classes.
+        Returns True if the transaction succeeded, None if it was not admitted or aborted.
         """
+        actual_name = usecase_name or os.path.basename(file_path).replace('.py', '')
+        if self.admission and not self.admission.admit(actual_name):
+            return None
         try:
             if self._has_monitor_base_class(file_path):
-                self._run_class(file_path, usecase_name)
+                return self._run_class(file_path, usecase_name, cache_mode)
             else:
-                self._run_script(file_path, usecase_name)
+                return self._run_script(file_path, usecase_name)
         except Exception:
             logger.exception(f"Error executing {file_path}")
             # Set metrics for top-level errors
-            actual_name = usecase_name or os.path.basename(file_path).replace('.py', '')
             TRANS_SUCCESS.labels(usecase=actual_name).set(0)
             TRANS_LAST_RUN.labels(usecase=actual_name).set_to_current_time()
+            return False
 
     def _has_monitor_base_class(self, file_path: str) -> bool:
         """
         Parses the file using AST to check for a class inheriting from MonitorBase without importing it.
         """
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
+            with open(file_path, encoding="utf-8") as f:
                 tree = ast.parse(f.read(), filename=file_path)
             
             for node in tree.body:
@@ -48,9 +54,91 @@ class PythonRunner:
         except Exception:
             return False
 
-    def _run_class(self, file_path: str, usecase_name: Optional[str] = None) -> None:
+    def run_journey(self, journey_name: str, entries: list[tuple[str, str]]) -> bool | None:
         """
-        Imports the module and instantiates/runs the MonitorBase subclass.
+        Runs the MonitorBase transactions of one provider in a single browser session.
+        'entries' is a list of (file_path, usecase_name). The first segment logs in; later
+        segments skip their login_steps and start from the page reached after login.
+        A failed segment gets a fresh browser context, so the next one logs in again.
+        Transactions without login_steps and script-based monitors run standalone.
+        Returns True if all transactions succeeded, None if the journey was not admitted
+        or a shutdown aborted it.
+        """
+        if self.admission and not self.admission.admit(journey_name):
+            return None
+        monitors: list[MonitorBase] = []
+        all_success = True
+        for file_path, usecase_name in entries:
+            try:
+                if not self._has_monitor_base_class(file_path):
+                    # None = not admitted, which isn't a failure of the transaction
+                    all_success &= self.run(file_path, usecase_name) is not False
+                    continue
+                for monitor in self._load_monitors(file_path, usecase_name):
+                    if monitor.login_steps:
+                        monitors.append(monitor)
+                        continue
+                    result = monitor.execute()
+                    if result is None:
+                        return None  # shutting down
+                    all_success &= result
+            except Exception:
+                logger.exception(f"Error executing {file_path}")
+                TRANS_SUCCESS.labels(usecase=usecase_name).set(0)
+                TRANS_LAST_RUN.labels(usecase=usecase_name).set_to_current_time()
+                all_success = False
+
+        if not monitors:
+            return all_success
+
+        logger.info(f"[{journey_name}] Journey START ({len(monitors)} segments)")
+        host = monitors[0]
+        try:
+            host.setup()
+        except Exception:
+            logger.error(f"[{journey_name}] Journey setup FAILED", exc_info=True)
+            host.teardown()
+            for monitor in monitors:
+                TRANS_LAST_RUN.labels(usecase=monitor.usecase_name).set_to_current_time()
+                TRANS_SUCCESS.labels(usecase=monitor.usecase_name).set(0)
+            return False
+
+        home_url: str | None = None
+        try:
+            for i, monitor in enumerate(monitors):
+                monitor.attach_session(host)
+                monitor.session_active = home_url is not None
+                monitor.keep_session = i < len(monitors) - 1
+                if home_url:
+                    try:
+                        assert host.page is not None
+                        host.page.goto(home_url)
+                        monitor.wait_for_network_quiet()
+                    except Exception as e:
+                        logger.warning(f"[{journey_name}] Could not return to {home_url}, logging in again: {e}")
+                        host.new_session_page()
+                        monitor.attach_session(host)
+                        monitor.session_active = False
+
+                result = monitor.execute(reuse_session=True)
+                if result is None:
+                    # Shutting down: the remaining segments are not started
+                    return None
+                if result:
+                    home_url = monitor.session_home_url or home_url
+                else:
+                    all_success = False
+                    # Isolate the failure: the next segment starts from a clean context
+                    host.new_session_page()
+                    home_url = None
+        finally:
+            host.teardown()
+        logger.info(f"[{journey_name}] Journey END")
+        return all_success
+
+    def _load_monitors(self, file_path: str, usecase_name: str | None = None) -> list[MonitorBase]:
+        """
+        Imports the module and instantiates its MonitorBase subclasses.
         """
         # Module name must be unique to avoid collisions in sys.modules
         # We use the usecase_name if provided, otherwise the filename
@@ -65,21 +153,75 @@ class PythonRunner:
         sys.modules[module_name] = module
         spec.loader.exec_module(module)
 
-        # Find and run subclasses
-        found = False
+        # Find and instantiate subclasses
+        monitors = []
         for name, obj in module.__dict__.items():
             if isinstance(obj, type) and issubclass(obj, MonitorBase) and obj is not MonitorBase:
-                logger.info(f"Running Class-Based Monitor: {name}")
+                logger.info(f"Loaded Class-Based Monitor: {name}")
                 monitor = obj()
                 if usecase_name:
                     monitor.usecase_name = usecase_name
-                monitor.execute()
-                found = True
+                monitors.append(monitor)
+        return monitors
+
+    def read_monitor_attributes(self, file_path: str) -> dict[str, Any] | None:
+        """
+        Returns the literal class attributes (e.g. cache_modes) of the MonitorBase subclass
+        in a file, using AST so the scheduler doesn't have to import it.
+        Returns None if the file has no MonitorBase subclass.
+        """
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=file_path)
+        except Exception:
+            return None
+
+        attributes: dict[str, Any] | None = None
+
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+            if not any(isinstance(base, ast.Name) and base.id == 'MonitorBase' for base in node.bases):
+                continue
+            if attributes is None:
+                attributes = {}
+            for stmt in node.body:
+                if isinstance(stmt, ast.Assign):
+                    targets, value = stmt.targets, stmt.value
+                elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+                    targets, value = [stmt.target], stmt.value
+                else:
+                    continue
+                try:
+                    literal = ast.literal_eval(value)
+                except (ValueError, TypeError, SyntaxError):
+                    continue
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        attributes[target.id] = literal
+        return attributes
+
+    def _run_class(self, file_path: str, usecase_name: str | None = None,
+                   cache_mode: str = 'cold') -> bool | None:
+        """
+        Imports the module and instantiates/runs the MonitorBase subclass.
+        Returns None if a shutdown aborted the run.
+        """
+        monitors = self._load_monitors(file_path, usecase_name)
+        success = True
+        for monitor in monitors:
+            monitor.cache_mode = cache_mode
+            result = monitor.execute()
+            if result is None:
+                return None
+            success = result and success
         
-        if not found:
+        if not monitors:
             logger.warning(f"No MonitorBase subclass found in {file_path} despite detection.")
+            return False
+        return success
 
-    def _run_script(self, file_path: str, usecase_name: Optional[str] = None) -> None:
+    def _run_script(self, file_path: str, usecase_name: str | None = None) -> bool:
         """
         Runs the file as a subprocess.
         """
@@ -125,3 +267,4 @@ class PythonRunner:
             logger.error(f"[{actual_name}] Execution error: {e}")
         finally:
             TRANS_SUCCESS.labels(usecase=actual_name).set(1 if success else 0)
+        return success
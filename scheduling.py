@@ -0,0 +1,850 @@
+"""
+Scheduling policies for main.py: per-transaction schedule config and adaptive
+per-usecase intervals on top of APScheduler.
+"""
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any
+
+from apscheduler.schedulers.base import BaseScheduler
+from prometheus_client import REGISTRY, Counter, Gauge
+
+from admission import admission_wait
+from cluster import Cluster
+
+logger = logging.getLogger(__name__)
+
+EFFECTIVE_INTERVAL = Gauge(
+    'transaction_effective_interval_seconds',
+    'Interval currently used to schedule the usecase (changes with adaptive scheduling)',
+    ['usecase']
+)
+QUEUE_WAIT = Gauge(
+    'scheduler_queue_wait_seconds',
+    'Time the last run of the job waited in the dispatch queue before a worker picked it up',
+    ['usecase']
+)
+QUEUE_LENGTH = Gauge(
+    'scheduler_queue_length',
+    'Number of runs waiting in the dispatch queue'
+)
+SKIPPED_RUNS = Counter(
+    'scheduler_skipped_runs_total',
+    'Runs dropped by the dispatcher, by reason (overrun = catch-up policy, deadline = started too late)',
+    ['usecase', 'reason']
+)
+RATE_LIMITED = Counter(
+    'scheduler_rate_limited_total',
+    'Runs held back because their rate group (e.g. a shared identity provider) had no tokens left',
+    ['group']
+)
+WORKERS = Gauge(
+    'scheduler_workers',
+    'Number of dispatcher workers executing runs in parallel'
+)
+DEMAND = Gauge(
+    'scheduler_demand_workers',
+    'Worker time the schedule needs: sum of mean run duration / interval over all jobs'
+)
+UTILIZATION = Gauge(
+    'scheduler_utilization_ratio',
+    'Demand divided by the current number of workers (above 1 the queue falls behind)'
+)
+REQUIRED_WORKERS = Gauge(
+    'scheduler_required_workers',
+    'Workers needed to keep utilization at the target'
+)
+REQUIRED_MEMORY = Gauge(
+    'scheduler_required_memory_bytes',
+    'Memory the required workers need, based on the largest browser peak RSS of recent runs'
+)
+
+# Sidecar file next to transactions that overrides their schedule class attributes
+SIDECAR_FILE = 'schedule.json'
+DEFAULT_PRIORITY = 5
+# What to do when a job fires while its previous run is still queued or running
+CATCH_UP_POLICIES = ('skip', 'once', 'spread')
+# Schedule keys -> MonitorBase class attribute they default from
+SCHEDULE_ATTRIBUTES = {
+    'interval': 'schedule_interval',
+    'jitter': 'schedule_jitter',
+    'priority': 'priority',
+    'active_windows': 'active_windows',
+    'deadline': 'schedule_deadline',
+    'catch_up': 'catch_up',
+    'rate_group': 'rate_group',
+}
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# Parsed active window: (start minute of day, end minute of day, weekdays 0=Mon)
+Window = tuple[int, int, set[int]]
+
+
+def _parse_days(spec: str) -> set[int]:
+    """Parses 'mon-fri' or 'sat,sun' into weekday numbers"""
+    days: set[int] = set()
+    for part in spec.lower().split(','):
+        first, _, last = part.strip().partition('-')
+        start = WEEKDAYS.index(first)
+        end = WEEKDAYS.index(last) if last else start
+        days.update(range(start, end + 1) if start <= end else list(range(start, 7)) + list(range(0, end + 1)))
+    return days
+
+
+def parse_window(window: Any) -> Window:
+    """Parses ("HH:MM", "HH:MM"[, "mon-fri"]) into a Window. Windows may cross midnight."""
+    def minutes(value: str) -> int:
+        hours, mins = value.split(':')
+        return int(hours) * 60 + int(mins)
+    days = _parse_days(window[2]) if len(window) > 2 else set(range(7))
+    return minutes(window[0]), minutes(window[1]), days
+
+
+def in_active_window(windows: list[Window], now: datetime) -> bool:
+    """True if 'now' lies in one of the windows (no windows = always active)"""
+    if not windows:
+        return True
+    minute = now.hour * 60 + now.minute
+    for start, end, days in windows:
+        if start <= end:
+            if now.weekday() in days and start <= minute < end:
+                return True
+        # Overnight window: the part after midnight belongs to the previous day
+        elif (now.weekday() in days and minute >= start) or ((now.weekday() - 1) % 7 in days and minute < end):
+            return True
+    return False
+
+
+def load_schedule(file_path: str, attributes: dict[str, Any] | None, default_interval: float,
+                  default_catch_up: str = 'once') -> dict[str, Any]:
+    """
+    Resolves interval, jitter, priority, active_windows, deadline, catch_up and rate_group
+    for a transaction. Precedence: defaults < class attributes (schedule_interval,
+    schedule_jitter, priority, active_windows, schedule_deadline, catch_up, rate_group)
+    < schedule.json in the same directory ("*" entry, then the file's entry).
+    """
+    schedule: dict[str, Any] = {'interval': default_interval, 'jitter': 0, 'priority': DEFAULT_PRIORITY,
+                                'active_windows': [], 'deadline': None, 'catch_up': default_catch_up,
+                                'rate_group': None}
+    for key, attribute in SCHEDULE_ATTRIBUTES.items():
+        if attributes and attributes.get(attribute) is not None:
+            schedule[key] = attributes[attribute]
+
+    sidecar = os.path.join(os.path.dirname(file_path), SIDECAR_FILE)
+    if os.path.exists(sidecar):
+        try:
+            with open(sidecar, encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring invalid {sidecar}: {e}")
+            config = {}
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        for section in (config.get('*', {}), config.get(stem, {})):
+            schedule.update({key: value for key, value in section.items() if key in SCHEDULE_ATTRIBUTES})
+
+    try:
+        schedule['active_windows'] = [parse_window(window) for window in schedule['active_windows']]
+    except (ValueError, IndexError, AttributeError, TypeError) as e:
+        logger.error(f"Ignoring invalid active_windows for {file_path}: {e}")
+        schedule['active_windows'] = []
+    if schedule['catch_up'] not in CATCH_UP_POLICIES:
+        logger.error(f"Ignoring unknown catch_up '{schedule['catch_up']}' for {file_path}")
+        schedule['catch_up'] = default_catch_up
+    return schedule
+
+
+def merge_schedules(schedules: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Combines the schedules of the transactions in a journey: shortest interval, largest
+    jitter, most urgent priority, tightest deadline, and active whenever any transaction
+    is active. The catch-up policy and rate group of the first transaction apply.
+    """
+    deadlines = [schedule['deadline'] for schedule in schedules if schedule['deadline']]
+    windows: list[Window] = []
+    for schedule in schedules:
+        if not schedule['active_windows']:
+            windows = []
+            break
+        windows.extend(schedule['active_windows'])
+    return {
+        'interval': min(schedule['interval'] for schedule in schedules),
+        'jitter': max(schedule['jitter'] for schedule in schedules),
+        'priority': min(schedule['priority'] for schedule in schedules),
+        'active_windows': windows,
+        'deadline': min(deadlines) if deadlines else None,
+        'catch_up': schedules[0]['catch_up'],
+        'rate_group': schedules[0]['rate_group'],
+    }
+
+
+def parse_rate_limits(spec: str) -> dict[str, tuple[int, float]]:
+    """Parses 'ionos-id:6/60,telekom-idm:4/60' into {group: (runs, per seconds)}"""
+    limits: dict[str, tuple[int, float]] = {}
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        try:
+            group, _, rate = part.partition(':')
+            runs, _, period = rate.partition('/')
+            limits[group.strip()] = (int(runs), float(period))
+        except ValueError:
+            logger.error(f"Ignoring invalid rate limit '{part}'")
+    return limits
+
+
+class RateLimiter:
+    """
+    Token buckets per rate group: a group allows 'runs' starts per 'period' seconds,
+    with bursts of up to 'runs'. Groups without a limit are never held back.
+    """
+
+    def __init__(self, limits: dict[str, tuple[int, float]]) -> None:
+        self.limits = limits
+        self._lock = threading.Lock()
+        # group -> (tokens, last refill)
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def acquire(self, group: str | None) -> float:
+        """Takes a token and returns 0, or returns the seconds until a token is available"""
+        if group not in self.limits:
+            return 0
+        runs, period = self.limits[group]
+        rate = runs / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(group, (float(runs), now))
+            tokens = min(float(runs), tokens + (now - last) * rate)
+            if tokens >= 1:
+                self._buckets[group] = (tokens - 1, now)
+                return 0
+            self._buckets[group] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class PriorityDispatcher:
+    """
+    Priority queue between the APScheduler triggers and the browser workers.
+
+    APScheduler only submits runs; 'workers' threads pick the most urgent ready run
+    (lowest priority value, then earliest deadline). A run that starts after its deadline
+    is dropped. When a job fires while its previous run is still queued or running, the
+    catch-up policy decides: 'skip' drops the new run, 'once' keeps at most one pending
+    run, 'spread' keeps one pending run but delays it by 'spread_delay' so a backlog
+    doesn't fire back-to-back. With a RateLimiter, a run whose rate group is out of
+    tokens waits while other ready runs go first. A job never runs on two workers at
+    once: its pending run stays queued until the running one finishes.
+    """
+
+    def __init__(self, workers: int = 1, limiter: RateLimiter | None = None) -> None:
+        self.workers = workers
+        self.limiter = limiter
+        self._cond = threading.Condition()
+        self._heap: list[tuple[int, float, int, dict[str, Any]]] = []
+        self._seq = itertools.count()
+        self._queued: dict[str, int] = {}
+        self._running: set[str] = set()
+        self._threads: list[threading.Thread] = []
+        self._thread_ids = itertools.count()
+        # Workers that should exit after their current run (see resize())
+        self._retire = 0
+        self._stopping = False
+
+    def start(self) -> None:
+        for _ in range(self.workers):
+            self._spawn()
+        WORKERS.set(self.workers)
+
+    def _spawn(self) -> None:
+        thread = threading.Thread(target=self._worker, name=f"dispatcher-{next(self._thread_ids)}", daemon=True)
+        with self._cond:
+            self._threads.append(thread)
+        thread.start()
+
+    def resize(self, workers: int) -> None:
+        """Changes the number of workers; surplus workers exit after their current run"""
+        with self._cond:
+            if self._stopping:
+                return
+            current = len(self._threads) - self._retire
+            self.workers = workers
+            WORKERS.set(workers)
+            if workers < current:
+                self._retire += current - workers
+                self._cond.notify_all()
+                return
+            spawn = workers - current
+            # Cancel pending retirements before starting new threads
+            cancelled = min(self._retire, spawn)
+            self._retire -= cancelled
+            spawn -= cancelled
+        for _ in range(spawn):
+            self._spawn()
+
+    def stop(self, wait: bool = True, timeout: float | None = None) -> bool:
+        """
+        Stops admitting runs, drops the queue and (optionally) waits up to 'timeout'
+        seconds for running ones. Returns True if no run is left in flight.
+        """
+        with self._cond:
+            self._stopping = True
+            self._heap.clear()
+            self._queued.clear()
+            QUEUE_LENGTH.set(0)
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            for thread in threads:
+                thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        with self._cond:
+            return not self._running
+
+    def submit(self, job_id: str, name: str, func: Callable[[], Any], priority: int = DEFAULT_PRIORITY,
+               deadline: float | None = None, catch_up: str = 'once', spread_delay: float = 0,
+               rate_group: str | None = None) -> bool:
+        """
+        Queues func() for a worker. 'deadline' is the number of seconds the run may wait
+        before it is dropped. Returns False if the run was not queued.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if self._stopping:
+                return False
+            queued = self._queued.get(job_id, 0)
+            not_before = now
+            if queued or job_id in self._running:
+                if queued or catch_up == 'skip':
+                    SKIPPED_RUNS.labels(usecase=name, reason='overrun').inc()
+                    logger.info(f"[{name}] Previous run still pending, dropping this one ({catch_up})")
+                    return False
+                if catch_up == 'spread':
+                    not_before = now + spread_delay
+            entry: dict[str, Any] = {
+                'job_id': job_id, 'name': name, 'func': func, 'enqueued': now,
+                'not_before': not_before, 'deadline': now + deadline if deadline else None,
+                'rate_group': rate_group,
+            }
+            sort_deadline = entry['deadline'] if entry['deadline'] is not None else float('inf')
+            heapq.heappush(self._heap, (priority, sort_deadline, next(self._seq), entry))
+            self._queued[job_id] = queued + 1
+            QUEUE_LENGTH.set(len(self._heap))
+            self._cond.notify()
+        return True
+
+    def state(self, job_id: str) -> str | None:
+        """'running', 'queued' or None if the job has no pending run"""
+        with self._cond:
+            if job_id in self._running:
+                return 'running'
+            return 'queued' if self._queued.get(job_id) else None
+
+    def promote(self, job_id: str, priority: int) -> bool:
+        """Raises the priority of the job's queued run and makes it ready now. False if none is queued."""
+        with self._cond:
+            found = False
+            for i, item in enumerate(self._heap):
+                if item[3]['job_id'] == job_id:
+                    self._heap[i] = (min(priority, item[0]),) + item[1:]
+                    item[3]['not_before'] = min(item[3]['not_before'], time.monotonic())
+                    found = True
+            if found:
+                heapq.heapify(self._heap)
+                self._cond.notify()
+            return found
+
+    def _pop_ready(self) -> tuple[dict[str, Any] | None, float | None]:
+        """Pops the most urgent ready entry, or returns how long until one becomes ready"""
+        now = time.monotonic()
+        delayed = []
+        blocked = []
+        entry = None
+        while self._heap:
+            item = heapq.heappop(self._heap)
+            candidate = item[3]
+            # Wait for the job's running instance; its worker notifies when it finishes
+            if candidate['job_id'] in self._running:
+                blocked.append(item)
+                continue
+            if candidate['not_before'] > now:
+                delayed.append(item)
+                continue
+            # Runs past their deadline are dropped by the worker without using a token
+            if self.limiter and (candidate['deadline'] is None or now <= candidate['deadline']):
+                wait = self.limiter.acquire(candidate['rate_group'])
+                if wait > 0:
+                    RATE_LIMITED.labels(group=candidate['rate_group']).inc()
+                    logger.info(f"[{candidate['name']}] Rate group '{candidate['rate_group']}' exhausted, "
+                                f"delaying run by {wait:.0f}s")
+                    candidate['not_before'] = now + wait
+                    delayed.append(item)
+                    continue
+            entry = candidate
+            break
+        for item in delayed + blocked:
+            heapq.heappush(self._heap, item)
+        if entry:
+            return entry, None
+        ready_at = min((item[3]['not_before'] for item in delayed), default=None)
+        return None, (ready_at - now if ready_at is not None else None)
+
+    def _retire_current(self) -> bool:
+        """Called with the lock held: True if this worker thread should exit (pool shrunk)"""
+        current = threading.current_thread()
+        if self._retire and current in self._threads:
+            self._retire -= 1
+            self._threads.remove(current)
+            return True
+        return False
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                if self._retire_current():
+                    return
+                entry, wait = self._pop_ready()
+                while entry is None:
+                    if self._stopping or self._retire_current():
+                        return
+                    self._cond.wait(timeout=wait)
+                    entry, wait = self._pop_ready()
+                job_id = entry['job_id']
+                self._queued[job_id] = self._queued.get(job_id, 1) - 1
+                QUEUE_LENGTH.set(len(self._heap))
+                now = time.monotonic()
+                if entry['deadline'] is not None and now > entry['deadline']:
+                    SKIPPED_RUNS.labels(usecase=entry['name'], reason='deadline').inc()
+                    logger.warning(f"[{entry['name']}] Missed its start deadline after "
+                                   f"{now - entry['enqueued']:.0f}s in queue, dropping run")
+                    continue
+                self._running.add(job_id)
+
+            QUEUE_WAIT.labels(usecase=entry['name']).set(now - entry['enqueued'])
+            try:
+                entry['func']()
+            except Exception:
+                logger.exception(f"[{entry['name']}] Run failed in dispatcher")
+            finally:
+                with self._cond:
+                    self._running.discard(job_id)
+                    self._cond.notify_all()
+
+
+class StateStore:
+    """
+    Small SQLite store for scheduler state that must survive a restart of main.py:
+    the last start time of every job, the AdaptiveInterval state per usecase, the
+    step duration baselines (anomaly.BaselineEngine) and the SLO run buckets (slo.SloTracker).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS job_runs (job_id TEXT PRIMARY KEY, last_run REAL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS adaptive_state (usecase TEXT PRIMARY KEY, state TEXT)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS step_baselines '
+                               '(usecase TEXT, step TEXT, state TEXT, PRIMARY KEY (usecase, step))')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS slo_buckets (slo TEXT, objective TEXT, start REAL, '
+                               'total INTEGER, bad INTEGER, PRIMARY KEY (slo, objective, start))')
+
+    def last_run(self, job_id: str) -> float | None:
+        """Unix time of the job's last start, or None if it never ran"""
+        with self._lock:
+            row = self._conn.execute('SELECT last_run FROM job_runs WHERE job_id = ?', (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def record_run(self, job_id: str, timestamp: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO job_runs (job_id, last_run) VALUES (?, ?)',
+                               (job_id, timestamp))
+
+    def load_adaptive(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            rows = self._conn.execute('SELECT usecase, state FROM adaptive_state').fetchall()
+        states = {}
+        for usecase, state in rows:
+            try:
+                states[usecase] = json.loads(state)
+            except ValueError:
+                logger.warning(f"[{usecase}] Ignoring corrupt adaptive state")
+        return states
+
+    def save_adaptive(self, usecase: str, state: dict[str, float]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO adaptive_state (usecase, state) VALUES (?, ?)',
+                               (usecase, json.dumps(state)))
+
+    def load_baselines(self) -> dict[tuple[str, str], dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute('SELECT usecase, step, state FROM step_baselines').fetchall()
+        states = {}
+        for usecase, step, state in rows:
+            try:
+                states[usecase, step] = json.loads(state)
+            except ValueError:
+                logger.warning(f"[{usecase}] Ignoring corrupt baseline of step '{step}'")
+        return states
+
+    def save_baselines(self, states: dict[tuple[str, str], dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO step_baselines (usecase, step, state) VALUES (?, ?, ?)',
+                                   [(usecase, step, json.dumps(state)) for (usecase, step), state in states.items()])
+
+    def load_slo_buckets(self, since: float) -> list[tuple[str, str, float, int, int]]:
+        with self._lock:
+            return self._conn.execute('SELECT slo, objective, start, total, bad FROM slo_buckets WHERE start >= ? '
+                                      'ORDER BY start', (since,)).fetchall()
+
+    def save_slo_buckets(self, rows: list[tuple[str, str, float, int, int]], keep_since: float) -> None:
+        """Upserts (slo, objective, start, total, bad) rows and deletes buckets older than 'keep_since'"""
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO slo_buckets (slo, objective, start, total, bad) '
+                                   'VALUES (?, ?, ?, ?, ?)', rows)
+            self._conn.execute('DELETE FROM slo_buckets WHERE start < ?', (keep_since,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class AdaptiveInterval:
+    """
+    Per-usecase interval policy.
+
+    After a failure the usecase moves to the re-check lane and runs every 'recheck'
+    seconds until 'confirmations' further runs confirmed the incident (it goes back to
+    its base interval) or a success cleared it. While a usecase keeps succeeding its
+    interval grows by 'factor' every 'stable_runs' successes, up to 'maximum'.
+    """
+
+    def __init__(self, recheck: float, maximum: float, factor: float = 1.5,
+                 stable_runs: int = 12, confirmations: int = 2) -> None:
+        self.recheck = recheck
+        self.maximum = maximum
+        self.factor = factor
+        self.stable_runs = stable_runs
+        self.confirmations = confirmations
+        self._lock = threading.Lock()
+        self._state: dict[str, dict[str, float]] = {}
+
+    def register(self, key: str, base: float) -> float:
+        """Registers a usecase with its base interval and returns the interval to use"""
+        with self._lock:
+            state = self._state.setdefault(key, {'interval': base, 'successes': 0, 'failures': 0})
+            # Restored state from a different configuration must stay within the current bounds
+            if state.get('base') != base and not min(self.recheck, base) <= state['interval'] <= max(self.maximum, base):
+                state['interval'] = base
+            state['base'] = base
+            return state['interval']
+
+    def restore(self, states: dict[str, dict[str, float]]) -> None:
+        """Loads per-usecase state saved by a previous process (see export())"""
+        with self._lock:
+            for key, state in states.items():
+                if {'interval', 'successes', 'failures'} <= set(state):
+                    self._state[key] = dict(state)
+
+    def record(self, key: str, success: bool) -> float:
+        """Records a run result and returns the interval until the next run"""
+        with self._lock:
+            state = self._state[key]
+            base = state['base']
+            if success:
+                state['failures'] = 0
+                state['successes'] += 1
+                if state['interval'] < base:
+                    # Incident cleared on the re-check lane
+                    state['interval'] = base
+                    state['successes'] = 0
+                elif state['successes'] >= self.stable_runs:
+                    state['interval'] = min(max(state['interval'] * self.factor, base),
+                                            max(self.maximum, base))
+                    state['successes'] = 0
+            else:
+                state['successes'] = 0
+                state['failures'] += 1
+                # Re-check quickly until the incident is confirmed, then fall back to base
+                state['interval'] = min(self.recheck, base) if state['failures'] <= self.confirmations else base
+            return state['interval']
+
+    def export(self) -> dict[str, dict[str, float]]:
+        """Returns a copy of the per-usecase state"""
+        with self._lock:
+            return {key: dict(state) for key, state in self._state.items()}
+
+
+class CapacityPlanner:
+    """
+    Estimates the parallelism the schedule needs from the last 'window' runs of every
+    job: demand = sum(mean duration / interval), in workers. Required workers keep the
+    utilization (demand / workers) at 'target'. With autoscale the dispatcher's pool is
+    resized within [min_workers, max_workers] when utilization rises above 'threshold'
+    or falls below half of it.
+    """
+
+    def __init__(self, dispatcher: PriorityDispatcher | None = None, window: int = 10,
+                 target: float = 0.7, threshold: float = 0.8, min_workers: int = 1,
+                 max_workers: int = 1, autoscale: bool = False) -> None:
+        self.dispatcher = dispatcher
+        self.window = window
+        self.target = target
+        self.threshold = threshold
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.autoscale = autoscale
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict[str, Any]] = {}
+        self._behind = False
+
+    def record(self, job_id: str, duration: float, interval: float, peak_rss: float | None = None) -> None:
+        """Adds a finished run and re-evaluates the capacity"""
+        with self._lock:
+            job = self._jobs.setdefault(job_id, {'durations': deque(maxlen=self.window),
+                                                 'rss': deque(maxlen=self.window)})
+            job['durations'].append(duration)
+            job['interval'] = interval
+            if peak_rss:
+                job['rss'].append(peak_rss)
+        self.evaluate()
+
+    def evaluate(self) -> dict[str, float]:
+        with self._lock:
+            demand = sum(sum(job['durations']) / len(job['durations']) / job['interval']
+                         for job in self._jobs.values())
+            peak_rss = max((rss for job in self._jobs.values() for rss in job['rss']), default=0)
+        workers = self.dispatcher.workers if self.dispatcher else 1
+        utilization = demand / workers
+        required = max(1, math.ceil(demand / self.target))
+        DEMAND.set(demand)
+        UTILIZATION.set(utilization)
+        REQUIRED_WORKERS.set(required)
+        REQUIRED_MEMORY.set(required * peak_rss)
+
+        if (utilization > 1) != self._behind:
+            self._behind = utilization > 1
+            if self._behind:
+                logger.warning(f"Schedule needs {demand:.2f} workers but only {workers} run, "
+                               f"runs are falling behind (required: {required})")
+            else:
+                logger.info(f"Schedule fits into {workers} worker(s) again ({demand:.2f} needed)")
+        if self.autoscale and self.dispatcher and (utilization > self.threshold or utilization < self.threshold / 2):
+            target_workers = min(max(required, self.min_workers), self.max_workers)
+            if target_workers != workers:
+                logger.info(f"Resizing worker pool {workers} -> {target_workers} (utilization {utilization:.2f})")
+                self.dispatcher.resize(target_workers)
+        return {'demand': demand, 'utilization': utilization, 'required_workers': required,
+                'required_memory_bytes': required * peak_rss}
+
+
+def _peak_rss(usecases: list[str]) -> float | None:
+    """Browser peak RSS of the last run (exported by MonitorBase, needs resource sampling)"""
+    values = [REGISTRY.get_sample_value('transaction_browser_peak_rss_bytes', {'usecase': usecase, 'step': 'total'})
+              for usecase in usecases]
+    return max((value for value in values if value), default=None)
+
+
+class AdaptiveJobs:
+    """
+    Registers interval jobs on an APScheduler scheduler and reschedules them after
+    every run according to an AdaptiveInterval policy (None = fixed intervals).
+    With a dispatcher, APScheduler only queues the runs and the dispatcher executes them.
+    With a store, last start times and adaptive state are persisted so that a restart
+    resumes each job's cadence instead of running everything at once.
+    With a cluster, every node schedules all jobs but only runs the ones it owns.
+    With a planner, run durations feed the capacity estimate.
+    """
+
+    def __init__(self, scheduler: BaseScheduler, policy: AdaptiveInterval | None = None,
+                 dispatcher: PriorityDispatcher | None = None, store: StateStore | None = None,
+                 cluster: Cluster | None = None, planner: CapacityPlanner | None = None) -> None:
+        self.scheduler = scheduler
+        self.policy = policy
+        self.dispatcher = dispatcher
+        self.store = store
+        self.cluster = cluster
+        self.planner = planner
+        self._jobs: dict[str, dict[str, Any]] = {}
+        # Watchers (objects with started() and finished(success)) of the next / current run
+        self._lock = threading.Lock()
+        self._waiters: dict[str, list[Any]] = {}
+        self._active: dict[str, list[Any]] = {}
+        # Jobs whose next run was requested on demand and ignores active windows
+        self._forced: set[str] = set()
+        if store and policy:
+            policy.restore(store.load_adaptive())
+
+    def add(self, job_id: str, name: str, func: Callable[..., bool], args: list[Any],
+            interval: float, start_time: datetime, usecases: list[str] | None = None,
+            jitter: float = 0, active_windows: list[Window] | None = None,
+            priority: int = DEFAULT_PRIORITY, deadline: float | None = None,
+            catch_up: str = 'once', rate_group: str | None = None) -> None:
+        """
+        Adds a job; 'func(*args)' must return True on success (None if the run didn't happen).
+        'usecases' are the usecase labels the job reports (defaults to [name], a journey
+        reports all its transactions).
+        Runs outside 'active_windows' are skipped. priority, deadline (default: one interval),
+        catch_up and rate_group are passed to the dispatcher.
+        """
+        self._jobs[job_id] = {'name': name, 'func': func, 'args': args, 'interval': interval,
+                              'usecases': usecases or [name], 'jitter': jitter or None,
+                              'active_windows': active_windows or [], 'priority': priority,
+                              'deadline': deadline, 'catch_up': catch_up, 'rate_group': rate_group}
+        if self.policy:
+            interval = self.policy.register(name, interval)
+        self._jobs[job_id]['current'] = interval
+        last_run = self.store.last_run(job_id) if self.store else None
+        if last_run is not None:
+            resumed = datetime.fromtimestamp(last_run) + timedelta(seconds=interval)
+            # Overdue jobs keep the start time they were given (staggered by the caller)
+            if resumed > datetime.now():
+                logger.info(f"[{name}] Resuming cadence, next run at {resumed}")
+                start_time = resumed
+        self.scheduler.add_job(
+            self.trigger,
+            'interval',
+            seconds=interval,
+            next_run_time=start_time,
+            args=[job_id],
+            id=job_id,
+            jitter=self._jobs[job_id]['jitter'],
+            replace_existing=True
+        )
+        self._export(job_id)
+
+    def trigger(self, job_id: str) -> None:
+        """Called by APScheduler: queues the run on the dispatcher, or runs it directly"""
+        job = self._jobs[job_id]
+        # The lease lasts half an interval, so a new owner can't repeat a run that just started elsewhere
+        if self.cluster and not self.cluster.claim(job_id, job['current'] / 2):
+            return
+        if not self.dispatcher:
+            self.run(job_id)
+            return
+        self.dispatcher.submit(
+            job_id,
+            job['name'],
+            partial(self.run, job_id),
+            priority=job['priority'],
+            deadline=job['deadline'] or job['current'],
+            catch_up=job['catch_up'],
+            spread_delay=job['current'] / 2,
+            rate_group=job['rate_group']
+        )
+
+    def find_jobs(self, usecase: str | None = None, provider: str | None = None) -> list[str]:
+        """Job ids that report the usecase, or any usecase of the provider directory"""
+        return [job_id for job_id, job in self._jobs.items()
+                if (usecase and usecase in job['usecases'])
+                or (provider and any(name.startswith(f"{provider}_") for name in job['usecases']))]
+
+    def usecases(self, job_id: str) -> list[str]:
+        return list(self._jobs[job_id]['usecases'])
+
+    def watch(self, job_id: str, watcher: Any) -> None:
+        """Notifies 'watcher' about the job's current run, or its next one if none is running"""
+        with self._lock:
+            if job_id in self._active:
+                self._active[job_id].append(watcher)
+                watcher.started()
+            else:
+                self._waiters.setdefault(job_id, []).append(watcher)
+
+    def run_now(self, job_id: str, watcher: Any, priority: int = 0) -> bool:
+        """
+        Requests an immediate run at 'priority' that ignores active windows. If the job is
+        already queued or running no second run is added: a queued run is promoted and
+        'watcher' follows the pending run. Returns True if a new run was queued.
+        """
+        job = self._jobs[job_id]
+        self.watch(job_id, watcher)
+        if not self.dispatcher:
+            self._force(job_id, True)
+            threading.Thread(target=self.run, args=(job_id,), name=f"run-{job_id}", daemon=True).start()
+            return True
+        state = self.dispatcher.state(job_id)
+        if state == 'running':
+            # The watcher follows the current run, the next scheduled one keeps its windows
+            return False
+        # Marked before the run is handed over, a worker may pick it up right away
+        self._force(job_id, True)
+        if state == 'queued':
+            if not self.dispatcher.promote(job_id, priority):
+                self._force(job_id, False)
+            return False
+        queued = self.dispatcher.submit(job_id, job['name'], partial(self.run, job_id), priority=priority,
+                                        catch_up='skip', rate_group=job['rate_group'])
+        if not queued:
+            self._force(job_id, False)
+        return queued
+
+    def _force(self, job_id: str, forced: bool) -> None:
+        """Marks the job's next run as on demand (ignores active windows), or clears the mark"""
+        with self._lock:
+            if forced:
+                self._forced.add(job_id)
+            else:
+                self._forced.discard(job_id)
+
+    def run(self, job_id: str) -> None:
+        """Runs a job and applies the adaptive interval for its next run"""
+        job = self._jobs[job_id]
+        with self._lock:
+            forced = job_id in self._forced
+            self._forced.discard(job_id)
+            if not forced and not in_active_window(job['active_windows'], datetime.now()):
+                logger.debug(f"[{job['name']}] Outside active windows, skipping run")
+                return
+            watchers = self._active[job_id] = self._waiters.pop(job_id, [])
+            for watcher in watchers:
+                watcher.started()
+        result = None
+        started = time.monotonic()
+        waited = admission_wait()
+        try:
+            if self.store:
+                self.store.record_run(job_id, time.time())
+            result = job['func'](*job['args'])
+        finally:
+            with self._lock:
+                watchers = self._active.pop(job_id, [])
+            for watcher in watchers:
+                watcher.finished(bool(result))
+        # None: the run didn't happen (e.g. not admitted), keep interval and capacity stats as they are
+        if result is None:
+            return
+        success = bool(result)
+        if self.planner:
+            # Time deferred by admission control is not demand; counting it would scale up under memory pressure
+            duration = time.monotonic() - started - (admission_wait() - waited)
+            self.planner.record(job_id, duration, job['current'], _peak_rss(job['usecases']))
+        if not self.policy:
+            return
+        interval = self.policy.record(job['name'], success)
+        if self.store:
+            self.store.save_adaptive(job['name'], self.policy.export()[job['name']])
+        if interval != job['current']:
+            logger.info(f"[{job['name']}] Interval {job['current']:.0f}s -> {interval:.0f}s "
+                        f"({'success' if success else 'failure'})")
+            job['current'] = interval
+            self.scheduler.reschedule_job(job_id, trigger='interval', seconds=interval, jitter=job['jitter'])
+        self._export(job_id)
+
+    def _export(self, job_id: str) -> None:
+        job = self._jobs[job_id]
+        for usecase in job['usecases']:
+            EFFECTIVE_INTERVAL.labels(usecase=usecase).set(job['current'])
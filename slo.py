@@ -0,0 +1,272 @@
+"""
+Service level objectives computed in-process from the runs, exported as ready-made
+gauges instead of avg_over_time() over months of transaction_success at query time.
+
+slo.json declares the SLOs by name. Each one covers the usecases of a provider
+directory or matching patterns, and has an availability and/or a latency objective:
+
+    {
+      "hidrive-next": {"provider": "hidrive-next", "availability": 0.98,
+                       "latency": {"seconds": 120, "target": 0.95}, "window_days": 30},
+      "logins": {"usecases": ["*_picture_test"], "availability": 0.99}
+    }
+
+Availability counts every run, latency counts successful runs faster than 'seconds'
+(failed runs already spend the availability budget). Runs are counted in minute
+buckets with running totals, so every burn-rate window is two lookups, however long.
+"""
+import bisect
+import fnmatch
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from prometheus_client import Gauge
+
+logger = logging.getLogger(__name__)
+
+SLO_TARGET = Gauge(
+    'slo_objective_ratio',
+    'Target share of good runs of the SLO objective',
+    ['slo', 'objective']
+)
+SLO_SLI = Gauge(
+    'slo_sli_ratio',
+    'Share of good runs over the SLO window',
+    ['slo', 'objective']
+)
+SLO_BURN_RATE = Gauge(
+    'slo_burn_rate',
+    'Error budget burn rate over the window (1 = the budget lasts exactly the SLO window)',
+    ['slo', 'objective', 'window']
+)
+SLO_BUDGET_REMAINING = Gauge(
+    'slo_error_budget_remaining_ratio',
+    'Share of the error budget left over the SLO window (negative = overspent)',
+    ['slo', 'objective']
+)
+
+OBJECTIVES = ('availability', 'latency')
+# Burn-rate windows, pairs of a long and a short window make the multi-window alerts
+WINDOWS = (('5m', 300), ('30m', 1800), ('1h', 3600), ('2h', 7200), ('6h', 21600), ('1d', 86400), ('3d', 259200))
+BUCKET_SECONDS = 60
+DEFAULT_WINDOW_DAYS = 30
+
+
+def _objective(name: str, spec: dict[str, Any], objective: str) -> float | None:
+    """Target of an objective in a slo.json entry, None if it is missing or invalid"""
+    value = spec.get(objective)
+    if value is None:
+        return None
+    target = value.get('target') if isinstance(value, dict) else value
+    if not isinstance(target, (int, float)) or not 0 < target < 1:
+        logger.error(f"Ignoring {objective} objective of SLO '{name}': target must be between 0 and 1")
+        return None
+    return float(target)
+
+
+def load_slos(path: str) -> list[dict[str, Any]]:
+    """Parses slo.json; a missing file means no SLOs, invalid entries are skipped"""
+    if not path or not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring invalid {path}: {e}")
+        return []
+    slos = []
+    for name, spec in sorted(config.items()):
+        patterns = spec.get('usecases') or ([f"{spec['provider']}_*"] if spec.get('provider') else [])
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        objectives = {}
+        for objective in OBJECTIVES:
+            target = _objective(name, spec, objective)
+            if target is not None:
+                objectives[objective] = target
+        latency = spec.get('latency')
+        if 'latency' in objectives and not (isinstance(latency, dict) and latency.get('seconds', 0) > 0):
+            logger.error(f"Ignoring latency objective of SLO '{name}': 'seconds' is required")
+            del objectives['latency']
+        if not patterns or not objectives:
+            logger.error(f"Ignoring SLO '{name}': needs 'provider' or 'usecases' and an objective")
+            continue
+        slos.append({'name': name, 'patterns': patterns, 'objectives': objectives,
+                     'latency_seconds': float(latency['seconds']) if 'latency' in objectives else None,
+                     'window': float(spec.get('window_days', DEFAULT_WINDOW_DAYS)) * 86400})
+    return slos
+
+
+class RunCounter:
+    """
+    Total and bad runs per minute bucket over the last 'horizon' seconds, stored as
+    running totals: the runs in any window are the last totals minus the ones before it.
+    """
+
+    def __init__(self, horizon: float) -> None:
+        self.horizon = horizon
+        self._starts: list[float] = []
+        self._totals: list[int] = []
+        self._bads: list[int] = []
+        # Running totals of the buckets already dropped
+        self._dropped = (0, 0)
+
+    def add(self, timestamp: float, bad: bool, runs: int = 1) -> float:
+        """Counts runs; returns the start of their bucket"""
+        start = timestamp - timestamp % BUCKET_SECONDS
+        total, bads = (self._totals[-1], self._bads[-1]) if self._starts else self._dropped
+        if self._starts and self._starts[-1] == start:
+            self._totals[-1] += runs
+            self._bads[-1] += runs if bad else 0
+        elif not self._starts or self._starts[-1] < start:
+            self._starts.append(start)
+            self._totals.append(total + runs)
+            self._bads.append(bads + (runs if bad else 0))
+        else:
+            # Out of order (clock change, restored buckets): insert and shift the totals after it
+            index = bisect.bisect_left(self._starts, start)
+            if index == len(self._starts) or self._starts[index] != start:
+                before = (self._totals[index - 1], self._bads[index - 1]) if index else self._dropped
+                self._starts.insert(index, start)
+                self._totals.insert(index, before[0])
+                self._bads.insert(index, before[1])
+            for i in range(index, len(self._starts)):
+                self._totals[i] += runs
+                self._bads[i] += runs if bad else 0
+        return start
+
+    def starts(self) -> list[float]:
+        return list(self._starts)
+
+    def bucket(self, start: float) -> tuple[int, int]:
+        """(total, bad) runs in the bucket starting at 'start'"""
+        index = bisect.bisect_left(self._starts, start)
+        if index == len(self._starts) or self._starts[index] != start:
+            return 0, 0
+        before = (self._totals[index - 1], self._bads[index - 1]) if index else self._dropped
+        return self._totals[index] - before[0], self._bads[index] - before[1]
+
+    def window(self, seconds: float, now: float) -> tuple[int, int]:
+        """(total, bad) runs of the last 'seconds'"""
+        if not self._starts:
+            return 0, 0
+        index = bisect.bisect_left(self._starts, now - seconds)
+        before = (self._totals[index - 1], self._bads[index - 1]) if index else self._dropped
+        return self._totals[-1] - before[0], self._bads[-1] - before[1]
+
+    def expire(self, now: float) -> None:
+        index = bisect.bisect_left(self._starts, now - self.horizon)
+        if index:
+            self._dropped = (self._totals[index - 1], self._bads[index - 1])
+            del self._starts[:index], self._totals[:index], self._bads[:index]
+
+
+class SloTracker:
+    """
+    Counts the runs of every SLO objective and exports SLI, burn rates and remaining
+    error budget. Buckets are exported and restored as (slo, objective, start, total,
+    bad) rows, so the SLO window survives a restart.
+    """
+
+    def __init__(self, slos: list[dict[str, Any]]) -> None:
+        self.slos = slos
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, str], RunCounter] = {
+            (slo['name'], objective): RunCounter(slo['window'])
+            for slo in slos for objective in slo['objectives']
+        }
+        self._changed: set[tuple[str, str, float]] = set()
+        for slo in slos:
+            for objective, target in slo['objectives'].items():
+                SLO_TARGET.labels(slo=slo['name'], objective=objective).set(target)
+
+    def horizon(self) -> float:
+        """Longest SLO window in seconds (0 without SLOs)"""
+        return max((slo['window'] for slo in self.slos), default=0.0)
+
+    def matching(self, usecase: str) -> list[dict[str, Any]]:
+        return [slo for slo in self.slos if any(fnmatch.fnmatchcase(usecase, pattern) for pattern in slo['patterns'])]
+
+    def record(self, usecase: str, success: bool, duration: float, timestamp: float | None = None) -> None:
+        """Counts a finished run of the usecase in every SLO that covers it"""
+        slos = self.matching(usecase)
+        if not slos:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            for slo in slos:
+                for objective in slo['objectives']:
+                    if objective == 'latency' and not success:
+                        continue
+                    bad = not success if objective == 'availability' else duration > slo['latency_seconds']
+                    start = self._counters[slo['name'], objective].add(timestamp, bad)
+                    self._changed.add((slo['name'], objective, start))
+        self.export(timestamp, slos)
+
+    def status(self, now: float | None = None,
+               slos: list[dict[str, Any]] | None = None) -> list[dict[str, Any]]:
+        """SLI, burn rate per window and remaining budget per SLO objective"""
+        if now is None:
+            now = time.time()
+        result = []
+        with self._lock:
+            for slo in self.slos if slos is None else slos:
+                for objective, target in slo['objectives'].items():
+                    counter = self._counters[slo['name'], objective]
+                    counter.expire(now)
+                    budget = 1 - target
+                    total, bad = counter.window(slo['window'], now)
+                    burn_rates = {}
+                    for label, seconds in WINDOWS:
+                        window_total, window_bad = counter.window(seconds, now)
+                        burn_rates[label] = window_bad / window_total / budget if window_total else 0.0
+                    result.append({
+                        'slo': slo['name'], 'objective': objective, 'target': target,
+                        'window_days': round(slo['window'] / 86400, 2), 'runs': total, 'bad_runs': bad,
+                        'sli': (total - bad) / total if total else None,
+                        'budget_remaining': 1 - bad / (total * budget) if total else 1.0,
+                        'burn_rates': burn_rates,
+                    })
+        return result
+
+    def export(self, now: float | None = None, slos: list[dict[str, Any]] | None = None) -> None:
+        """Updates the gauges; called after runs and periodically, as windows move on without runs"""
+        for entry in self.status(now, slos):
+            labels = {'slo': entry['slo'], 'objective': entry['objective']}
+            if entry['sli'] is not None:
+                SLO_SLI.labels(**labels).set(entry['sli'])
+            SLO_BUDGET_REMAINING.labels(**labels).set(entry['budget_remaining'])
+            for window, rate in entry['burn_rates'].items():
+                SLO_BURN_RATE.labels(window=window, **labels).set(rate)
+
+    def buckets(self, changed_only: bool = False) -> list[tuple[str, str, float, int, int]]:
+        """(slo, objective, start, total, bad) rows; changed_only=True: changed since the last such call"""
+        with self._lock:
+            if changed_only:
+                keys = sorted(self._changed)
+                self._changed = set()
+            else:
+                keys = sorted((name, objective, start) for (name, objective), counter in self._counters.items()
+                              for start in counter.starts())
+            return [(name, objective, start, *self._counters[name, objective].bucket(start))
+                    for name, objective, start in keys if (name, objective) in self._counters]
+
+    def restore(self, rows: list[tuple[str, str, float, int, int]], now: float | None = None) -> None:
+        """Loads buckets saved by a previous process; unknown SLOs and expired buckets are skipped"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            for name, objective, start, total, bad in rows:
+                counter = self._counters.get((name, objective))
+                if counter is None or start < now - counter.horizon or counter.bucket(start) != (0, 0):
+                    continue
+                if total - bad:
+                    counter.add(start, False, total - bad)
+                if bad:
+                    counter.add(start, True, bad)
+        self.export(now)
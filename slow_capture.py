@@ -0,0 +1,221 @@
+"""
+Diagnostics for steps that are slow rather than failed.
+
+A step that takes longer than 'factor' x its expected duration (the anomaly baseline,
+see anomaly.py) is slow: it gets a screenshot right away and arms its usecase. The next armed runs record every step with a StepRecorder: a
+Playwright trace chunk, the step's requests as HAR and a JS CPU profile via CDP. Only
+the recordings of steps that are slow again are kept.
+
+Recording slows a run down, so it only happens in armed runs. Every capture takes a
+token from a shared RateLimiter bucket, which limits the extra load during an incident.
+"""
+import json
+import logging
+import threading
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from prometheus_client import Counter
+
+from scheduling import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+SLOW_STEPS = Counter(
+    'transaction_slow_steps_total',
+    'Steps slower than SLOW_STEP_FACTOR x their expected duration',
+    ['usecase', 'step']
+)
+DEEP_CAPTURES = Counter(
+    'transaction_deep_captures_total',
+    'Diagnostics captures of slow steps (captured or rate_limited)',
+    ['usecase', 'result']
+)
+
+# Rate group of the capture bucket
+CAPTURE_GROUP = 'deep-capture'
+
+
+def parse_rate(spec: str) -> tuple[int, float]:
+    """'4/3600' -> (4, 3600.0), same format as RATE_LIMITS"""
+    runs, _, period = spec.partition('/')
+    return int(runs), float(period)
+
+
+class SlowStepDetector:
+    """
+    Decides which steps are slow and which captures happen: the number of armed runs
+    left per usecase and the capture budget ('runs' per 'period' seconds across all
+    usecases). The expected durations come from the caller's BaselineEngine.
+    """
+
+    def __init__(self, factor: float, armed_runs: int = 1, rate: tuple[int, float] = (4, 3600)) -> None:
+        self.factor = factor
+        self.armed_runs = armed_runs
+        self.budget = RateLimiter({CAPTURE_GROUP: rate})
+        self._lock = threading.Lock()
+        self._armed: dict[str, int] = {}
+
+    def is_slow(self, usecase: str, step: str, duration: float, expected: float | None) -> bool:
+        """True (and counted) if a successful step took longer than 'factor' x 'expected'"""
+        if not self.factor or expected is None or duration <= expected * self.factor:
+            return False
+        SLOW_STEPS.labels(usecase=usecase, step=step).inc()
+        return True
+
+    def allow_capture(self, usecase: str) -> bool:
+        """Takes a capture token; counts the capture as captured or rate_limited"""
+        allowed = self.budget.acquire(CAPTURE_GROUP) == 0
+        DEEP_CAPTURES.labels(usecase=usecase, result='captured' if allowed else 'rate_limited').inc()
+        return allowed
+
+    def arm(self, usecase: str) -> None:
+        """The next 'armed_runs' runs of the usecase record every step"""
+        with self._lock:
+            self._armed[usecase] = self.armed_runs
+
+    def take_armed(self, usecase: str) -> bool:
+        """True (and one armed run less) if this run of the usecase should record"""
+        with self._lock:
+            left = self._armed.get(usecase, 0)
+            if left <= 0:
+                return False
+            if left == 1:
+                del self._armed[usecase]
+            else:
+                self._armed[usecase] = left - 1
+            return True
+
+
+def _span(timing: dict[str, float], start: str, end: str) -> float:
+    """Milliseconds between two Playwright timing marks, -1 if one is missing"""
+    if timing.get(start, -1) < 0 or timing.get(end, -1) < 0:
+        return -1
+    return timing[end] - timing[start]
+
+
+def har_entry(request: Any) -> dict[str, Any]:
+    """HAR 1.2 entry of a finished or failed Playwright request (headers and timings, no bodies)"""
+    timing = request.timing
+    timings = {
+        'blocked': -1,
+        'dns': _span(timing, 'domainLookupStart', 'domainLookupEnd'),
+        'connect': _span(timing, 'connectStart', 'connectEnd'),
+        'ssl': _span(timing, 'secureConnectionStart', 'connectEnd'),
+        'send': 0,
+        'wait': _span(timing, 'requestStart', 'responseStart'),
+        'receive': _span(timing, 'responseStart', 'responseEnd'),
+    }
+    response = request.response()
+    headers = response.headers if response else {}
+    entry = {
+        'startedDateTime': datetime.fromtimestamp(timing['startTime'] / 1000, UTC).isoformat(),
+        # 'ssl' is already part of 'connect'
+        'time': sum(value for phase, value in timings.items() if value > 0 and phase != 'ssl'),
+        'request': {
+            'method': request.method, 'url': request.url, 'httpVersion': 'HTTP/1.1', 'cookies': [],
+            'headers': [{'name': name, 'value': value} for name, value in request.headers.items()],
+            'queryString': [], 'headersSize': -1, 'bodySize': -1,
+        },
+        'response': {
+            'status': response.status if response else 0,
+            'statusText': response.status_text if response else '',
+            'httpVersion': 'HTTP/1.1', 'cookies': [],
+            'headers': [{'name': name, 'value': value} for name, value in headers.items()],
+            'content': {'size': -1, 'mimeType': headers.get('content-type', '')},
+            'redirectURL': headers.get('location', ''), 'headersSize': -1, 'bodySize': -1,
+        },
+        'cache': {},
+        'timings': timings,
+    }
+    if request.failure:
+        entry['_failure'] = request.failure
+    return entry
+
+
+class StepRecorder:
+    """
+    Records every step of an armed run: a trace chunk, the requests and a CDP CPU profile.
+    end_step(keep=True) writes them next to the screenshots. Recording problems are
+    logged, never raised, so they can't fail the step.
+    """
+
+    def __init__(self, page: Any, directory: Path, usecase: str) -> None:
+        self.page = page
+        self.context = page.context
+        self.directory = directory
+        self.usecase = usecase
+        self.cdp: Any | None = None
+        self._requests: list[Any] = []
+        self._tracing = False
+
+    def start(self) -> None:
+        try:
+            self.context.tracing.start(screenshots=True, snapshots=True)
+            self._tracing = True
+        except Exception as e:
+            logger.warning(f"[{self.usecase}] Trace recording not started: {e}")
+        try:
+            self.cdp = self.context.new_cdp_session(self.page)
+            self.cdp.send('Profiler.enable')
+        except Exception as e:
+            logger.warning(f"[{self.usecase}] CPU profiling not started: {e}")
+            self.cdp = None
+        self.page.on('requestfinished', self._requests.append)
+        self.page.on('requestfailed', self._requests.append)
+        logger.info(f"[{self.usecase}] Recording steps for slow step capture")
+
+    def begin_step(self, step_name: str) -> None:
+        self._requests.clear()
+        try:
+            if self._tracing:
+                self.context.tracing.start_chunk(title=step_name)
+            if self.cdp:
+                self.cdp.send('Profiler.start')
+        except Exception as e:
+            logger.warning(f"[{self.usecase}] Recording of '{step_name}' not started: {e}")
+
+    def end_step(self, step_name: str, keep: bool) -> list[str]:
+        """Stops the step's recording; with keep=True writes it and returns the paths"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_step_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in step_name)
+        prefix = self.directory / f"{self.usecase}_{safe_step_name}_slow_step_{timestamp}"
+        paths = []
+        try:
+            if self.cdp:
+                profile = self.cdp.send('Profiler.stop')['profile']
+                if keep:
+                    paths.append(self._write_json(f"{prefix}.cpuprofile", profile))
+            if self._tracing:
+                self.context.tracing.stop_chunk(path=f"{prefix}.trace.zip" if keep else None)
+                if keep:
+                    paths.append(f"{prefix}.trace.zip")
+            if keep:
+                entries = [har_entry(request) for request in self._requests]
+                har = {'log': {'version': '1.2', 'creator': {'name': 'web-transaction-monitor', 'version': '1'},
+                               'pages': [], 'entries': entries}}
+                paths.append(self._write_json(f"{prefix}.har", har))
+        except Exception as e:
+            logger.warning(f"[{self.usecase}] Failed to save recording of '{step_name}': {e}")
+        self._requests.clear()
+        if paths:
+            logger.info(f"[{self.usecase}] Slow step capture saved: {', '.join(paths)}")
+        return paths
+
+    def stop(self) -> None:
+        try:
+            if self._tracing:
+                self.context.tracing.stop()
+            if self.cdp:
+                self.cdp.detach()
+        except Exception as e:
+            logger.debug(f"[{self.usecase}] Stopping the step recording failed: {e}")
+        self._tracing = False
+        self.cdp = None
+
+    @staticmethod
+    def _write_json(path: str, data: Any) -> str:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        return path
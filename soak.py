@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Soak test: runs the scheduler for hours against the local stand-in (standin_server.py)
+at a compressed interval and looks for resources that grow with every run.
+
+After each run the monitor process is sampled: child processes, open file descriptors,
+threads, Python heap (tracemalloc) and sys.modules. At the end every component gets a
+least-squares slope over the runs after the warm-up. A component whose fitted growth
+exceeds its tolerance is reported as a leak, together with what grew (process names,
+fd kinds, thread names, allocating files, module packages).
+
+Usage:
+    python soak.py --hours 4 --interval 60
+    python soak.py --hours 0.5 --interval 20 --error-rate 0.05 --output soak.json
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Sequence
+from typing import Any
+
+from proc_sampler import PROC_ROOT, count_fds, descendant_stats, proc_available
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ('processes', 'fds', 'threads', 'heap_bytes', 'modules')
+# Fitted growth over the soak (after warm-up) that still counts as noise
+DEFAULT_TOLERANCE: dict[str, float] = {
+    'processes': 1,
+    'fds': 8,
+    'threads': 2,
+    'heap_bytes': 16 * 1024 * 1024,
+    'modules': 5,
+}
+# Runs needed after the warm-up before slopes are meaningful
+MIN_SAMPLES = 3
+DEFAULT_OUTPUT = 'soak_report.json'
+TOP_GROWTH = 10
+
+
+def linear_slope(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """Least-squares slope of ys over xs (0 for fewer than two distinct xs)"""
+    n = len(xs)
+    if n < 2:
+        return 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if not variance:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys, strict=True)) / variance
+
+
+def _process_names(pid: int) -> Counter:
+    names: Counter = Counter()
+    for child in descendant_stats({pid}):
+        if child == pid:
+            continue
+        try:
+            with open(os.path.join(PROC_ROOT, str(child), 'comm')) as f:
+                names[f.read().strip()] += 1
+        except OSError:
+            pass
+    return names
+
+
+def _fd_kinds(pid: int) -> Counter:
+    """Open fds by kind: 'socket', 'pipe', 'anon_inode:[eventpoll]' or the directory of the file"""
+    kinds: Counter = Counter()
+    fd_dir = os.path.join(PROC_ROOT, str(pid), 'fd')
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return kinds
+    for fd in fds:
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        if target.startswith(('socket:', 'pipe:')):
+            kinds[target.split(':')[0]] += 1
+        elif target.startswith('anon_inode:'):
+            kinds[target] += 1
+        else:
+            kinds[os.path.dirname(target) or target] += 1
+    return kinds
+
+
+def _thread_names() -> Counter:
+    """Live threads by name with numbers folded ('dispatcher-3' -> 'dispatcher-N')"""
+    return Counter(re.sub(r'\d+', 'N', thread.name) for thread in threading.enumerate())
+
+
+def _module_packages() -> Counter:
+    return Counter(name.split('.')[0] for name in list(sys.modules))
+
+
+def _heap_files() -> Counter:
+    """Traced bytes by allocating file"""
+    if not tracemalloc.is_tracing():
+        return Counter()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    return Counter({stat.traceback[0].filename: stat.size for stat in snapshot.statistics('filename')})
+
+
+def growth(before: Counter, after: Counter, top: int = TOP_GROWTH) -> list[list[Any]]:
+    """[key, increase] of the keys that grew most between two inventories"""
+    increases = [(key, after[key] - before.get(key, 0)) for key in after]
+    increases = [(key, diff) for key, diff in increases if diff > 0]
+    increases.sort(key=lambda item: (-item[1], item[0]))
+    return [[key, diff] for key, diff in increases[:top]]
+
+
+class ResourceSampler:
+    """Samples the resources of one process (default: this one) and what they consist of"""
+
+    def __init__(self, pid: int | None = None) -> None:
+        self.pid = pid or os.getpid()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if not proc_available():
+            logger.warning("No /proc here, processes and fds are not sampled")
+
+    def sample(self) -> dict[str, float]:
+        return {
+            'processes': len(descendant_stats({self.pid})) - 1 if proc_available() else 0,
+            'fds': count_fds(self.pid),
+            'threads': threading.active_count(),
+            'heap_bytes': tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0,
+            'modules': len(sys.modules),
+        }
+
+    def inventory(self) -> dict[str, Counter]:
+        """Per component breakdown, compared between warm-up and end to name what leaked"""
+        return {
+            'processes': _process_names(self.pid),
+            'fds': _fd_kinds(self.pid),
+            'threads': _thread_names(),
+            'heap_bytes': _heap_files(),
+            'modules': _module_packages(),
+        }
+
+
+def analyze(samples: list[dict[str, Any]], warmup: int = 0,
+            tolerance: dict[str, float] | None = None) -> dict[str, dict[str, Any]]:
+    """
+    Trend of every component over the samples after 'warmup' runs: slope per run and
+    per hour, fitted growth over the soak and whether that exceeds the tolerance.
+    """
+    tolerance = {**DEFAULT_TOLERANCE, **(tolerance or {})}
+    observed = samples[warmup:]
+    report: dict[str, dict[str, Any]] = {}
+    for component in COMPONENTS:
+        values = [sample[component] for sample in observed]
+        if len(values) < MIN_SAMPLES:
+            report[component] = {'samples': len(values), 'leak': None}
+            continue
+        per_run = linear_slope(list(range(len(values))), values)
+        hours = [(sample['time'] - observed[0]['time']) / 3600 for sample in observed]
+        fitted = per_run * (len(values) - 1)
+        report[component] = {
+            'samples': len(values),
+            'first': values[0],
+            'last': values[-1],
+            'min': min(values),
+            'max': max(values),
+            'slope_per_run': per_run,
+            'slope_per_hour': linear_slope(hours, values),
+            'growth': fitted,
+            'tolerance': tolerance[component],
+            'leak': fitted > tolerance[component],
+        }
+    return report
+
+
+class _RunWatcher:
+    """AdaptiveJobs watcher that reports every finished run of a job and re-arms itself"""
+
+    def __init__(self, soak: 'Soak', jobs: Any, job_id: str) -> None:
+        self.soak = soak
+        self.jobs = jobs
+        self.job_id = job_id
+
+    def started(self) -> None:
+        pass
+
+    def finished(self, success: bool) -> None:
+        self.jobs.watch(self.job_id, self)
+        self.soak.record(self.job_id, success)
+
+
+class Soak:
+    """Collects a sample after every run; the inventory after the warm-up is the reference"""
+
+    def __init__(self, sampler: ResourceSampler, warmup: int = 0) -> None:
+        self.sampler = sampler
+        self.warmup = warmup
+        self.samples: list[dict[str, Any]] = []
+        self.baseline: dict[str, Counter] | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self.sampler.start()
+        if not self.warmup:
+            self.baseline = self.sampler.inventory()
+
+    def watch(self, jobs: Any, job_ids: list[str]) -> None:
+        for job_id in job_ids:
+            jobs.watch(job_id, _RunWatcher(self, jobs, job_id))
+
+    def record(self, job_id: str, success: bool) -> None:
+        with self._lock:
+            sample: dict[str, Any] = {'time': time.time(), 'run': len(self.samples) + 1,
+                                      'job': job_id, 'success': success}
+            sample.update(self.sampler.sample())
+            self.samples.append(sample)
+            if len(self.samples) == self.warmup:
+                self.baseline = self.sampler.inventory()
+            logger.info(f"[{job_id}] Run {sample['run']} {'ok' if success else 'failed'}: "
+                        f"{sample['processes']} processes, {sample['fds']} fds, {sample['threads']} threads, "
+                        f"{sample['heap_bytes'] / 1024 / 1024:.1f}MB heap, {sample['modules']} modules")
+
+    def report(self, tolerance: dict[str, float] | None = None) -> dict[str, Any]:
+        with self._lock:
+            samples = list(self.samples)
+            baseline = self.baseline
+        components = analyze(samples, self.warmup, tolerance)
+        if baseline is not None:
+            final = self.sampler.inventory()
+            for component, result in components.items():
+                result['grown'] = growth(baseline[component], final[component])
+        return {
+            'runs': len(samples),
+            'failed_runs': sum(1 for sample in samples if not sample['success']),
+            'warmup': self.warmup,
+            'leaks': [component for component, result in components.items() if result['leak']],
+            'components': components,
+            'samples': samples,
+        }
+
+
+def run_soak(hours: float, interval: int, warmup: int | None = None, workers: int = 1,
+             latency_ms: float = 0, error_rate: float = 0, grace: float = 120) -> Soak:
+    """
+    Starts the stand-in, schedules every transaction every 'interval' seconds through the
+    same scheduler and dispatcher as main.py and samples after each run for 'hours'.
+    The warm-up defaults to one run per job, the first run of a job imports its transaction.
+    """
+    from standin_server import environment, start_standin_servers
+
+    servers = start_standin_servers(port=0, latency_ms=latency_ms, error_rate=error_rate)
+    os.environ.update(dict(line.split('=', 1) for line in environment(servers)))
+    # main.py reads its configuration on import: fixed compressed cadence, no persisted state
+    os.environ.update({
+        'SCHEDULE_INTERVAL': str(interval),
+        'ADAPTIVE_SCHEDULING': 'false',
+        'STATE_DB': '',
+        'CLUSTER_DB': '',
+        'RATE_LIMITS': '',
+        'HAR_MODE': 'off',
+    })
+    # Traced from here on, so that the imports below are part of the heap
+    sampler = ResourceSampler()
+    sampler.start()
+
+    from apscheduler.executors.pool import ThreadPoolExecutor
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    from main import load_and_schedule_usecases
+    from monitor_base import abort_active_runs, begin_shutdown
+    from scheduling import PriorityDispatcher
+
+    dispatcher = PriorityDispatcher(workers=workers)
+    scheduler = BackgroundScheduler(executors={'default': ThreadPoolExecutor(1)},
+                                    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': None})
+    jobs = load_and_schedule_usecases(scheduler, dispatcher)
+    job_ids = [job.id for job in scheduler.get_jobs()]
+    soak = Soak(sampler, len(job_ids) if warmup is None else warmup)
+    soak.start()
+    soak.watch(jobs, job_ids)
+
+    logger.info(f"Soaking {len(job_ids)} jobs every {interval}s for {hours}h "
+                f"({workers} worker(s), warm-up {soak.warmup} runs)")
+    dispatcher.start()
+    scheduler.start()
+    deadline = time.monotonic() + hours * 3600
+    try:
+        while time.monotonic() < deadline:
+            time.sleep(min(5.0, max(0.0, deadline - time.monotonic())))
+    except KeyboardInterrupt:
+        logger.info("Interrupted, reporting the runs so far")
+    finally:
+        scheduler.shutdown(wait=False)
+        begin_shutdown()
+        if not dispatcher.stop(timeout=grace):
+            abort_active_runs()
+            dispatcher.stop(timeout=10)
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+    return soak
+
+
+def parse_tolerances(specs: list[str]) -> dict[str, float]:
+    """['fds=16', 'heap_bytes=33554432'] -> {'fds': 16.0, 'heap_bytes': 33554432.0}"""
+    tolerance = {}
+    for spec in specs:
+        component, _, value = spec.partition('=')
+        if component not in COMPONENTS:
+            raise ValueError(f"unknown component '{component}' (one of {', '.join(COMPONENTS)})")
+        tolerance[component] = float(value)
+    return tolerance
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Soak test with leak detection against the local stand-in")
+    parser.add_argument('--hours', type=float, default=4, help='Soak duration in hours (default: 4)')
+    parser.add_argument('--interval', type=int, default=60,
+                        help='Schedule interval of every transaction in seconds (default: 60)')
+    parser.add_argument('--warmup', type=int, default=None,
+                        help='Runs excluded from the trend (caches, imports; default: one run per job)')
+    parser.add_argument('--workers', type=int, default=1, help='Dispatcher workers (default: 1)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Stand-in latency per request')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='Share of stand-in requests answered with 503, exercises the failure paths')
+    parser.add_argument('--tolerance', action='append', default=[], metavar='COMPONENT=VALUE',
+                        help=f"Allowed fitted growth, e.g. fds=16 (components: {', '.join(COMPONENTS)})")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'Report JSON file (default: {DEFAULT_OUTPUT})')
+    args = parser.parse_args(argv)
+    try:
+        tolerance = parse_tolerances(args.tolerance)
+    except ValueError as e:
+        parser.error(str(e))
+
+    soak = run_soak(args.hours, args.interval, args.warmup, args.workers, args.latency_ms, args.error_rate)
+    report = soak.report(tolerance)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    logger.info(f"{report['runs']} runs ({report['failed_runs']} failed), report written to {args.output}")
+    for component, result in report['components'].items():
+        if result['leak'] is None:
+            logger.warning(f"{component}: only {result['samples']} runs after the warm-up, no verdict")
+            continue
+        grown = ', '.join(f"{key} +{diff}" for key, diff in result.get('grown', [])[:3])
+        line = (f"{component}: {result['first']} -> {result['last']}, {result['slope_per_run']:+.3f}/run, "
+                f"{result['slope_per_hour']:+.1f}/h{f' ({grown})' if grown else ''}")
+        if result['leak']:
+            logger.error(f"LEAK {line}")
+        else:
+            logger.info(line)
+    if any(result['leak'] is None for result in report['components'].values()):
+        return 2
+    return 1 if report['leaks'] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,666 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the monitored providers, for benchmarking the monitor without
+HiDrive, Nextcloud or MagentaCloud. Every provider is served on its own port and
+reproduces only the markup the transactions rely on: the IONOS ID identifier/password
+flow, the Nextcloud login form, files list, viewer and settings, the MagentaCloud
+(Telekom login) variant, the legacy HiDrive tiles and a fake Collabora iframe.
+
+Latency, errors and the redirect chain after login are injected from a seeded random
+generator, so a run against the stand-in is repeatable and runs at a controlled speed.
+
+Usage:
+    python standin_server.py                              # serve on ports 8800-8804
+    python standin_server.py --latency-ms 300 --jitter-ms 100 --error-rate 0.02 --redirects 3
+
+The printed *_URL / *_USER / *_PASS lines point the transactions at the stand-in.
+"""
+import base64
+import copy
+import html
+import itertools
+import logging
+import os
+import posixpath
+import random
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+from urllib.parse import parse_qs, quote, urlencode
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from prometheus_client.exposition import ThreadingWSGIServer
+
+logger = logging.getLogger(__name__)
+
+Response = tuple[str, list[tuple[str, str]], bytes]
+
+PICTURE = "abhishek-umrao-qsvNYg6iMGk-unsplash.jpg"
+NEW_DOCUMENT = "Neues Dokument.docx"
+
+# Folder trees, a dict is a folder and None a file. Listings are sorted folders first,
+# so the 2nd and 3rd Nextcloud rows are folders holding exactly one subfolder ('Norway')
+# with the picture. MagentaCloud clicks the 'Norway' row twice, the nested folder keeps
+# the second click from timing out.
+NEXTCLOUD_TREE: dict[str, Any] = {
+    "Documents": {"Welcome.docx": None},
+    "Photos": {"Norway": {PICTURE: None, "Norway": {PICTURE: None}}},
+    "pictures": {"Norway": {PICTURE: None, "Norway": {PICTURE: None}}},
+    "Nextcloud intro.docx": None,
+    "Readme.md": None,
+}
+# Legacy HiDrive: the first tile is a folder twice, the third tile in there is a picture
+HIDRIVE_LEGACY_TREE: dict[str, Any] = {
+    "Bilder": {"Urlaub": {"beach.jpg": None, "harbour.jpg": None, PICTURE: None}, "Videos": {}},
+    "Privat": {},
+    "Readme.txt": None,
+}
+
+# 1x1 grey PNG, browsers sniff the type so it is served for every picture
+IMAGE = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAAAAAA6fptVAAAACklEQVR4nGO4CAAA6QDoz+zC3gAAAABJRU5ErkJggg=="
+)
+FOLDER_PATH = "M10 4H4c-1.1 0-2 .9-2 2v12c0 1.1.9 2 2 2h16c1.1 0 2-.9 2-2V8c0-1.1-.9-2-2-2h-8l-2-2z"
+FILE_PATH = "M14 2H6c-1.1 0-2 .9-2 2v16c0 1.1.9 2 2 2h12c1.1 0 2-.9 2-2V8l-6-6zm-1 7V3.5L18.5 9H13z"
+
+CSS = """
+[hidden] { display: none !important; }
+body { font-family: sans-serif; margin: 0; }
+header { display: flex; gap: 12px; align-items: center; padding: 8px; background: #0082c9; color: #fff; }
+header a { color: #fff; }
+ionos-icons, ionos-user-menu-item, scale-button, tile-item { display: inline-block; cursor: pointer; padding: 6px 10px; }
+tile-item { width: 140px; vertical-align: top; }
+.menu, .dialog { position: fixed; top: 60px; right: 20px; background: #fff; border: 1px solid #999; padding: 8px; z-index: 10; }
+.menu a, .menu button, .menu ionos-user-menu-item, .sj-menuitem { display: block; padding: 4px; cursor: pointer; color: #000; }
+.material-design-icon__svg, .file-item-icon svg { width: 24px; height: 24px; }
+.thumbnail { width: 64px; height: 64px; }
+.viewer, .filesviewer-overlay, .office-viewer, .office-editor { position: fixed; inset: 0; background: #fff; z-index: 20; }
+.viewer__file-wrapper img, .imageview img { width: 320px; height: 240px; }
+iframe { width: 100%; height: 90%; border: 0; }
+#document-canvas { width: 600px; height: 400px; border: 1px solid #ccc; }
+"""
+
+SCRIPT = """
+function toggle(id, visible) {
+  var el = document.getElementById(id);
+  if (el) { el.hidden = visible === undefined ? !el.hidden : !visible; }
+}
+function markForDelete(name) {
+  var form = document.getElementById('delete-form');
+  if (form) { form.elements.file.value = name; }
+}
+document.addEventListener('click', function (event) {
+  var el = event.target.closest('[data-href],[data-toggle],[data-dismiss],[data-delete],scale-button');
+  if (!el) { return; }
+  if (el.dataset.delete !== undefined) { markForDelete(el.dataset.delete); }
+  if (el.dataset.dismiss) { toggle(el.dataset.dismiss, false); }
+  if (el.dataset.toggle) { toggle(el.dataset.toggle); }
+  if (el.dataset.href) { (el.dataset.target === 'parent' ? window.parent : window).location.href = el.dataset.href; }
+  if (el.matches('scale-button')) { el.closest('form').requestSubmit(); }
+});
+document.addEventListener('contextmenu', function (event) {
+  var el = event.target.closest('.itemcontent[data-delete]');
+  if (!el) { return; }
+  event.preventDefault();
+  markForDelete(el.dataset.delete);
+  toggle('context-menu', true);
+});
+window.addEventListener('hashchange', function () {
+  if (location.hash === '#logout') { location.href = '/logout'; }
+});
+"""
+
+
+def _e(value: str) -> str:
+    return html.escape(value, quote=True)
+
+
+def page(title: str, body: str) -> bytes:
+    return (f'<!DOCTYPE html>\n<html lang="de"><head><meta charset="utf-8"><title>{_e(title)}</title>'
+            f'<style>{CSS}</style></head>\n<body>\n{body}\n<script>{SCRIPT}</script></body></html>\n'
+            ).encode()
+
+
+def svg(path: str, css_class: str = "") -> str:
+    class_attr = f' class="{css_class}"' if css_class else ""
+    return f'<svg{class_attr} width="24" height="24" viewBox="0 0 24 24"><path d="{path}"></path></svg>'
+
+
+class FaultInjector:
+    """
+    Seeded latency, errors and redirect chains. With the same seed and the same request
+    order the stand-in fails and slows down the same requests on every run.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 redirects: int = 0, seed: int = 0) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.redirects = redirects
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Seconds to hold the next response"""
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return (self.latency_ms + jitter) / 1000
+
+    def should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+class FileTree:
+    """In-memory folders of one provider, so created documents can be deleted again"""
+
+    def __init__(self, template: dict[str, Any]) -> None:
+        self._root = copy.deepcopy(template)
+        self._lock = threading.Lock()
+
+    def _folder(self, path: str) -> dict[str, Any] | None:
+        node: Any = self._root
+        for part in [p for p in path.split('/') if p]:
+            node = node.get(part) if isinstance(node, dict) else None
+        return node if isinstance(node, dict) else None
+
+    def listing(self, path: str) -> list[tuple[str, bool]] | None:
+        """(name, is_folder) of a folder, folders first like both web UIs, or None"""
+        with self._lock:
+            folder = self._folder(path)
+            if folder is None:
+                return None
+            entries = [(name, isinstance(child, dict)) for name, child in folder.items()]
+        return sorted(entries, key=lambda entry: (not entry[1], entry[0].lower()))
+
+    def create(self, path: str, name: str) -> str | None:
+        """Adds a file, numbered like Nextcloud ('Neues Dokument (2).docx') if the name is taken"""
+        stem, ext = posixpath.splitext(name)
+        with self._lock:
+            folder = self._folder(path)
+            if folder is None:
+                return None
+            candidate = name
+            for number in itertools.count(2):
+                if candidate not in folder:
+                    break
+                candidate = f"{stem} ({number}){ext}"
+            folder[candidate] = None
+        return candidate
+
+    def delete(self, path: str, name: str) -> bool:
+        with self._lock:
+            folder = self._folder(path)
+            if folder is None or name not in folder:
+                return False
+            del folder[name]
+        return True
+
+
+def redirect(location: str) -> Response:
+    return '302 Found', [('Location', location), ('Content-Length', '0')], b''
+
+
+class StandinApp:
+    """
+    WSGI app of one provider. Routes shared by all providers: the redirect hops, the
+    picture previews and the Collabora editor frame; the rest is up to the subclasses.
+    """
+
+    title = "Stand-in"
+
+    def __init__(self, faults: FaultInjector, tree: dict[str, Any]) -> None:
+        self.faults = faults
+        self.files = FileTree(tree)
+        self._frames = itertools.count(1)
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        delay = self.faults.delay()
+        if delay > 0:
+            time.sleep(delay)
+        method = environ.get('REQUEST_METHOD', 'GET')
+        form: dict[str, list[str]] = {}
+        if method == 'POST':
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            form = parse_qs(environ['wsgi.input'].read(length).decode('utf-8'))
+        if self.faults.should_fail():
+            status, headers, body = self.error('503 Service Unavailable')
+        else:
+            status, headers, body = self.handle(method, environ.get('PATH_INFO', '/'),
+                                                parse_qs(environ.get('QUERY_STRING', '')), form)
+        if not any(name == 'Content-Type' for name, _ in headers):
+            headers = headers + [('Content-Type', 'text/html; charset=utf-8')]
+        start_response(status, headers + [('Cache-Control', 'no-store')])
+        return [body]
+
+    def handle(self, method: str, path: str, query: dict[str, list[str]],
+               form: dict[str, list[str]]) -> Response:
+        if path.startswith('/hop/'):
+            return self.hop(path, query)
+        if path in ('/preview', '/thumbnail'):
+            return '200 OK', [('Content-Type', 'image/png'), ('Content-Length', str(len(IMAGE)))], IMAGE
+        if path == '/collabora':
+            return self.collabora(query)
+        return self.error('404 Not Found')
+
+    def error(self, status: str) -> Response:
+        body = page(status, f'<h1>{_e(status)}</h1><p>Injected by the stand-in server.</p>')
+        return status, [('Content-Length', str(len(body)))], body
+
+    def html(self, body: str, title: str | None = None) -> Response:
+        content = page(title or self.title, body)
+        return '200 OK', [('Content-Length', str(len(content)))], content
+
+    def after_login(self, target: str) -> Response:
+        """Sends the browser through the configured number of redirect hops to 'target'"""
+        if self.faults.redirects > 0:
+            return redirect(f"/hop/{self.faults.redirects}?{urlencode({'to': target})}")
+        return redirect(target)
+
+    def hop(self, path: str, query: dict[str, list[str]]) -> Response:
+        target = query.get('to', ['/'])[0]
+        try:
+            remaining = int(path[len('/hop/'):]) - 1
+        except ValueError:
+            return self.error('404 Not Found')
+        if remaining > 0:
+            return redirect(f"/hop/{remaining}?{urlencode({'to': target})}")
+        return redirect(target)
+
+    def collabora(self, query: dict[str, list[str]]) -> Response:
+        name = query.get('file', [''])[0]
+        close = query.get('close', ['/'])[0]
+        return self.html(
+            f'<div id="toolbar-up"><span class="document-title">{_e(name)}</span>'
+            f'<button id="closebutton" data-href="{_e(close)}" data-target="parent">&times;</button></div>'
+            f'<div id="map" class="leaflet-container"><div class="leaflet-layer">'
+            f'<canvas id="document-canvas" width="600" height="400"></canvas></div></div>'
+            f'<textarea id="clipboard-area" aria-label="Dokument"></textarea>',
+            title=f"{name} - Collabora Online")
+
+    def frame_name(self) -> str:
+        return f"collaboraframe_{next(self._frames):05d}"
+
+
+class NextcloudStandin(StandinApp):
+    """
+    Nextcloud files app behind one of three logins: the Nextcloud login form
+    ('nextcloud'), the IONOS ID identifier/password pages ('hidrive-next') or the
+    two-step Telekom login ('magentacloud'). The flavor also picks the user menu markup.
+    """
+
+    def __init__(self, faults: FaultInjector, flavor: str = 'nextcloud') -> None:
+        super().__init__(faults, NEXTCLOUD_TREE)
+        self.flavor = flavor
+        self.title = {'hidrive-next': "HiDrive Next", 'magentacloud': "MagentaCLOUD"}.get(flavor, "Nextcloud")
+        self.login_path = '/identifier' if flavor == 'hidrive-next' else '/login'
+
+    def handle(self, method: str, path: str, query: dict[str, list[str]],
+               form: dict[str, list[str]]) -> Response:
+        route = (method, path.rstrip('/') or '/')
+        if route == ('GET', '/'):
+            return redirect('/apps/files/')
+        if route == ('GET', '/login') and self.flavor == 'hidrive-next':
+            return redirect('/identifier')
+        if route == ('GET', '/login'):
+            return self.login_page()
+        if route == ('POST', '/login'):
+            return redirect('/login/password') if self.flavor == 'magentacloud' else self.after_login('/apps/files/')
+        if route == ('GET', '/login/password'):
+            return self.magenta_password_page()
+        if route == ('POST', '/login/password'):
+            return self.after_login('/apps/files/')
+        if route == ('GET', '/identifier'):
+            return self.identifier_page()
+        if route == ('POST', '/identifier'):
+            return redirect('/password')
+        if route == ('GET', '/password'):
+            return self.ionos_password_page()
+        if route == ('POST', '/password'):
+            return self.after_login('/apps/files/')
+        if route == ('GET', '/logout'):
+            return redirect(self.login_path)
+        if route == ('GET', '/apps/files'):
+            return self.files_page(query)
+        if route == ('POST', '/apps/files/new'):
+            return self.create_document(form)
+        if route == ('POST', '/apps/files/delete'):
+            folder = form.get('dir', ['/'])[0]
+            self.files.delete(folder, form.get('file', [''])[0])
+            return redirect(self.files_url(folder))
+        if method == 'GET' and path.startswith('/settings/user'):
+            return self.settings_page(path[len('/settings/user'):].strip('/') or 'personal-info')
+        return super().handle(method, path, query, form)
+
+    # Logins
+
+    def login_page(self) -> Response:
+        if self.flavor == 'magentacloud':
+            return self.html(
+                '<div id="consent"><button data-action="accept-all" data-dismiss="consent">Alle akzeptieren</button></div>'
+                '<form method="post" action="/login"><label>Benutzername '
+                '<input type="text" name="username" autocomplete="username"></label>'
+                '<scale-button type="submit">Weiter</scale-button></form>',
+                title="Telekom Login")
+        return self.html(
+            '<form class="login-form" method="post" action="/login">'
+            '<input type="text" name="user" data-login-form-input-user autocomplete="username">'
+            '<input type="password" name="password" data-login-form-input-password autocomplete="current-password">'
+            '<button type="submit" data-login-form-submit>Anmelden</button></form>')
+
+    def magenta_password_page(self) -> Response:
+        return self.html(
+            '<form method="post" action="/login/password"><label>Passwort '
+            '<input type="password" name="password" autocomplete="current-password"></label>'
+            '<scale-button type="submit" name="pw_submit">Login</scale-button></form>',
+            title="Telekom Login")
+
+    def identifier_page(self) -> Response:
+        return self.html(
+            '<div id="privacy-banner"><button id="selectAll" data-dismiss="privacy-banner">Alle akzeptieren</button></div>'
+            '<form method="post" action="/identifier"><label>Benutzername '
+            '<input type="text" id="username" name="identifier" autocomplete="username"></label>'
+            '<button type="submit" id="button--with-loader">Weiter</button></form>',
+            title="IONOS Login")
+
+    def ionos_password_page(self) -> Response:
+        return self.html(
+            '<form method="post" action="/password"><label>Passwort '
+            '<input type="password" name="password" autocomplete="current-password"></label>'
+            '<button type="submit" id="button--with-loader">Anmelden</button></form>',
+            title="IONOS Login")
+
+    # Chrome
+
+    def header(self) -> str:
+        if self.flavor == 'hidrive-next':
+            menu = ('<ionos-icons role="button" aria-label="User Menu" data-toggle="user-menu-items">Konto</ionos-icons>'
+                    '<div id="user-menu-items" class="menu" hidden>'
+                    '<ionos-user-menu-item data-qa="IONOS-USER-MENU-SETTINGS-TARGET" data-href="/settings/user">'
+                    'Einstellungen</ionos-user-menu-item>'
+                    '<ionos-user-menu-item data-qa="IONOS-USER-MENU-LOGOUT-TARGET" data-href="/logout">'
+                    'Abmelden</ionos-user-menu-item></div>')
+        elif self.flavor == 'magentacloud':
+            menu = ('<div id="user-menu"><button class="header-menu__trigger" data-toggle="user-menu-items">Konto</button>'
+                    '<ul id="user-menu-items" class="menu" hidden>'
+                    '<li id="settings"><a href="/settings/user">Einstellungen</a></li>'
+                    '<li><a id="logout" href="/logout">Abmelden</a></li></ul></div>')
+        else:
+            menu = ('<div id="user-menu"><button class="header-menu__trigger" data-toggle="user-menu-items">Konto</button>'
+                    '<div id="user-menu-items" class="menu" hidden>'
+                    '<a id="settings" href="/settings/user">Persönliche Einstellungen</a>'
+                    '<a id="logout" href="/logout">Abmelden</a></div></div>')
+        return f'<header><a id="nextcloud" href="/">{_e(self.title)}</a><span class="app-menu">Dateien</span>{menu}</header>'
+
+    # Files
+
+    def files_url(self, folder: str, **params: str) -> str:
+        return '/apps/files/?' + urlencode({'dir': folder, **params})
+
+    def files_page(self, query: dict[str, list[str]]) -> Response:
+        folder = query.get('dir', ['/'])[0]
+        entries = self.files.listing(folder)
+        if entries is None:
+            return self.error('404 Not Found')
+        rows = []
+        for name, is_folder in entries:
+            child = posixpath.join(folder, name)
+            if is_folder:
+                href, icon, path = self.files_url(child), 'folder-icon', FOLDER_PATH
+            elif name.endswith('.docx'):
+                href, icon, path = self.files_url(folder, editfile=name), 'file-icon', FILE_PATH
+            else:
+                href, icon, path = self.files_url(folder, openfile=name), 'file-icon', FILE_PATH
+            rows.append(
+                f'<tr class="files-list__row" data-cy-files-list-row data-cy-files-list-row-name="{_e(name)}">'
+                f'<td class="files-list__row-name"><span class="files-list__row-icon" data-href="{_e(href)}">'
+                f'<span class="material-design-icon {icon}" role="img">{svg(path, "material-design-icon__svg")}</span></span>'
+                f'<button class="files-list__row-name-link" data-cy-files-list-row-name-link data-href="{_e(href)}">'
+                f'<span class="files-list__row-name-text">{_e(name)}</span></button></td>'
+                f'<td class="files-list__row-actions"><button class="action-item__menutoggle" aria-label="Aktionen" '
+                f'data-delete="{_e(name)}" data-toggle="delete-form">&hellip;</button></td></tr>')
+        overlay = ''
+        if 'openfile' in query:
+            name = query['openfile'][0]
+            overlay = (f'<div class="viewer"><button class="header-close" aria-label="Close" '
+                       f'data-href="{_e(self.files_url(folder))}">&times;</button>'
+                       f'<div class="viewer__file-wrapper"><img alt="{_e(name)}" '
+                       f'src="/preview?{urlencode({"file": posixpath.join(folder, name)})}" '
+                       f'onload="this.classList.add(\'loaded\')"></div></div>')
+        elif 'editfile' in query:
+            name = query['editfile'][0]
+            src = '/collabora?' + urlencode({'file': name, 'close': self.files_url(folder)})
+            overlay = (f'<div class="office-viewer"><iframe name="{self.frame_name()}" '
+                       f'src="{_e(src)}"></iframe></div>')
+        return self.html(
+            f'{self.header()}<main><div class="files-list__header">'
+            f'<button class="action-item__menutoggle" data-toggle="new-menu"><span class="plus-icon">+</span> Neu</button>'
+            f'<div id="new-menu" class="menu" hidden><button data-cy-upload-picker-menu-entry="template-new-richdocuments-1" '
+            f'data-dismiss="new-menu" data-toggle="new-node-dialog">Neues Dokument</button></div>'
+            f'<form id="new-node-dialog" class="dialog" method="post" action="/apps/files/new" hidden>'
+            f'<input type="hidden" name="dir" value="{_e(folder)}">'
+            f'<input type="text" name="file" value="{_e(NEW_DOCUMENT)}">'
+            f'<button type="submit" data-cy-files-new-node-dialog-submit>Erstellen</button></form>'
+            f'<form id="delete-form" class="menu" method="post" action="/apps/files/delete" hidden>'
+            f'<input type="hidden" name="dir" value="{_e(folder)}"><input type="hidden" name="file" value="">'
+            f'<button type="submit" data-cy-files-list-row-action="delete">Löschen</button></form></div>'
+            f'<table class="files-list" data-cy-files-list><thead><tr><th>Name</th><th></th></tr></thead>'
+            f'<tbody>{"".join(rows)}</tbody></table></main>{overlay}',
+            title=f"Dateien - {self.title}")
+
+    def create_document(self, form: dict[str, list[str]]) -> Response:
+        folder = form.get('dir', ['/'])[0]
+        name = self.files.create(folder, form.get('file', [NEW_DOCUMENT])[0] or NEW_DOCUMENT)
+        if name is None:
+            return self.error('404 Not Found')
+        return redirect(self.files_url(folder, editfile=name))
+
+    # Settings
+
+    def settings_page(self, section: str) -> Response:
+        if self.flavor == 'hidrive-next':
+            if section == 'classic':
+                body = ('<nav><div id="backButton"><a class="app-navigation-entry-link" href="/apps/files/">'
+                        'Zurück zu den Dateien</a></div></nav><main><h2>Klassische Ansicht</h2></main>')
+            else:
+                body = ('<nav><a class="app-navigation-entry-link" href="/settings/user/classic">'
+                        '<span class="desktop-classic-icon"></span>Klassische Ansicht</a></nav>'
+                        '<main><h2>Einstellungen</h2></main>')
+            return self.html(self.header() + body, title=f"Einstellungen - {self.title}")
+        sections = [('personal-info', "Persönliche Informationen"), ('security', "Sicherheit"),
+                    ('sessions', "Sitzungen")]
+        if section not in {key for key, _ in sections}:
+            return self.error('404 Not Found')
+        items = ''.join(f'<li data-section-id="{key}"><a href="/settings/user/{key}">{label}</a></li>'
+                        for key, label in sections)
+        return self.html(
+            f'{self.header()}<nav><a href="/apps/files/">Dateien</a><ul class="settings-sections">{items}</ul></nav>'
+            f'<main><h2>{_e(dict(sections)[section])}</h2></main>',
+            title=f"Einstellungen - {self.title}")
+
+
+class HiDriveLegacyStandin(StandinApp):
+    """Legacy HiDrive web app: login with consent banner, file tiles, picture viewer and office editor"""
+
+    title = "HiDrive"
+
+    def __init__(self, faults: FaultInjector) -> None:
+        super().__init__(faults, HIDRIVE_LEGACY_TREE)
+
+    def handle(self, method: str, path: str, query: dict[str, list[str]],
+               form: dict[str, list[str]]) -> Response:
+        route = (method, path)
+        if route == ('GET', '/'):
+            return self.login_page()
+        if route == ('POST', '/login'):
+            return self.after_login('/files')
+        if route == ('GET', '/logout'):
+            return redirect('/#login')
+        if route == ('GET', '/files'):
+            return self.files_page(query)
+        if route == ('POST', '/files/new'):
+            folder = form.get('dir', ['/'])[0]
+            name = self.files.create(folder, f"{form.get('file-name', ['Dokument'])[0]}.docx")
+            if name is None:
+                return self.error('404 Not Found')
+            return redirect(self.files_url(folder, edit=name))
+        if route == ('POST', '/files/delete'):
+            folder = form.get('dir', ['/'])[0]
+            self.files.delete(folder, form.get('file', [''])[0])
+            return redirect(self.files_url(folder))
+        if route == ('GET', '/settings'):
+            return self.html(self.navigation() + '<main><h2>Konto</h2></main>', title="Einstellungen - HiDrive")
+        return super().handle(method, path, query, form)
+
+    def login_page(self) -> Response:
+        return self.html(
+            '<div id="privacy-consent"><button data-qa="privacy_consent_approve_all" '
+            'data-dismiss="privacy-consent">Alle akzeptieren</button></div>'
+            '<form method="post" action="/login"><input type="text" name="username" autocomplete="username">'
+            '<input type="password" name="password" autocomplete="current-password">'
+            '<button type="submit" data-qa="login_submit">Anmelden</button></form>',
+            title="HiDrive Login")
+
+    def navigation(self) -> str:
+        return ('<nav><ul><li class="sj-navigation-item" data-name="my.files"><a href="/files">Meine Dateien</a></li>'
+                '<li class="sj-navigation-item" data-name="settings.account"><a href="/settings">Konto</a></li>'
+                '</ul><a href="#logout">Abmelden</a></nav>')
+
+    def files_url(self, folder: str, **params: str) -> str:
+        return '/files?' + urlencode({'dir': folder, **params})
+
+    def files_page(self, query: dict[str, list[str]]) -> Response:
+        folder = query.get('dir', ['/'])[0]
+        entries = self.files.listing(folder)
+        if entries is None:
+            return self.error('404 Not Found')
+        tiles = []
+        for name, is_folder in entries:
+            child = posixpath.join(folder, name)
+            if is_folder:
+                href, icon = self.files_url(child), svg(FOLDER_PATH)
+            elif name.endswith('.jpg'):
+                href = self.files_url(folder, view=name)
+                icon = f'<img class="thumbnail" alt="" src="/thumbnail?file={quote(child)}">'
+            else:
+                href, icon = self.files_url(folder, edit=name), svg(FILE_PATH)
+            tiles.append(f'<tile-item><div class="itemcontent" data-delete="{_e(name)}">'
+                         f'<div class="file-item-icon" data-href="{_e(href)}">{icon}</div>'
+                         f'<span class="itemname">{_e(name)}</span></div></tile-item>')
+        overlay = ''
+        if 'view' in query:
+            name = query['view'][0]
+            overlay = (f'<div class="filesviewer-overlay"><button class="filesviewer-overlay-close" '
+                       f'data-href="{_e(self.files_url(folder))}">&times;</button><div class="imageview">'
+                       f'<img alt="{_e(name)}" src="/preview?file={quote(posixpath.join(folder, name))}"></div></div>')
+        elif 'edit' in query:
+            name = query['edit'][0]
+            src = '/collabora?' + urlencode({'file': name, 'close': self.files_url(folder)})
+            overlay = (f'<div class="office-editor"><a class="office-editor-close" href="{_e(self.files_url(folder))}">'
+                       f'Schließen</a><iframe name="collabora-online-viewer" src="{_e(src)}"></iframe></div>')
+        return self.html(
+            f'{self.navigation()}<div class="menubar"><button data-qa="menubar_more" data-toggle="more-menu">mehr</button>'
+            f'<div id="more-menu" class="menu" hidden><div class="sj-menuitem" data-qa="menubar_new_document" '
+            f'data-dismiss="more-menu" data-toggle="new-document">Neues Dokument</div></div>'
+            f'<form id="new-document" class="dialog" method="post" action="/files/new" hidden>'
+            f'<input type="hidden" name="dir" value="{_e(folder)}"><input type="text" name="file-name">'
+            f'<button type="submit" data-qa="file_create_ok">Erstellen</button></form></div>'
+            f'<div id="context-menu" class="menu" hidden><div class="sj-menuitem" data-qa="contextmenu_delete" '
+            f'data-dismiss="context-menu" data-toggle="delete-form">Löschen</div></div>'
+            f'<form id="delete-form" class="dialog" method="post" action="/files/delete" hidden>'
+            f'<input type="hidden" name="dir" value="{_e(folder)}"><input type="hidden" name="file" value="">'
+            f'<p>Wirklich löschen?</p><button type="submit" class="confirm-overlay-ok">OK</button></form>'
+            f'<main class="tiles">{"".join(tiles)}</main>{overlay}',
+            title="Meine Dateien - HiDrive")
+
+
+# provider -> (environment variable prefix, start path, app factory)
+PROVIDERS: dict[str, tuple[str, str, Callable[[FaultInjector], StandinApp]]] = {
+    'hidrive-legacy': ('HIDRIVE_LEGACY', '/#login', HiDriveLegacyStandin),
+    'hidrive-next': ('HIDRIVE_NEXT', '/identifier?', lambda faults: NextcloudStandin(faults, 'hidrive-next')),
+    'ionos-nextcloud-workspace': ('IONOS_NEXTCLOUD_WORKSPACE', '/login', NextcloudStandin),
+    'ionos-managed-nextcloud': ('IONOS_MANAGED_NEXTCLOUD', '/login', NextcloudStandin),
+    'magentacloud': ('MAGENTACLOUD', '/login', lambda faults: NextcloudStandin(faults, 'magentacloud')),
+}
+
+
+class _QuietHandler(WSGIRequestHandler):
+    """Request lines only at debug level, the monitor's own logs stay readable"""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+def start_standin_servers(host: str = '127.0.0.1', port: int = 8800, latency_ms: float = 0,
+                          jitter_ms: float = 0, error_rate: float = 0, redirects: int = 0,
+                          seed: int = 0) -> dict[str, Any]:
+    """
+    Serves every provider in a daemon thread on consecutive ports starting at 'port'
+    (0 picks free ports). Each provider gets its own fault sequence from the same seed.
+    Returns {provider: server}.
+    """
+    servers = {}
+    for offset, (provider, (_, _, factory)) in enumerate(PROVIDERS.items()):
+        faults = FaultInjector(latency_ms, jitter_ms, error_rate, redirects, seed)
+        server = make_server(host, port + offset if port else 0, factory(faults), ThreadingWSGIServer,
+                             handler_class=_QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, name=f"standin-{provider}", daemon=True)
+        thread.start()
+        servers[provider] = server
+    return servers
+
+
+def environment(servers: dict[str, Any], host: str = '127.0.0.1') -> list[str]:
+    """*_URL / *_USER / *_PASS lines pointing the transactions at the stand-in"""
+    lines = []
+    for provider, server in servers.items():
+        prefix, start, _ = PROVIDERS[provider]
+        lines += [f"{prefix}_URL=http://{host}:{server.server_port}{start}",
+                  f"{prefix}_USER=standin", f"{prefix}_PASS=standin"]
+    return lines
+
+
+def main() -> None:
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Local stand-in for the monitored providers")
+    parser.add_argument('--host', default=os.getenv('STANDIN_HOST', '127.0.0.1'),
+                        help='Address to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=int(os.getenv('STANDIN_PORT', '8800')),
+                        help='First port, providers use consecutive ports (default: 8800)')
+    parser.add_argument('--latency-ms', type=float, default=float(os.getenv('STANDIN_LATENCY_MS', '0')),
+                        help='Delay added to every response in milliseconds')
+    parser.add_argument('--jitter-ms', type=float, default=float(os.getenv('STANDIN_JITTER_MS', '0')),
+                        help='Additional random delay of 0..N milliseconds per response')
+    parser.add_argument('--error-rate', type=float, default=float(os.getenv('STANDIN_ERROR_RATE', '0')),
+                        help='Share of requests answered with 503 (0..1)')
+    parser.add_argument('--redirects', type=int, default=int(os.getenv('STANDIN_REDIRECTS', '0')),
+                        help='Redirect hops between login and the files page')
+    parser.add_argument('--seed', type=int, default=int(os.getenv('STANDIN_SEED', '0')),
+                        help='Seed for jitter and injected errors')
+    args = parser.parse_args()
+
+    if not 0 <= args.error_rate <= 1:
+        logger.error("Error rate must be between 0 and 1")
+        sys.exit(1)
+
+    servers = start_standin_servers(args.host, args.port, args.latency_ms, args.jitter_ms,
+                                    args.error_rate, args.redirects, args.seed)
+    print("\n".join(environment(servers, args.host)), flush=True)
+    logger.info(f"Stand-in running (latency {args.latency_ms:.0f}ms +0..{args.jitter_ms:.0f}ms, "
+                f"error rate {args.error_rate:.0%}, {args.redirects} redirect(s), seed {args.seed}), Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Opt-in profiling of the Python side of measure_step(), for steps that take longer than
+their browser timings explain (sync Playwright round-trips, locator re-resolution).
+
+'sample' mode: a background thread reads the stack of the step's thread every few
+milliseconds (sys._current_frames(), no tracing hooks) and writes collapsed stacks, the
+input format of flamegraph.pl and speedscope. 'cprofile' mode: cProfile around the step,
+written as a pstats file. Both add the step's self time per frame to PROFILES, which
+the trigger API serves as the top frames per usecase and step on GET /profiles.
+"""
+import cProfile
+import fnmatch
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sample', 'cprofile')
+# Frames per stack kept in collapsed output (deeper stacks are cut at the root)
+MAX_DEPTH = 128
+
+
+def parse_patterns(spec: str) -> list[str]:
+    """'hidrive_*, magentacloud_document_test' -> ['hidrive_*', 'magentacloud_document_test']"""
+    return [pattern.strip() for pattern in spec.split(',') if pattern.strip()]
+
+
+def matches(name: str, patterns: list[str]) -> bool:
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def frame_label(filename: str, function: str) -> str:
+    """'picture_test.py:login_logic'; collapsed stacks separate frames with ';'"""
+    return f"{os.path.basename(filename)}:{function}".replace(';', '_')
+
+
+def collapse(frame: Any) -> str:
+    """Stack of a frame as 'root;...;leaf'"""
+    labels: list[str] = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(frame_label(frame.f_code.co_filename, frame.f_code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """Samples the stack of one thread every 'interval' seconds in a daemon thread"""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.thread_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+            # Drop the reference, a held frame keeps all its locals alive
+            frame = None
+
+    def self_times(self) -> dict[str, float]:
+        """Estimated seconds per leaf frame"""
+        times: dict[str, float] = defaultdict(float)
+        for stack, count in self.stacks.items():
+            times[stack.rsplit(';', 1)[-1]] += count * self.interval
+        return times
+
+
+class ProfileAggregate:
+    """Self time per frame, summed over all profiled runs of each usecase and step"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._steps: dict[tuple[str, str], dict[str, Any]] = {}
+
+    def record(self, usecase: str, step: str, mode: str, self_times: dict[str, float], duration: float) -> None:
+        with self._lock:
+            entry = self._steps.setdefault((usecase, step), {'mode': mode, 'runs': 0, 'duration': 0.0,
+                                                             'frames': Counter()})
+            entry['runs'] += 1
+            entry['duration'] += duration
+            entry['frames'].update(self_times)
+
+    def top(self, usecase: str | None = None, limit: int = 20) -> list[dict[str, Any]]:
+        """Top frames by self time per usecase and step, as served on GET /profiles"""
+        with self._lock:
+            steps = sorted(self._steps.items())
+            result = []
+            for (name, step), entry in steps:
+                if usecase and name != usecase:
+                    continue
+                result.append({
+                    'usecase': name,
+                    'step': step,
+                    'mode': entry['mode'],
+                    'runs': entry['runs'],
+                    'duration': round(entry['duration'], 3),
+                    'top': [{'frame': frame, 'seconds': round(seconds, 4),
+                             'share': round(seconds / entry['duration'], 3) if entry['duration'] else 0.0}
+                            for frame, seconds in entry['frames'].most_common(limit)],
+                })
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._steps.clear()
+
+
+PROFILES = ProfileAggregate()
+
+
+class StepProfiler:
+    """
+    Context manager profiling one step of a usecase. The profile is written to
+    'directory' named like the step's screenshots. Profiling problems are logged,
+    never raised, so they can't fail the step.
+    """
+
+    def __init__(self, usecase: str, step: str, directory: Path, mode: str = 'sample',
+                 interval_ms: float = 5) -> None:
+        self.usecase = usecase
+        self.step = step
+        self.directory = directory
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.path: Path | None = None
+        self._profile: cProfile.Profile | None = None
+        self._sampler: StackSampler | None = None
+        self._started = 0.0
+
+    def __enter__(self) -> 'StepProfiler':
+        self._started = time.perf_counter()
+        try:
+            if self.mode == 'cprofile':
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+            else:
+                self._sampler = StackSampler(threading.get_ident(), self.interval)
+                self._sampler.start()
+        except Exception as e:
+            # e.g. another cProfile already active (Python 3.12+ allows one per process)
+            logger.warning(f"[{self.usecase}] Profiling of '{self.step}' not started: {e}")
+            self._profile = self._sampler = None
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        duration = time.perf_counter() - self._started
+        try:
+            if self._profile:
+                self._profile.disable()
+                self._finish(self._write_pstats(), duration)
+            elif self._sampler:
+                self._sampler.stop()
+                self._finish(self._write_collapsed(), duration)
+        except Exception as e:
+            logger.warning(f"[{self.usecase}] Failed to save profile of '{self.step}': {e}")
+
+    def _filename(self, suffix: str) -> Path:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_step_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in self.step)
+        return self.directory / f"{self.usecase}_{safe_step_name}_profile_{timestamp}{suffix}"
+
+    def _write_collapsed(self) -> dict[str, float]:
+        assert self._sampler is not None
+        self.path = self._filename('.collapsed')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self._sampler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return self._sampler.self_times()
+
+    def _write_pstats(self) -> dict[str, float]:
+        assert self._profile is not None
+        self.path = self._filename('.prof')
+        self._profile.dump_stats(str(self.path))
+        times: dict[str, float] = defaultdict(float)
+        # (file, line, function) -> (primitive calls, calls, self time, cumulative time, callers)
+        for (filename, _, function), (_, _, self_time, _, _) in pstats.Stats(self._profile).stats.items():  # type: ignore[attr-defined]
+            times[frame_label(filename, function)] += self_time
+        return times
+
+    def _finish(self, self_times: dict[str, float], duration: float) -> None:
+        PROFILES.record(self.usecase, self.step, self.mode, self_times, duration)
+        logger.info(f"[{self.usecase}] Profile of '{self.step}' saved: {self.path}")
@@ -0,0 +1,108 @@
+"""
+Unit tests for admission.py
+"""
+import threading
+import time
+from unittest.mock import patch
+
+from admission import (
+    ADMISSION_DEFERRED,
+    ADMISSION_REJECTED,
+    MEMORY_HEADROOM,
+    AdmissionController,
+    admission_wait,
+    memory_headroom,
+    pids_headroom,
+)
+
+MB = 1024 * 1024
+
+
+def write_cgroup(root, **files):
+    for name, value in files.items():
+        path = root / name.replace('__', '/')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{value}\n")
+
+
+class TestCgroupHeadroom:
+    """Test reading headroom from cgroup v2 and v1 files"""
+
+    def test_v2_memory_excludes_page_cache(self, tmp_path):
+        write_cgroup(tmp_path, **{'memory.max': 2048 * MB, 'memory.current': 1800 * MB,
+                                  'memory.stat': f"anon 1000\ninactive_file {300 * MB}"})
+        assert memory_headroom(str(tmp_path)) == 548 * MB
+
+    def test_v1_memory(self, tmp_path):
+        write_cgroup(tmp_path, **{'memory__memory.limit_in_bytes': 1024 * MB,
+                                  'memory__memory.usage_in_bytes': 1000 * MB,
+                                  'memory__memory.stat': "total_inactive_file 0"})
+        assert memory_headroom(str(tmp_path)) == 24 * MB
+
+    def test_unlimited(self, tmp_path):
+        """'max' and the huge v1 default mean no limit"""
+        write_cgroup(tmp_path, **{'memory.max': 'max', 'pids.max': 'max',
+                                  'memory__memory.limit_in_bytes': 9223372036854771712})
+        assert memory_headroom(str(tmp_path)) is None
+        assert pids_headroom(str(tmp_path)) is None
+
+    def test_pids(self, tmp_path):
+        write_cgroup(tmp_path, **{'pids.max': 512, 'pids.current': 480})
+        assert pids_headroom(str(tmp_path)) == 32
+
+    def test_no_cgroup(self, tmp_path):
+        assert memory_headroom(str(tmp_path / "missing")) is None
+        assert pids_headroom(str(tmp_path / "missing")) is None
+
+
+class TestAdmissionController:
+    """Test deferring and admitting runs"""
+
+    def test_admits_with_headroom(self, tmp_path):
+        write_cgroup(tmp_path, **{'memory.max': 2048 * MB, 'memory.current': 500 * MB,
+                                  'pids.max': 512, 'pids.current': 100})
+        controller = AdmissionController(400 * MB, 64, root=str(tmp_path))
+
+        assert controller.admit("ok")
+        assert MEMORY_HEADROOM._value.get() == 1548 * MB
+
+    def test_defers_until_headroom_recovers(self, tmp_path):
+        """A deferred run starts once the pressure is gone"""
+        write_cgroup(tmp_path, **{'pids.max': 512, 'pids.current': 500})
+        controller = AdmissionController(400 * MB, 64, max_wait=30, poll=1, root=str(tmp_path))
+        before = ADMISSION_DEFERRED.labels(usecase="busy", reason="pids")._value.get()
+
+        def recover(_):
+            write_cgroup(tmp_path, **{'pids.current': 100})
+
+        with patch.object(controller.shutdown, 'wait', side_effect=recover):
+            assert controller.admit("busy")
+        assert ADMISSION_DEFERRED.labels(usecase="busy", reason="pids")._value.get() == before + 1
+
+    def test_rejects_after_max_wait(self, tmp_path):
+        """A run is skipped when the headroom doesn't recover in time"""
+        write_cgroup(tmp_path, **{'memory.max': 2048 * MB, 'memory.current': 1900 * MB})
+        controller = AdmissionController(400 * MB, 64, max_wait=10, poll=5, root=str(tmp_path))
+        before = ADMISSION_REJECTED.labels(usecase="full", reason="memory")._value.get()
+        waited = admission_wait()
+
+        with patch.object(controller.shutdown, 'wait', return_value=False), \
+             patch('admission.time.monotonic', side_effect=[0, 5, 10, 15]):
+            assert not controller.admit("full")
+        assert ADMISSION_REJECTED.labels(usecase="full", reason="memory")._value.get() == before + 1
+        assert admission_wait() == waited + 15
+
+    def test_shutdown_ends_deferral(self, tmp_path):
+        """A deferred run gives up right away once a shutdown begins"""
+        write_cgroup(tmp_path, **{'memory.max': 2048 * MB, 'memory.current': 1900 * MB})
+        shutdown = threading.Event()
+        controller = AdmissionController(400 * MB, 64, max_wait=600, poll=60, root=str(tmp_path),
+                                         shutdown=shutdown)
+        before = ADMISSION_REJECTED.labels(usecase="draining", reason="memory")._value.get()
+        threading.Timer(0.05, shutdown.set).start()
+
+        started = time.monotonic()
+        assert not controller.admit("draining")
+
+        assert time.monotonic() - started < 5
+        assert ADMISSION_REJECTED.labels(usecase="draining", reason="memory")._value.get() == before
@@ -0,0 +1,99 @@
+"""
+Unit tests for anomaly.py
+"""
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+from anomaly import ANOMALY_SCORE, CHANGE_POINTS, EXPECTED_DURATION, BaselineEngine, hour_of_week
+
+# Monday 2024-01-01 00:00 local time
+MONDAY = datetime(2024, 1, 1).timestamp()
+FIVE_MINUTES = 300
+
+
+def feed(engine, durations, start=MONDAY, step="01_Login"):
+    """Observes durations five minutes apart, returns the scores"""
+    return [engine.observe("usecase", step, duration, start + i * FIVE_MINUTES)
+            for i, duration in enumerate(durations)]
+
+
+def noisy(level, count, seed=1):
+    rng = random.Random(seed)
+    return [level * math.exp(rng.gauss(0, 0.1)) for _ in range(count)]
+
+
+class TestHourOfWeek:
+    """Test the seasonal bucket"""
+
+    def test_hour_of_week(self):
+        assert hour_of_week(MONDAY) == 0
+        assert hour_of_week(MONDAY + 9 * 3600 + 1800) == 9
+        assert hour_of_week(datetime(2024, 1, 7, 23, 59).timestamp()) == 167
+
+
+class TestBaselineEngine:
+    """Test scoring, seasonality and change points"""
+
+    def test_warmup(self):
+        engine = BaselineEngine(min_samples=5)
+        scores = feed(engine, [2.0] * 6)
+        assert scores[:5] == [None] * 5
+        assert scores[5] == pytest.approx(0)
+
+    def test_spike_scores_high_without_moving_the_baseline(self):
+        engine = BaselineEngine()
+        feed(engine, noisy(2.0, 50))
+        score = engine.observe("usecase", "01_Login", 8.0, MONDAY + 50 * FIVE_MINUTES)
+        assert score > 10
+        assert ANOMALY_SCORE.labels(usecase="usecase", step="01_Login")._value.get() == score
+        assert EXPECTED_DURATION.labels(usecase="usecase", step="01_Login")._value.get() == pytest.approx(2.0, rel=0.1)
+        # Clipped update: the baseline stays near 2s
+        assert engine.expected("usecase", "01_Login", MONDAY + 51 * FIVE_MINUTES) == pytest.approx(2.0, rel=0.15)
+
+    def test_score_is_scale_free(self):
+        """The same relative deviation scores the same for a short and a long step"""
+        engine = BaselineEngine()
+        short = feed(engine, noisy(0.5, 50) + [0.75], step="short")
+        long = feed(engine, noisy(20.0, 50) + [30.0], step="long")
+        assert short[-1] == pytest.approx(long[-1])
+
+    def test_hour_of_week_offset(self):
+        """Monday 9am is slower every week, after a few weeks that is normal"""
+        engine = BaselineEngine()
+        rng = random.Random(3)
+        week = 7 * 24 * 12
+        scores = []
+        for i in range(3 * week):
+            timestamp = MONDAY + i * FIVE_MINUTES
+            level = 3.2 if hour_of_week(timestamp) == 9 else 2.0
+            scores.append(engine.observe("usecase", "01_Login", level * math.exp(rng.gauss(0, 0.05)), timestamp))
+        monday_9am = [score for i, score in enumerate(scores[2 * week:]) if hour_of_week(MONDAY + i * FIVE_MINUTES) == 9]
+        assert max(abs(score) for score in monday_9am) < 4
+        assert engine.expected("usecase", "01_Login", MONDAY + 9 * 3600) == pytest.approx(3.2, rel=0.05)
+        assert engine.expected("usecase", "01_Login", MONDAY + 12 * 3600) == pytest.approx(2.0, rel=0.05)
+
+    def test_level_shift_is_a_change_point(self):
+        engine = BaselineEngine()
+        before = CHANGE_POINTS.labels(usecase="usecase", step="01_Login", direction="up")._value.get()
+        scores = feed(engine, noisy(2.0, 50) + noisy(4.0, 10, seed=2))
+        assert CHANGE_POINTS.labels(usecase="usecase", step="01_Login", direction="up")._value.get() == before + 1
+        # A few high scores until the shift is confirmed, then the new level is normal
+        assert all(score > 3 for score in scores[50:53])
+        assert max(abs(score) for score in scores[55:]) < 3
+        assert engine.export()["usecase", "01_Login"]['changed'] is not None
+
+    def test_export_and_restore(self):
+        engine = BaselineEngine()
+        feed(engine, noisy(2.0, 30))
+        assert list(engine.export(changed_only=True)) == [("usecase", "01_Login")]
+        assert engine.export(changed_only=True) == {}
+
+        restored = BaselineEngine()
+        restored.restore(engine.export())
+        timestamp = MONDAY + 30 * FIVE_MINUTES
+        assert restored.expected("usecase", "01_Login", timestamp) == engine.expected("usecase", "01_Login", timestamp)
+        assert restored.observe("usecase", "01_Login", 2.0, timestamp) == engine.observe("usecase", "01_Login", 2.0,
+                                                                                           timestamp)
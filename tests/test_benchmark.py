@@ -0,0 +1,57 @@
+"""
+Unit tests for benchmark.py
+"""
+import json
+from unittest.mock import patch
+
+import benchmark
+from benchmark import BenchmarkUnavailableError, compare, main, run_benchmarks, summarize
+
+
+class TestBenchmark:
+    """Test measuring, baselines and regression detection"""
+
+    def test_summarize(self):
+        result = summarize([0.3, 0.1, 0.2, 0.4])
+        assert result['rounds'] == 4
+        assert result['median'] == 0.25
+        assert (result['min'], result['max'], result['p95']) == (0.1, 0.4, 0.4)
+
+    def test_compare_flags_slower_median(self):
+        baseline = {'a': {'median': 1.0}, 'b': {'median': 1.0}, 'c': {'median': 1.0}}
+        results = {'a': {'median': 1.1}, 'b': {'median': 1.5}, 'c': {'skipped': 'no browser'},
+                   'new': {'median': 9.0}}
+
+        regressions = compare(results, baseline, 0.2)
+
+        assert len(regressions) == 1
+        assert regressions[0].startswith('b: median 1500.000ms')
+
+    def test_cheap_benchmarks_run(self):
+        results = run_benchmarks(['measure_step', 'metric_labels', 'dispatch_latency'], rounds=5)
+        assert all(result['rounds'] == 5 and result['median'] >= 0 for result in results.values())
+
+    def test_skipped_benchmark(self):
+        def skipped(env, rounds):
+            raise BenchmarkUnavailableError("no browser")
+
+        with patch.dict(benchmark.BENCHMARKS, {'browser_startup': (skipped, 1)}):
+            assert run_benchmarks(['browser_startup']) == {'browser_startup': {'skipped': 'no browser'}}
+
+    def test_baseline_roundtrip_and_exit_codes(self, tmp_path):
+        """--save-baseline stores the results, a later slower run fails"""
+        baseline = tmp_path / "baseline.json"
+        fast = {'measure_step': {'rounds': 1, 'median': 0.001}}
+        slow = {'measure_step': {'rounds': 1, 'median': 0.01}}
+
+        with patch('benchmark.run_benchmarks', return_value=fast):
+            assert main(['--only', 'measure_step', '--baseline', str(baseline), '--save-baseline']) == 0
+        assert json.loads(baseline.read_text()) == fast
+
+        with patch('benchmark.run_benchmarks', return_value=fast):
+            assert main(['--only', 'measure_step', '--baseline', str(baseline)]) == 0
+        with patch('benchmark.run_benchmarks', return_value=slow):
+            assert main(['--only', 'measure_step', '--baseline', str(baseline)]) == 1
+
+    def test_unknown_benchmark(self):
+        assert main(['--only', 'nope']) == 2
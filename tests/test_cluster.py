@@ -0,0 +1,120 @@
+"""
+Unit tests for cluster.py
+"""
+import time
+from datetime import datetime
+from unittest.mock import MagicMock, Mock
+
+from prometheus_client import Gauge
+from prometheus_client.registry import CollectorRegistry
+
+from cluster import Cluster, InstanceLabelCollector, rendezvous_owner
+from scheduling import AdaptiveJobs
+
+
+class TestRendezvous:
+    """Test job assignment by rendezvous hashing"""
+
+    def test_jobs_are_divided(self):
+        """Every job has exactly one owner and all nodes get a share"""
+        nodes = ["node-a", "node-b", "node-c"]
+        owners = [rendezvous_owner(f"python_job_{i}", nodes) for i in range(60)]
+        assert set(owners) == set(nodes)
+
+    def test_only_dead_node_jobs_move(self):
+        """Removing a node only reassigns the jobs it owned"""
+        nodes = ["node-a", "node-b", "node-c"]
+        jobs = [f"python_job_{i}" for i in range(60)]
+        before = {job: rendezvous_owner(job, nodes) for job in jobs}
+        after = {job: rendezvous_owner(job, ["node-a", "node-c"]) for job in jobs}
+        for job in jobs:
+            if before[job] != "node-b":
+                assert after[job] == before[job]
+
+    def test_no_nodes(self):
+        assert rendezvous_owner("python_job", []) is None
+
+
+class TestCluster:
+    """Test heartbeats, failover and leases on a shared database"""
+
+    def test_nodes_divide_jobs(self, tmp_path):
+        """Two live nodes never both own a job"""
+        path = str(tmp_path / "cluster.db")
+        a, b = Cluster(path, "node-a"), Cluster(path, "node-b")
+        a.heartbeat()
+        b.heartbeat()
+        a.heartbeat()
+
+        assert a.live_nodes() == ["node-a", "node-b"]
+        for i in range(20):
+            assert a.owns(f"python_job_{i}") != b.owns(f"python_job_{i}")
+
+    def test_dead_node_is_failed_over(self, tmp_path):
+        """A node whose heartbeat is older than node_timeout loses its jobs"""
+        path = str(tmp_path / "cluster.db")
+        a, b = Cluster(path, "node-a", node_timeout=60), Cluster(path, "node-b", node_timeout=60)
+        b.heartbeat()
+        b._conn.execute('UPDATE nodes SET heartbeat = ? WHERE node_id = ?', (time.time() - 120, "node-b"))
+        a.heartbeat()
+
+        assert a.live_nodes() == ["node-a"]
+        assert all(a.owns(f"python_job_{i}") for i in range(20))
+
+    def test_stop_leaves_cluster(self, tmp_path):
+        """A stopped node is removed right away"""
+        path = str(tmp_path / "cluster.db")
+        a, b = Cluster(path, "node-a"), Cluster(path, "node-b")
+        b.heartbeat()
+        b.stop()
+        a.heartbeat()
+        assert a.live_nodes() == ["node-a"]
+
+    def test_foreign_lease_blocks_run(self, tmp_path):
+        """A new owner waits until the previous owner's lease has expired"""
+        path = str(tmp_path / "cluster.db")
+        a, b = Cluster(path, "node-a"), Cluster(path, "node-b")
+        a.heartbeat()
+        b.heartbeat()
+        a.heartbeat()
+        job = next(f"python_job_{i}" for i in range(50) if a.owns(f"python_job_{i}"))
+
+        assert not b.claim(job, 60)  # not the owner
+        assert a.claim(job, 60)
+        assert a.claim(job, 60)  # own lease can be renewed
+        # node-a dies, node-b becomes the owner but the lease is still held
+        a._conn.execute('UPDATE nodes SET heartbeat = 0 WHERE node_id = ?', ("node-a",))
+        b.heartbeat()
+        assert b.owns(job)
+        assert not b.claim(job, 60)
+        a._conn.execute('UPDATE leases SET expires = 0 WHERE job_id = ?', (job,))
+        assert b.claim(job, 60)
+
+    def test_jobs_skip_runs_they_dont_own(self, tmp_path):
+        """AdaptiveJobs only runs jobs this node claims"""
+        cluster = Mock()
+        cluster.claim.return_value = False
+        func = Mock(return_value=True)
+        jobs = AdaptiveJobs(MagicMock(), None, cluster=cluster)
+        jobs.add("python_a", "a", func, [], 300, datetime.now())
+
+        jobs.trigger("python_a")
+        func.assert_not_called()
+        cluster.claim.assert_called_once_with("python_a", 150)
+
+        cluster.claim.return_value = True
+        jobs.trigger("python_a")
+        func.assert_called_once()
+
+
+class TestInstanceLabel:
+    """Test the instance label added to exported metrics"""
+
+    def test_samples_get_instance_label(self):
+        source = CollectorRegistry()
+        gauge = Gauge('test_cluster_gauge', 'test', ['usecase'], registry=source)
+        gauge.labels(usecase="a").set(1)
+        registry = CollectorRegistry(auto_describe=False)
+        registry.register(InstanceLabelCollector("node-a", source))
+
+        assert registry.get_sample_value('test_cluster_gauge', {'usecase': 'a', 'instance': 'node-a'}) == 1
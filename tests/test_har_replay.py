@@ -0,0 +1,93 @@
+"""
+Unit tests for har_replay.py
+"""
+import base64
+import json
+from unittest.mock import MagicMock
+
+from har_replay import HAR_REPLAY_MISSES, HarReplay, har_path, response_time_ms
+
+
+def entry(url, method='GET', status=200, text='ok', timings=None, headers=None, encoding=None):
+    content = {'text': text, 'mimeType': 'text/html'}
+    if encoding:
+        content['encoding'] = encoding
+    return {
+        'request': {'method': method, 'url': url},
+        'response': {'status': status, 'headers': headers or [], 'content': content},
+        'time': 999,
+        'timings': timings or {'blocked': 50, 'dns': -1, 'connect': -1, 'send': 1, 'wait': 120, 'receive': 9},
+    }
+
+
+def write_har(tmp_path, entries):
+    path = tmp_path / "test.har"
+    path.write_text(json.dumps({'log': {'entries': entries}}), encoding='utf-8')
+    return path
+
+
+def route_for(method, url):
+    route = MagicMock()
+    route.request.method = method
+    route.request.url = url
+    return route
+
+
+class TestHarReplay:
+    """Test serving recorded responses"""
+
+    def test_har_path(self):
+        assert str(har_path('har', 'magentacloud_picture_test')) == 'har/magentacloud_picture_test.har'
+
+    def test_response_time_excludes_blocked(self):
+        """Queueing in the browser is not replayed, unknown phases (-1) are skipped"""
+        assert response_time_ms(entry('https://a/')) == 130
+        assert response_time_ms({'time': 42, 'timings': {}}) == 42
+
+    def test_repeated_requests_replayed_in_order(self, tmp_path):
+        """A URL requested twice gets both recordings, the last one repeats"""
+        replay = HarReplay(write_har(tmp_path, [entry('https://a/list', text='before'),
+                                                entry('https://a/list', text='after')]), 'test')
+        assert [replay.lookup('GET', 'https://a/list')['response']['content']['text'] for _ in range(3)] == \
+            ['before', 'after', 'after']
+        assert replay.lookup('POST', 'https://a/list') is None
+
+    def test_query_fallback(self, tmp_path):
+        """Cache busters in the query string fall back to the recording of the path"""
+        replay = HarReplay(write_har(tmp_path, [entry('https://a/app.js?v=1', text='js')]), 'test')
+        assert replay.lookup('GET', 'https://a/app.js?v=2')['response']['content']['text'] == 'js'
+
+    def test_response_arguments(self):
+        """Bodies are decoded, repeated Set-Cookie headers joined and length/encoding headers dropped"""
+        recorded = entry('https://a/img', status=302, text=base64.b64encode(b'\x89PNG').decode(), encoding='base64',
+                         headers=[{'name': 'Set-Cookie', 'value': 'a=1'}, {'name': 'set-cookie', 'value': 'b=2'},
+                                  {'name': 'Content-Encoding', 'value': 'gzip'},
+                                  {'name': 'Content-Length', 'value': '123'},
+                                  {'name': 'Location', 'value': '/next'}])
+        assert HarReplay.response(recorded) == {
+            'status': 302, 'headers': {'set-cookie': 'a=1\nb=2', 'location': '/next'}, 'body': b'\x89PNG'}
+
+    def test_fulfill_waits_recorded_time(self, tmp_path):
+        replay = HarReplay(write_har(tmp_path, [entry('https://a/')]), 'test', time_scale=0.5)
+        route = route_for('GET', 'https://a/')
+
+        replay.fulfill(route)
+
+        route.request.frame.page.wait_for_timeout.assert_called_once_with(65)
+        route.fulfill.assert_called_once_with(status=200, headers={}, body=b'ok')
+
+    def test_unrecorded_request_aborted(self, tmp_path):
+        replay = HarReplay(write_har(tmp_path, []), 'har_miss_test')
+        route = route_for('GET', 'https://a/missing')
+
+        replay.fulfill(route)
+
+        route.abort.assert_called_once()
+        route.fulfill.assert_not_called()
+        assert HAR_REPLAY_MISSES.labels(usecase='har_miss_test')._value.get() == 1
+
+    def test_attach_routes_context(self, tmp_path):
+        replay = HarReplay(write_har(tmp_path, []), 'test')
+        context = MagicMock()
+        replay.attach(context)
+        context.route.assert_called_once_with('**/*', replay.fulfill)
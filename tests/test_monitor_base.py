@@ -1,9 +1,25 @@
 """
 Unit tests for monitor_base.py
 """
+import time
+from unittest.mock import MagicMock, Mock, patch
+
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from monitor_base import MonitorBase, TRANS_DURATION, TRANS_SUCCESS, TRANS_LAST_RUN, STEP_FAILURE
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+import monitor_base
+from monitor_base import (
+    STEP_FAILURE,
+    TEARDOWN_TIMEOUTS,
+    TRANS_ABORTED,
+    TRANS_DURATION,
+    TRANS_LAST_RUN,
+    TRANS_STEP_WAIT,
+    TRANS_SUCCESS,
+    MonitorBase,
+    abort_active_runs,
+    begin_shutdown,
+)
 
 
 class TestMonitor(MonitorBase):
@@ -80,6 +96,20 @@ class TestMonitorBase:
         action.assert_called_once()
         # Duration should be 5.5 seconds
         assert mock_time.call_count == 2
+        assert monitor.step_timings == [("test_step", 5.5, True)]
+
+    def test_phase_timings(self):
+        """Browser lifecycle phases are recorded with the steps, failed ones too"""
+        monitor = TestMonitor(usecase_name="test_usecase")
+        with monitor._measure_phase("00_Browser launch"):
+            pass
+        with pytest.raises(RuntimeError):
+            with monitor._measure_phase("99_Teardown"):
+                raise RuntimeError("stuck")
+
+        assert [(step, success) for step, _, success in monitor.step_timings] == [
+            ("00_Browser launch", True), ("99_Teardown", False)
+        ]
     
     @patch('monitor_base.time.time')
     def test_measure_step_failure(self, mock_time):
@@ -154,3 +184,512 @@ class TestMetricsIntegration:
         
         # Should complete without raising
         assert True
+
+
+class TestWaitHelpers:
+    """Test the instrumented wait primitives"""
+
+    def test_sleep_is_accounted_per_step(self):
+        """Fixed sleeps inside a step are exported as kind='sleep'"""
+        monitor = TestMonitor(usecase_name="wait_test")
+        monitor.page = MagicMock()
+
+        monitor.measure_step("01_sleep", lambda: monitor.sleep(1000))
+
+        monitor.page.wait_for_timeout.assert_called_once_with(1000)
+        assert monitor._wait_times['sleep'] >= 0
+        value = TRANS_STEP_WAIT.labels(usecase="wait_test", step="01_sleep", kind="idle")._value.get()
+        assert value == 0.0
+
+    def test_wait_times_reset_between_steps(self):
+        """Each step starts with empty wait buckets"""
+        monitor = TestMonitor(usecase_name="wait_test")
+        monitor.page = MagicMock()
+
+        monitor.measure_step("01_sleep", lambda: monitor.sleep(10))
+        monitor.measure_step("02_no_wait", lambda: None)
+
+        assert monitor._wait_times == {}
+
+    def test_network_quiet_returns_once_idle(self):
+        """Returns once no request was in flight for the idle window"""
+        monitor = TestMonitor(usecase_name="wait_test")
+        monitor.page = MagicMock()
+
+        monitor.wait_for_network_quiet(idle_ms=1, timeout=1000)
+        assert 'idle' in monitor._wait_times
+
+    def test_network_quiet_returns_immediately_when_already_idle(self):
+        """The quiet window counts from the last network activity, not from the call"""
+        monitor = TestMonitor(usecase_name="wait_test")
+        monitor.page = MagicMock()
+        monitor._last_network_activity = time.perf_counter() - 10
+
+        monitor.wait_for_network_quiet(idle_ms=500, timeout=1000)
+        monitor.page.wait_for_timeout.assert_not_called()
+
+    def test_network_quiet_raises_on_timeout(self):
+        """A request that never finishes raises like networkidle, after recording the wait"""
+        monitor = TestMonitor(usecase_name="wait_test")
+        monitor.page = MagicMock()
+        monitor._inflight_requests.add(object())
+
+        with pytest.raises(PlaywrightTimeoutError):
+            monitor.wait_for_network_quiet(idle_ms=1, timeout=20)
+        assert 'idle' in monitor._wait_times
+
+    def test_track_network_counts_inflight_requests(self):
+        """Request listeners keep the in-flight set up to date"""
+        monitor = TestMonitor(usecase_name="wait_test")
+        page = MagicMock()
+        monitor._track_network(page)
+
+        handlers = {call.args[0]: call.args[1] for call in page.on.call_args_list}
+        request = object()
+        handlers["request"](request)
+        assert request in monitor._inflight_requests
+        handlers["requestfinished"](request)
+        assert not monitor._inflight_requests
+
+    def test_wait_for_response_runs_action(self):
+        """wait_for_response triggers the action inside expect_response"""
+        monitor = TestMonitor(usecase_name="wait_test")
+        monitor.page = MagicMock()
+        action = Mock()
+
+        monitor.wait_for_response("**/api/**", action)
+
+        monitor.page.expect_response.assert_called_once_with("**/api/**", timeout=30000)
+        action.assert_called_once()
+        assert 'event' in monitor._wait_times
+
+
+class TestJourneySession:
+    """Test session sharing hooks used by journeys"""
+
+    class SessionMonitor(MonitorBase):
+        login_steps = ("01_Start", "02_Login")
+        logout_steps = ("04_Logout",)
+
+        def run(self):
+            for step in ("01_Start", "02_Login", "03_Work", "04_Logout"):
+                self.measure_step(step, lambda step=step: self.page.step(step))
+
+    def test_full_run_records_home_url(self):
+        """Without a shared session every step runs and the post-login URL is kept"""
+        monitor = self.SessionMonitor(usecase_name="journey_test")
+        monitor.page = MagicMock()
+        monitor.page.url = "https://example.com/files"
+
+        monitor.run()
+
+        assert monitor.page.step.call_count == 4
+        assert monitor.session_home_url == "https://example.com/files"
+
+    def test_shared_session_skips_login_and_logout(self):
+        """Active session skips login_steps, keep_session skips logout_steps"""
+        monitor = self.SessionMonitor(usecase_name="journey_test")
+        monitor.page = MagicMock()
+        monitor.session_active = True
+        monitor.keep_session = True
+
+        monitor.run()
+
+        monitor.page.step.assert_called_once_with("03_Work")
+
+    def test_skipped_steps_drop_their_series(self):
+        """Steps skipped in a journey stop exporting the duration of an earlier standalone run"""
+        monitor = self.SessionMonitor(usecase_name="journey_series")
+        monitor.page = MagicMock()
+        monitor.run()
+        exported = {s.labels['step'] for s in TRANS_DURATION.collect()[0].samples
+                    if s.labels['usecase'] == "journey_series"}
+        assert exported == {"01_Start", "02_Login", "03_Work", "04_Logout"}
+
+        monitor.session_active = True
+        monitor.keep_session = True
+        monitor.run()
+
+        exported = {s.labels['step'] for s in TRANS_DURATION.collect()[0].samples
+                    if s.labels['usecase'] == "journey_series"}
+        assert exported == {"03_Work"}
+        waits = {s.labels['step'] for s in TRANS_STEP_WAIT.collect()[0].samples
+                 if s.labels['usecase'] == "journey_series"}
+        assert waits == {"03_Work"}
+
+    def test_execute_reuse_session_keeps_browser(self):
+        """execute(reuse_session=True) neither launches nor closes the browser"""
+        monitor = self.SessionMonitor(usecase_name="journey_test")
+        host = self.SessionMonitor(usecase_name="journey_host")
+        host.page = MagicMock()
+        host.browser = MagicMock()
+        monitor.attach_session(host)
+
+        with patch.object(monitor, 'setup') as mock_setup, patch.object(monitor, 'teardown') as mock_teardown:
+            assert monitor.execute(reuse_session=True) is True
+
+        mock_setup.assert_not_called()
+        mock_teardown.assert_not_called()
+        assert monitor.page is host.page
+
+
+class TestWarmCache:
+    """Test warm-cache (persistent profile) runs"""
+
+    @patch('monitor_base.sync_playwright')
+    def test_setup_warm_uses_persistent_context(self, mock_playwright, tmp_path):
+        """Warm mode launches a persistent context in the usecase's cache dir"""
+        mock_pw_instance = MagicMock()
+        mock_playwright.return_value.start.return_value = mock_pw_instance
+        mock_context = mock_pw_instance.chromium.launch_persistent_context.return_value
+        mock_context.pages = []
+
+        monitor = TestMonitor(usecase_name="warm_test")
+        monitor.cache_mode = 'warm'
+        with patch('monitor_base.WARM_CACHE_DIR', str(tmp_path)):
+            monitor.setup()
+
+        args, _ = mock_pw_instance.chromium.launch_persistent_context.call_args
+        assert args[0] == str(tmp_path / "warm_test")
+        mock_context.clear_cookies.assert_called_once()
+        assert monitor.page == mock_context.new_page.return_value
+        mock_pw_instance.chromium.launch.assert_not_called()
+
+        monitor.teardown()
+        mock_context.close.assert_called_once()
+
+    def test_cache_dir_recycled_when_too_large(self, tmp_path):
+        """A profile above WARM_CACHE_MAX_MB is wiped before the run"""
+        monitor = TestMonitor(usecase_name="warm_test")
+        cache_dir = tmp_path / "warm_test"
+        cache_dir.mkdir()
+        (cache_dir / ".created").touch()
+        (cache_dir / "blob").write_bytes(b"x" * 2048)
+
+        with patch('monitor_base.WARM_CACHE_DIR', str(tmp_path)), \
+             patch('monitor_base.WARM_CACHE_MAX_MB', 0):
+            monitor._prepare_cache_dir()
+
+        assert not (cache_dir / "blob").exists()
+        assert (cache_dir / ".created").exists()
+
+    def test_cache_dir_kept_when_fresh(self, tmp_path):
+        """A small, fresh profile survives across runs"""
+        monitor = TestMonitor(usecase_name="warm_test")
+        with patch('monitor_base.WARM_CACHE_DIR', str(tmp_path)):
+            cache_dir = monitor._prepare_cache_dir()
+            (cache_dir / "blob").write_bytes(b"x")
+            monitor._prepare_cache_dir()
+
+        assert (cache_dir / "blob").exists()
+
+
+class TestLifecyclePhases:
+    """Test timing of setup/teardown phases and the teardown watchdog"""
+
+    @patch('monitor_base.sync_playwright')
+    def test_setup_exports_phase_durations(self, mock_playwright):
+        """Browser launch and page creation are exported as their own steps"""
+        monitor = TestMonitor(usecase_name="phase_test")
+        monitor.setup()
+
+        for step in ("00_Browser launch", "00_Page creation"):
+            assert TRANS_DURATION.labels(usecase="phase_test", step=step)._value.get() >= 0
+
+    @patch('monitor_base.sync_playwright')
+    def test_failed_launch_counts_as_step_failure(self, mock_playwright):
+        """A browser that fails to launch increments the launch step's failure counter"""
+        mock_playwright.return_value.start.return_value.chromium.launch.side_effect = RuntimeError("no browser")
+        counter = STEP_FAILURE.labels(usecase="phase_fail", step="00_Browser launch")
+        before = counter._value.get()
+
+        monitor = TestMonitor(usecase_name="phase_fail")
+        with pytest.raises(RuntimeError):
+            monitor.setup()
+
+        assert counter._value.get() == before + 1
+
+    def test_overlapping_setups_track_their_own_driver(self):
+        """Concurrent setups each attribute only the driver process they started"""
+        import threading
+        import time as real_time
+        children = set()
+        started = threading.Event()
+
+        def start_driver():
+            pid = 1000 + len(children)
+            children.add(pid)
+            started.set()
+            real_time.sleep(0.1)  # the other setup runs meanwhile
+            return MagicMock(pid=pid)
+
+        first = TestMonitor(usecase_name="overlap_a")
+        second = TestMonitor(usecase_name="overlap_b")
+        with patch('monitor_base.sync_playwright') as mock_playwright, \
+             patch('monitor_base.proc_available', return_value=True), \
+             patch('monitor_base.child_pids', side_effect=lambda pid: set(children)), \
+             patch('monitor_base.RESOURCE_SAMPLE_INTERVAL', 0):
+            mock_playwright.return_value.start.side_effect = start_driver
+            thread = threading.Thread(target=first.setup)
+            thread.start()
+            started.wait(1)
+            second.setup()
+            thread.join()
+
+        assert first._browser_pids == {first.playwright.pid}
+        assert second._browser_pids == {second.playwright.pid}
+        assert first._browser_pids != second._browser_pids
+
+    def test_teardown_watchdog_kills_hung_browser(self):
+        """A teardown exceeding TEARDOWN_TIMEOUT is counted and the browser killed"""
+        import time as real_time
+        monitor = TestMonitor(usecase_name="hung_test")
+        monitor.page = MagicMock()
+        monitor.page.close.side_effect = lambda: real_time.sleep(0.3)
+        monitor._browser_pids = {12345}
+        counter = TEARDOWN_TIMEOUTS.labels(usecase="hung_test")
+        before = counter._value.get()
+
+        with patch('monitor_base.TEARDOWN_TIMEOUT', 0.05), \
+             patch('monitor_base.kill_process_tree', return_value=3) as mock_kill:
+            monitor.teardown()
+
+        mock_kill.assert_called_once_with({12345})
+        assert counter._value.get() == before + 1
+        assert TRANS_DURATION.labels(usecase="hung_test", step="99_Teardown")._value.get() >= 0.3
+
+
+class TestShutdown:
+    """Test draining and aborting runs on shutdown"""
+
+    def test_aborted_run_is_not_a_failure(self):
+        """A run whose browser was killed by a shutdown is reported as aborted"""
+        class KilledMonitor(MonitorBase):
+            def run(self):
+                self.measure_step("01_Step", self._killed)
+
+            def _killed(self):
+                abort_active_runs()
+                raise RuntimeError("Target closed")
+
+        monitor = KilledMonitor(usecase_name="abort_test")
+        monitor._browser_pids = {12345}
+        TRANS_SUCCESS.labels(usecase="abort_test").set(1)
+        failures = STEP_FAILURE.labels(usecase="abort_test", step="01_Step")._value.get()
+        aborted = TRANS_ABORTED.labels(usecase="abort_test")._value.get()
+
+        with patch.object(monitor, 'setup'), patch.object(monitor, 'teardown'), \
+             patch.object(monitor, '_take_screenshot') as screenshot, \
+             patch('monitor_base.kill_process_tree', return_value=4) as mock_kill:
+            assert monitor.execute() is None
+
+        mock_kill.assert_called_once_with({12345})
+        screenshot.assert_not_called()
+        assert TRANS_SUCCESS.labels(usecase="abort_test")._value.get() == 1
+        assert STEP_FAILURE.labels(usecase="abort_test", step="01_Step")._value.get() == failures
+        assert TRANS_ABORTED.labels(usecase="abort_test")._value.get() == aborted + 1
+
+    def test_no_new_runs_after_shutdown(self):
+        """Once the shutdown began, transactions don't start"""
+        monitor = TestMonitor(usecase_name="late_test")
+        try:
+            begin_shutdown()
+            with patch.object(monitor, 'setup') as setup:
+                assert monitor.execute() is None
+            setup.assert_not_called()
+        finally:
+            monitor_base._shutting_down.clear()
+
+    def test_finished_runs_are_not_tracked(self):
+        """Only runs inside execute() are aborted"""
+        monitor = TestMonitor(usecase_name="done_test")
+        with patch.object(monitor, 'setup'), patch.object(monitor, 'teardown'):
+            assert monitor.execute() is True
+        with patch('monitor_base.kill_process_tree') as mock_kill:
+            abort_active_runs()
+        mock_kill.assert_not_called()
+        assert monitor.aborted is False
+
+class TestHarMode:
+    """Test HAR recording and replay"""
+
+    @patch('monitor_base.sync_playwright')
+    def test_record_uses_context_with_har(self, mock_playwright, tmp_path):
+        """A recording run gets its own context writing to a temporary HAR file"""
+        mock_browser = mock_playwright.return_value.start.return_value.chromium.launch.return_value
+        monitor = TestMonitor(usecase_name="har_test")
+        monitor.har_mode = 'record'
+        with patch('monitor_base.HAR_DIR', str(tmp_path)):
+            monitor.setup()
+
+        mock_browser.new_context.assert_called_once_with(
+            record_har_path=str(tmp_path / "har_test.har.tmp"), record_har_content='embed')
+        assert monitor.page == mock_browser.new_context.return_value.new_page.return_value
+
+    def test_recording_kept_only_on_success(self, tmp_path):
+        monitor = TestMonitor(usecase_name="har_test")
+        with patch('monitor_base.HAR_DIR', str(tmp_path)):
+            (tmp_path / "har_test.har.tmp").write_text("{}")
+            monitor._finish_har(False)
+            assert not (tmp_path / "har_test.har.tmp").exists()
+            assert not (tmp_path / "har_test.har").exists()
+
+            (tmp_path / "har_test.har.tmp").write_text("{}")
+            monitor._finish_har(True)
+            assert (tmp_path / "har_test.har").read_text() == "{}"
+
+    @patch('monitor_base.sync_playwright')
+    def test_replay_routes_context(self, mock_playwright, tmp_path):
+        """A replayed run routes its context through the recorded HAR"""
+        mock_browser = mock_playwright.return_value.start.return_value.chromium.launch.return_value
+        (tmp_path / "har_test.har").write_text('{"log": {"entries": []}}')
+        monitor = TestMonitor(usecase_name="har_test")
+        monitor.har_mode = 'replay'
+        with patch('monitor_base.HAR_DIR', str(tmp_path)):
+            monitor.setup()
+
+        mock_browser.new_context.assert_called_once_with()
+        mock_browser.new_context.return_value.route.assert_called_once()
+
+
+class TestProfiling:
+    """Test opt-in profiling of selected usecases and steps"""
+
+    def test_only_selected_steps_are_profiled(self, tmp_path):
+        monitor = TestMonitor(usecase_name="hidrive_next_picture_test")
+        monitor.screenshots_dir = tmp_path
+        with patch('monitor_base.PROFILE_USECASES', ['hidrive_next_*']), \
+                patch('monitor_base.PROFILE_STEPS', ['02_*']), patch('monitor_base.PROFILE_MODE', 'cprofile'):
+            monitor.measure_step("01_Go to start URL", lambda: None)
+            assert list(tmp_path.iterdir()) == []
+            monitor.measure_step("02_Cookie & Login", lambda: None)
+        assert [path.suffix for path in tmp_path.iterdir()] == ['.prof']
+
+    def test_off_by_default(self, tmp_path):
+        monitor = TestMonitor(usecase_name="hidrive_next_picture_test")
+        monitor.screenshots_dir = tmp_path
+        with patch('monitor_base.PROFILE_USECASES', []):
+            monitor.measure_step("02_Cookie & Login", lambda: None)
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestSlowStepCapture:
+    """Test captures of steps that run over their baseline"""
+
+    def test_slow_step_is_captured_and_arms_the_next_run(self):
+        detector = monitor_base.SlowStepDetector(factor=2, armed_runs=1)
+        engine = monitor_base.BaselineEngine(min_samples=2)
+        monitor = TestMonitor(usecase_name="slow_usecase")
+        with patch('monitor_base.SLOW_STEP_DETECTOR', detector), patch('monitor_base.STEP_BASELINES', engine), \
+                patch.object(monitor, '_take_screenshot') as screenshot:
+            captured = []
+            for duration in (1.0, 1.0, 1.2, 5.0):
+                expected = monitor._score_step("01_Step", duration)
+                captured.append(monitor._capture_if_slow("01_Step", duration, expected))
+            assert captured == [False, False, False, True]
+
+        screenshot.assert_called_once_with("01_Step", "slow_step")
+        assert detector.take_armed("slow_usecase")
+
+    def test_armed_runs_are_compared_but_not_scored(self):
+        """Durations of recording runs neither update the baseline nor export a score"""
+        engine = monitor_base.BaselineEngine(min_samples=2)
+        monitor = TestMonitor(usecase_name="armed_usecase")
+        with patch('monitor_base.STEP_BASELINES', engine):
+            for _ in range(3):
+                monitor._score_step("01_Step", 1.0)
+            state = engine.export()["armed_usecase", "01_Step"]
+            monitor.step_recorder = MagicMock()
+
+            assert monitor._score_step("01_Step", 9.0) == pytest.approx(1.0)
+
+        assert engine.export()["armed_usecase", "01_Step"] == state
+
+    @patch('monitor_base.sync_playwright')
+    def test_armed_run_records_steps(self, mock_playwright, tmp_path):
+        detector = monitor_base.SlowStepDetector(factor=2)
+        detector.arm("slow_usecase")
+        monitor = TestMonitor(usecase_name="slow_usecase")
+        monitor.screenshots_dir = tmp_path
+        with patch('monitor_base.SLOW_STEP_DETECTOR', detector), patch('monitor_base.RESOURCE_SAMPLE_INTERVAL', 0):
+            monitor.setup()
+            recorder = monitor.step_recorder
+            assert recorder is not None
+            with patch.object(recorder, 'end_step') as end_step:
+                monitor.measure_step("01_Step", lambda: None)
+            end_step.assert_called_once_with("01_Step", keep=False)
+            monitor.teardown()
+        assert monitor.step_recorder is None
+
+    def test_armed_journey_segment_records_steps(self, tmp_path):
+        """A segment attached to the host's session takes its arming and records on the shared page"""
+        detector = monitor_base.SlowStepDetector(factor=2)
+        detector.arm("slow_segment")
+        host = TestMonitor(usecase_name="journey_host")
+        host.page = MagicMock()
+        monitor = TestMonitor(usecase_name="slow_segment")
+        monitor.screenshots_dir = tmp_path
+        with patch('monitor_base.SLOW_STEP_DETECTOR', detector):
+            monitor.attach_session(host)
+            recorder = monitor.step_recorder
+            assert recorder is not None and recorder.page is host.page
+            with patch.object(recorder, 'end_step') as end_step:
+                assert monitor.execute(reuse_session=True) is True
+            end_step.assert_called_once_with("test_step", keep=False)
+
+        assert monitor.step_recorder is None
+        assert not detector.take_armed("slow_segment")
+
+
+class TestAnomalyScoring:
+    """Test that step durations feed the baselines"""
+
+    def test_successful_steps_are_scored(self, tmp_path):
+        engine = monitor_base.BaselineEngine(min_samples=2)
+        monitor = TestMonitor(usecase_name="scored_usecase")
+        monitor.screenshots_dir = tmp_path
+        with patch('monitor_base.STEP_BASELINES', engine):
+            for _ in range(3):
+                monitor.measure_step("01_Step", lambda: None)
+            with pytest.raises(RuntimeError):
+                monitor.measure_step("02_Broken", Mock(side_effect=RuntimeError("broken")))
+        assert list(engine.export()) == [("scored_usecase", "01_Step")]
+        assert engine.export()["scored_usecase", "01_Step"]['n'] == 3
+
+    def test_replayed_runs_are_not_scored(self):
+        engine = monitor_base.BaselineEngine()
+        monitor = TestMonitor(usecase_name="scored_usecase")
+        monitor.har_mode = 'replay'
+        with patch('monitor_base.STEP_BASELINES', engine):
+            monitor.measure_step("01_Step", lambda: None)
+        assert engine.export() == {}
+
+
+class TestSloRecording:
+    """Test that finished runs are counted for the SLOs"""
+
+    def test_execute_records_run(self):
+        monitor = TestMonitor(usecase_name="slo_usecase")
+        with patch('monitor_base.SLO_TRACKER') as tracker, patch.object(monitor, 'setup'), \
+                patch.object(monitor, 'teardown'):
+            assert monitor.execute() is True
+            monitor.har_mode = 'replay'
+            monitor.execute()
+        tracker.record.assert_called_once()
+        usecase, success, duration = tracker.record.call_args[0]
+        assert (usecase, success) == ("slo_usecase", True)
+        assert duration >= 0
+
+    def test_latency_counts_transaction_steps_only(self):
+        """Browser launch, page creation and teardown don't count toward the latency SLO"""
+        class TimedMonitor(MonitorBase):
+            def run(self):
+                self.step_timings += [("00_Browser launch", 5.0, True), ("00_Page creation", 1.0, True),
+                                      ("01_Login", 2.0, True), ("02_Browse", 0.5, True)]
+
+        monitor = TimedMonitor(usecase_name="slo_steps")
+        with patch('monitor_base.SLO_TRACKER') as tracker, patch.object(monitor, 'setup'), \
+                patch.object(monitor, 'teardown', side_effect=lambda: monitor.step_timings.append(
+                    ("99_Teardown", 3.0, True))):
+            monitor.execute()
+        assert tracker.record.call_args[0][2] == 2.5
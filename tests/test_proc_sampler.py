@@ -0,0 +1,83 @@
+"""
+Unit tests for proc_sampler.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from proc_sampler import (
+    ProcessTreeSampler,
+    child_pids,
+    descendant_stats,
+    kill_process_tree,
+    proc_available,
+)
+
+pytestmark = pytest.mark.skipif(not proc_available(), reason="/proc not available")
+
+
+class TestProcHelpers:
+    """Test the /proc helper functions"""
+
+    def test_child_pids_finds_subprocess(self):
+        """A freshly spawned subprocess is a child of the current process"""
+        proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+        try:
+            assert proc.pid in child_pids(os.getpid())
+        finally:
+            proc.kill()
+            proc.wait()
+
+    def test_descendant_stats_includes_grandchildren(self):
+        """The whole tree below the roots is sampled"""
+        code = "import subprocess, sys, time; subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(5)']); time.sleep(5)"
+        proc = subprocess.Popen([sys.executable, "-c", code])
+        try:
+            for _ in range(50):
+                if len(descendant_stats({proc.pid})) >= 2:
+                    break
+                time.sleep(0.05)
+            assert len(descendant_stats({proc.pid})) >= 2
+        finally:
+            for pid in descendant_stats({proc.pid}):
+                try:
+                    os.kill(pid, 9)
+                except OSError:
+                    pass
+            proc.wait()
+
+    def test_kill_process_tree(self):
+        """All processes of the tree are killed"""
+        proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        assert kill_process_tree({proc.pid}) == 1
+        assert proc.wait(timeout=5) != 0
+
+
+class TestProcessTreeSampler:
+    """Test window accounting of the sampler"""
+
+    def test_window_reports_peaks(self):
+        """A window over a live process reports RSS, process count and fds"""
+        sampler = ProcessTreeSampler({os.getpid()}, interval=0.05)
+        sampler.begin('run')
+        stats = sampler.end('run')
+
+        assert stats['peak_rss_bytes'] > 0
+        assert stats['peak_processes'] >= 1
+        assert stats['peak_open_fds'] > 0
+        assert stats['cpu_seconds'] >= 0
+
+    def test_end_unknown_window(self):
+        """Ending a window that was never opened returns None"""
+        sampler = ProcessTreeSampler({os.getpid()})
+        assert sampler.end('step') is None
+
+    def test_start_without_roots_is_noop(self):
+        """Without roots no sampling thread is started"""
+        sampler = ProcessTreeSampler(set())
+        sampler.start()
+        assert sampler._thread is None
+        sampler.stop()
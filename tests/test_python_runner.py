@@ -71,6 +71,42 @@ class RegularClass:
         finally:
             os.unlink(temp_file)
     
+    def test_read_monitor_attributes(self):
+        """Literal class attributes are read without importing the file"""
+        runner = PythonRunner()
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+            f.write("""
+import os
+from monitor_base import MonitorBase
+
+class TestMonitor(MonitorBase):
+    cache_modes = ("cold", "warm")
+    url = os.getenv("URL")
+
+    def run(self):
+        pass
+""")
+            temp_file = f.name
+
+        try:
+            assert runner.read_monitor_attributes(temp_file) == {'cache_modes': ("cold", "warm")}
+        finally:
+            os.unlink(temp_file)
+
+    def test_read_monitor_attributes_script(self):
+        """Files without a MonitorBase subclass return None"""
+        runner = PythonRunner()
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+            f.write("print('hello')\n")
+            temp_file = f.name
+
+        try:
+            assert runner.read_monitor_attributes(temp_file) is None
+        finally:
+            os.unlink(temp_file)
+
     @patch('runners.python_runner.importlib.util.spec_from_file_location')
     @patch('runners.python_runner.importlib.util.module_from_spec')
     def test_run_class(self, mock_module_from_spec, mock_spec_from_file):
@@ -157,7 +193,7 @@ class RegularClass:
         runner.run('/fake/file.py', 'test_case')
         
         mock_has_class.assert_called_once_with('/fake/file.py')
-        mock_run_class.assert_called_once_with('/fake/file.py', 'test_case')
+        mock_run_class.assert_called_once_with('/fake/file.py', 'test_case', 'cold')
     
     @patch.object(PythonRunner, '_has_monitor_base_class')
     @patch.object(PythonRunner, '_run_script')
@@ -183,6 +219,99 @@ class RegularClass:
         mock_has_class.assert_called_once()
 
 
+class TestRunJourney:
+    """Test chaining transactions of one provider in a shared session"""
+
+    def _monitor(self, name, succeed=True):
+        monitor = MagicMock()
+        monitor.usecase_name = name
+        monitor.login_steps = ("01_Start", "02_Login")
+        monitor.session_home_url = f"https://example.com/{name}"
+        monitor.execute.return_value = succeed
+        return monitor
+
+    def test_run_journey_shares_one_browser(self):
+        """Only the first segment launches a browser, later ones reuse the session"""
+        runner = PythonRunner()
+        first, second = self._monitor("a"), self._monitor("b")
+
+        with patch.object(PythonRunner, '_has_monitor_base_class', return_value=True), \
+             patch.object(PythonRunner, '_load_monitors', side_effect=[[first], [second]]):
+            runner.run_journey("provider", [("/fake/a.py", "a"), ("/fake/b.py", "b")])
+
+        first.setup.assert_called_once()
+        first.teardown.assert_called_once()
+        second.setup.assert_not_called()
+        second.attach_session.assert_called_once_with(first)
+        second.execute.assert_called_once_with(reuse_session=True)
+        assert second.session_active is True
+        assert second.keep_session is False
+        first.page.goto.assert_called_with("https://example.com/a")
+
+    def test_run_journey_isolates_failed_segment(self):
+        """A failed segment resets the context so the next one logs in again"""
+        runner = PythonRunner()
+        first, second = self._monitor("a", succeed=False), self._monitor("b")
+
+        with patch.object(PythonRunner, '_has_monitor_base_class', return_value=True), \
+             patch.object(PythonRunner, '_load_monitors', side_effect=[[first], [second]]):
+            runner.run_journey("provider", [("/fake/a.py", "a"), ("/fake/b.py", "b")])
+
+        first.new_session_page.assert_called_once()
+        assert second.session_active is False
+        second.execute.assert_called_once_with(reuse_session=True)
+
+    def test_run_journey_stops_on_shutdown(self):
+        """An aborted segment ends the journey without starting the next one"""
+        runner = PythonRunner()
+        first, second = self._monitor("a"), self._monitor("b")
+        first.execute.return_value = None
+
+        with patch.object(PythonRunner, '_has_monitor_base_class', return_value=True), \
+             patch.object(PythonRunner, '_load_monitors', side_effect=[[first], [second]]):
+            assert runner.run_journey("provider", [("/fake/a.py", "a"), ("/fake/b.py", "b")]) is None
+
+        second.execute.assert_not_called()
+        first.teardown.assert_called_once()
+
+
+class TestAdmission:
+    """Test admission control before a browser launch"""
+
+    def test_not_admitted_run_is_skipped(self):
+        """A run without headroom returns None and doesn't start a browser"""
+        admission = Mock()
+        admission.admit.return_value = False
+        runner = PythonRunner(admission)
+
+        with patch.object(PythonRunner, '_run_class') as run_class, \
+             patch.object(PythonRunner, '_has_monitor_base_class', return_value=True):
+            assert runner.run("/fake/test.py", "test") is None
+
+        admission.admit.assert_called_once_with("test")
+        run_class.assert_not_called()
+
+    def test_admitted_run_executes(self):
+        admission = Mock()
+        admission.admit.return_value = True
+        runner = PythonRunner(admission)
+
+        with patch.object(PythonRunner, '_run_class', return_value=True), \
+             patch.object(PythonRunner, '_has_monitor_base_class', return_value=True):
+            assert runner.run("/fake/test.py", "test") is True
+
+    def test_journey_is_admitted_once(self):
+        admission = Mock()
+        admission.admit.return_value = False
+        runner = PythonRunner(admission)
+
+        with patch.object(PythonRunner, '_load_monitors') as load_monitors:
+            assert runner.run_journey("journey_provider", [("/fake/a.py", "a")]) is None
+
+        admission.admit.assert_called_once_with("journey_provider")
+        load_monitors.assert_not_called()
+
+
 class TestPythonRunnerIntegration:
     """Integration tests with actual file execution"""
     
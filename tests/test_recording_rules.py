@@ -0,0 +1,86 @@
+"""
+Unit tests for recording_rules.py
+"""
+import json
+import os
+import re
+
+from recording_rules import (
+    DEFAULT_OUTPUT,
+    discover_usecases,
+    main,
+    render,
+    rule_groups,
+    with_provider,
+)
+
+DASHBOARD = os.path.join(os.path.dirname(DEFAULT_OUTPUT), 'grafana', 'provisioning', 'dashboards',
+                         'executive_dashboard.json')
+
+
+class TestDiscovery:
+    """Test finding the providers and usecases"""
+
+    def test_shipped_transactions(self):
+        providers = discover_usecases()
+        assert set(providers) == {'hidrive-legacy', 'hidrive-next', 'ionos-managed-nextcloud',
+                                  'ionos-nextcloud-workspace', 'magentacloud'}
+        assert 'hidrive-next_picture_test' in providers['hidrive-next']
+
+    def test_nested_and_private_files(self, tmp_path):
+        (tmp_path / 'acme' / 'nested').mkdir(parents=True)
+        (tmp_path / 'acme' / 'login.py').write_text('')
+        (tmp_path / 'acme' / 'nested' / 'upload.py').write_text('')
+        (tmp_path / 'acme' / '__init__.py').write_text('')
+        (tmp_path / 'top_level.py').write_text('')
+        assert discover_usecases(str(tmp_path)) == {'acme': ['acme_login', 'acme_nested_upload']}
+
+
+class TestRules:
+    """Test the generated rules"""
+
+    def test_provider_label_prefers_longest_name(self):
+        expression = with_provider('up', ['hidrive', 'hidrive-next'])
+        pattern = re.search(r'"usecase", "(.*)"\)$', expression).group(1)
+        match = re.fullmatch(pattern, 'hidrive-next_picture_test')
+        assert match and match.group(1) == 'hidrive-next'
+        assert re.fullmatch(pattern, 'hidrive_login').group(1) == 'hidrive'
+
+    def test_render_quotes_expressions(self):
+        rules = render({'acme': ['acme_login']})
+        assert '#   acme: 1 transaction(s)' in rules
+        assert "        expr: 'label_replace(avg_over_time(transaction_success[5m])" in rules
+        for line in rules.splitlines():
+            if line.strip().startswith('expr:'):
+                assert line.count("'") == 2
+
+    def test_shipped_file_is_up_to_date(self):
+        assert main(['--check']) == 0
+
+    def test_check_detects_outdated_file(self, tmp_path):
+        output = tmp_path / 'rules.yml'
+        output.write_text('groups: []\n')
+        assert main(['--check', '--output', str(output)]) == 1
+        assert main(['--output', str(output)]) == 0
+        assert main(['--check', '--output', str(output)]) == 0
+
+    def test_dashboard_reads_recorded_series(self):
+        recorded = {record for _, _, rules in rule_groups(['acme']) for record, _ in rules}
+        with open(DASHBOARD, encoding='utf-8') as f:
+            dashboard = json.load(f)
+        queries = [target['expr'] for panel in dashboard['panels'] for target in panel.get('targets', [])]
+        queries += [variable['query'] for variable in dashboard['templating']['list']]
+        # Instant panels of the current status may read the raw gauge
+        aggregated = [query for query in queries if query != 'transaction_success' and not query.startswith('min(')]
+        assert aggregated
+        for query in aggregated:
+            assert any(record in query for record in recorded), query
+
+
+    def test_every_recorded_series_is_read(self):
+        """Each rule feeds the dashboard or another rule, none is evaluated for nothing"""
+        rules = [rule for _, _, group in rule_groups(['acme']) for rule in group]
+        with open(DASHBOARD, encoding='utf-8') as f:
+            dashboard = f.read()
+        for record, _ in rules:
+            assert record in dashboard or any(record in expression for _, expression in rules), record
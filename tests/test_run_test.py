@@ -0,0 +1,152 @@
+"""
+Unit tests for run_test.py
+"""
+import json
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+import pytest
+
+import run_test
+from run_test import TESTS, execute_test, json_report, junit_xml, main, run_tests, select_tests
+
+FAKE_TRANSACTION = '''
+from monitor_base import MonitorBase
+
+class FakeTest(MonitorBase):
+    def __init__(self):
+        super().__init__(usecase_name="fake_test")
+
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def run(self):
+        self.measure_step("01_First", lambda: None)
+        self.measure_step("02_Second", self.second)
+
+    def second(self):
+        if self.headless:
+            raise RuntimeError("only works headed")
+'''
+
+
+def result(test, success=True, steps=(("01_Login", 1.5, True),), error=None):
+    return {'test': test, 'provider': TESTS[test]['dir'], 'class': TESTS[test]['class'], 'success': success,
+            'duration': 2.0, 'steps': [{'step': s, 'duration': d, 'success': ok} for s, d, ok in steps],
+            'error': error}
+
+
+@pytest.fixture
+def fake_test(tmp_path, monkeypatch):
+    """A 'fake' test whose transaction fails its second step when headless"""
+    (tmp_path / 'transactions' / 'fake').mkdir(parents=True)
+    (tmp_path / 'transactions' / 'fake' / 'fake_test.py').write_text(FAKE_TRANSACTION)
+    monkeypatch.setattr(run_test, 'project_root', tmp_path)
+    monkeypatch.setitem(TESTS, 'fake', {'dir': 'fake', 'file': 'fake_test.py', 'class': 'FakeTest'})
+    monkeypatch.chdir(tmp_path)
+    return 'fake'
+
+
+class TestSelectTests:
+    """Test filtering by id, pattern and provider"""
+
+    def test_all_and_ids(self):
+        assert select_tests(['all']) == list(TESTS)
+        assert select_tests(['hidrive-next']) == ['hidrive-next']
+
+    def test_patterns(self):
+        assert select_tests(['*-settings']) == [test for test in TESTS if test.endswith('-settings')]
+        assert len(select_tests(['*-document', 'magentacloud'])) == 6
+
+    def test_provider(self):
+        assert select_tests(['all'], ['ionos-nextcloud-workspace']) == [
+            'nextcloud-workspace', 'nextcloud-workspace-settings', 'nextcloud-workspace-document'
+        ]
+        assert select_tests(['*-document'], ['magentacloud', 'hidrive-next']) == [
+            'hidrive-next-document', 'magentacloud-document'
+        ]
+
+    def test_no_match(self):
+        assert select_tests(['nope']) == []
+
+
+class TestExecuteTest:
+    """Test running a transaction and collecting its steps"""
+
+    def test_success_with_steps(self, fake_test):
+        outcome = execute_test(fake_test, headless=False)
+        assert outcome['success'] is True
+        assert outcome['error'] is None
+        assert [step['step'] for step in outcome['steps']] == ['01_First', '02_Second']
+
+    def test_failed_step(self, fake_test):
+        """The instance's headless flag is used, not the HEADLESS variable"""
+        outcome = execute_test(fake_test, headless=True)
+        assert outcome['success'] is False
+        assert outcome['error'] == "Step '02_Second' failed"
+        assert [step['success'] for step in outcome['steps']] == [True, False]
+
+    def test_broken_file(self, fake_test, tmp_path):
+        (tmp_path / 'transactions' / 'fake' / 'fake_test.py').write_text("raise ImportError('broken')")
+        outcome = execute_test(fake_test)
+        assert outcome['success'] is False
+        assert outcome['error'] == "ImportError: broken"
+        assert 'Traceback' in outcome['traceback']
+
+    def test_parallel_keeps_order(self):
+        with patch('run_test.execute_test', side_effect=lambda test, headless: result(test)) as execute:
+            results = run_tests(['magentacloud', 'hidrive-next', 'hidrive-legacy'], jobs=3)
+        assert [r['test'] for r in results] == ['magentacloud', 'hidrive-next', 'hidrive-legacy']
+        # Parallel runs are always headless
+        assert all(call.kwargs['headless'] for call in execute.call_args_list)
+
+
+class TestReports:
+    """Test the JUnit XML and JSON reports"""
+
+    def test_junit_xml(self):
+        results = [result('hidrive-next'),
+                   result('magentacloud', False, (("01_Login", 0.5, True), ("02_Open", 30.0, False)),
+                          "Step '02_Open' failed")]
+        suite = ET.fromstring(junit_xml(results, 12.5))
+        assert suite.get('tests') == '2' and suite.get('failures') == '1' and suite.get('time') == '12.500'
+
+        passed, failed = suite.findall('testcase')
+        assert passed.get('classname') == 'transactions.hidrive-next.HiDriveNextPictureTest'
+        assert passed.find('failure') is None
+        assert failed.find('failure').get('message') == "Step '02_Open' failed"
+        assert [(p.get('name'), p.get('value')) for p in failed.iter('property')] == [
+            ('01_Login', '0.500'), ('02_Open', '30.000')
+        ]
+        assert '02_Open: 30.000s FAILED' in failed.find('system-out').text
+
+    def test_json_report(self):
+        report = json_report([result('hidrive-next'), result('magentacloud', False)], 3.21, 2)
+        assert (report['passed'], report['failed'], report['jobs']) == (1, 1, 2)
+        assert report['tests'][0]['steps'][0] == {'step': '01_Login', 'duration': 1.5, 'success': True}
+
+
+class TestMain:
+    """Test the command line and exit codes"""
+
+    def test_exit_codes(self, tmp_path):
+        with patch('run_test.load_env_file'), patch('run_test.configure_logging'), \
+                patch('run_test.run_tests', return_value=[result('hidrive-next')]) as run:
+            assert main(['hidrive-next', '--json', str(tmp_path / 'r.json')]) == 0
+            run.assert_called_once_with(['hidrive-next'], 1, False)
+            assert json.loads((tmp_path / 'r.json').read_text())['passed'] == 1
+
+            run.return_value = [result('hidrive-next'), result('magentacloud', False)]
+            assert main(['hidrive-next', 'magentacloud', '-j', '4']) == 1
+            # Capped at the number of tests, headless because parallel
+            run.assert_called_with(['hidrive-next', 'magentacloud'], 2, True)
+
+        assert main(['nope']) == 2
+        assert main([]) == 2
+
+    def test_list(self, capsys):
+        assert main(['--list', '-p', 'magentacloud']) == 0
+        assert capsys.readouterr().out.split() == ['magentacloud', 'magentacloud-settings', 'magentacloud-document']
@@ -0,0 +1,557 @@
+"""
+Unit tests for scheduling.py
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+from monitor_base import MonitorBase
+from scheduling import (
+    EFFECTIVE_INTERVAL,
+    QUEUE_WAIT,
+    RATE_LIMITED,
+    SCHEDULE_ATTRIBUTES,
+    SKIPPED_RUNS,
+    AdaptiveInterval,
+    AdaptiveJobs,
+    CapacityPlanner,
+    PriorityDispatcher,
+    RateLimiter,
+    StateStore,
+    in_active_window,
+    load_schedule,
+    merge_schedules,
+    parse_rate_limits,
+    parse_window,
+)
+
+
+class TestAdaptiveInterval:
+    """Test the adaptive interval policy"""
+
+    def _policy(self):
+        policy = AdaptiveInterval(recheck=60, maximum=900, factor=2, stable_runs=3, confirmations=2)
+        policy.register("usecase", 300)
+        return policy
+
+    def test_failure_moves_to_recheck_lane(self):
+        """A failure is re-checked at the short interval"""
+        policy = self._policy()
+        assert policy.record("usecase", False) == 60
+
+    def test_confirmed_incident_returns_to_base(self):
+        """After 'confirmations' re-checks still failing, the base interval is used again"""
+        policy = self._policy()
+        intervals = [policy.record("usecase", False) for _ in range(3)]
+        assert intervals == [60, 60, 300]
+
+    def test_success_clears_incident(self):
+        """A success on the re-check lane goes back to the base interval"""
+        policy = self._policy()
+        policy.record("usecase", False)
+        assert policy.record("usecase", True) == 300
+
+    def test_stable_usecase_backs_off_to_maximum(self):
+        """Every 'stable_runs' successes the interval grows, capped at maximum"""
+        policy = self._policy()
+        intervals = [policy.record("usecase", True) for _ in range(9)]
+        assert intervals == [300, 300, 600, 600, 600, 900, 900, 900, 900]
+
+    def test_failure_after_backoff_rechecks(self):
+        """A stretched usecase that fails is re-checked quickly"""
+        policy = self._policy()
+        for _ in range(3):
+            policy.record("usecase", True)
+        assert policy.record("usecase", False) == 60
+
+
+class TestAdaptiveJobs:
+    """Test rescheduling of APScheduler jobs"""
+
+    def test_add_registers_interval_job(self):
+        """Jobs are added as interval jobs and export their interval"""
+        scheduler = MagicMock()
+        jobs = AdaptiveJobs(scheduler, None)
+
+        jobs.add("python_test", "test", Mock(return_value=True), [], 300, datetime.now())
+
+        _, kwargs = scheduler.add_job.call_args
+        assert kwargs['seconds'] == 300
+        assert kwargs['id'] == "python_test"
+        assert EFFECTIVE_INTERVAL.labels(usecase="test")._value.get() == 300
+
+    def test_run_reschedules_on_failure(self):
+        """A failed run reschedules the job on the re-check lane"""
+        scheduler = MagicMock()
+        policy = AdaptiveInterval(recheck=60, maximum=300)
+        jobs = AdaptiveJobs(scheduler, policy)
+        func = Mock(return_value=False)
+        jobs.add("python_failing", "failing", func, ["/fake.py"], 300, datetime.now())
+
+        jobs.run("python_failing")
+
+        func.assert_called_once_with("/fake.py")
+        scheduler.reschedule_job.assert_called_once_with("python_failing", trigger='interval', seconds=60, jitter=None)
+        assert EFFECTIVE_INTERVAL.labels(usecase="failing")._value.get() == 60
+
+    def test_run_without_change_does_not_reschedule(self):
+        """Successful runs at the base interval leave the job alone"""
+        scheduler = MagicMock()
+        jobs = AdaptiveJobs(scheduler, AdaptiveInterval(recheck=60, maximum=300))
+        jobs.add("python_ok", "ok", Mock(return_value=True), [], 300, datetime.now())
+
+        jobs.run("python_ok")
+
+        scheduler.reschedule_job.assert_not_called()
+
+
+class TestScheduleConfig:
+    """Test per-transaction schedule resolution"""
+
+    def test_defaults(self, tmp_path):
+        """Without attributes or sidecar the global interval is used"""
+        schedule = load_schedule(str(tmp_path / "test.py"), None, 300)
+        assert schedule == {'interval': 300, 'jitter': 0, 'priority': 5, 'active_windows': [],
+                            'deadline': None, 'catch_up': 'once', 'rate_group': None}
+
+    def test_class_attributes(self, tmp_path):
+        """Class attributes override the defaults"""
+        attributes = {'schedule_interval': 900, 'schedule_jitter': 30, 'priority': 1,
+                      'active_windows': (("07:00", "20:00"),)}
+        schedule = load_schedule(str(tmp_path / "test.py"), attributes, 300)
+        assert schedule['interval'] == 900
+        assert schedule['jitter'] == 30
+        assert schedule['priority'] == 1
+        assert schedule['active_windows'] == [(420, 1200, set(range(7)))]
+
+    def test_attributes_are_declared_on_monitor_base(self):
+        """Every schedule attribute has a default on MonitorBase"""
+        for attribute in SCHEDULE_ATTRIBUTES.values():
+            assert hasattr(MonitorBase, attribute), attribute
+
+    def test_sidecar_overrides_attributes(self, tmp_path):
+        """schedule.json applies '*' first, then the file's own entry"""
+        (tmp_path / "schedule.json").write_text(json.dumps({
+            "*": {"interval": 600, "priority": 3},
+            "document_test": {"interval": 1800},
+        }))
+        schedule = load_schedule(str(tmp_path / "document_test.py"), {'schedule_interval': 120}, 300)
+        assert schedule['interval'] == 1800
+        assert schedule['priority'] == 3
+
+    def test_invalid_window_is_ignored(self, tmp_path):
+        """A malformed window logs an error and keeps the job always active"""
+        schedule = load_schedule(str(tmp_path / "test.py"), {'active_windows': (("7am",),)}, 300)
+        assert schedule['active_windows'] == []
+
+    def test_weekday_window(self):
+        """Windows with weekdays only match on those days"""
+        window = parse_window(("08:00", "18:00", "mon-fri"))
+        assert in_active_window([window], datetime(2024, 1, 1, 9, 0))  # Monday
+        assert not in_active_window([window], datetime(2024, 1, 6, 9, 0))  # Saturday
+        assert not in_active_window([window], datetime(2024, 1, 1, 18, 0))
+
+    def test_overnight_window(self):
+        """Windows crossing midnight belong to the day they start"""
+        window = parse_window(("22:00", "06:00", "fri"))
+        assert in_active_window([window], datetime(2024, 1, 5, 23, 0))  # Friday night
+        assert in_active_window([window], datetime(2024, 1, 6, 5, 0))  # Saturday morning
+        assert not in_active_window([window], datetime(2024, 1, 6, 23, 0))
+
+    def test_merge_schedules(self):
+        """A journey runs as often and as urgently as its most demanding transaction"""
+        merged = merge_schedules([
+            {'interval': 300, 'jitter': 0, 'priority': 5, 'active_windows': [], 'deadline': None,
+             'catch_up': 'skip', 'rate_group': 'ionos-id'},
+            {'interval': 900, 'jitter': 20, 'priority': 2, 'active_windows': [(0, 60, {0})], 'deadline': 60,
+             'catch_up': 'once', 'rate_group': 'ionos-id'},
+        ])
+        assert merged == {'interval': 300, 'jitter': 20, 'priority': 2, 'active_windows': [],
+                          'deadline': 60, 'catch_up': 'skip', 'rate_group': 'ionos-id'}
+
+    def test_unknown_catch_up_uses_default(self, tmp_path):
+        """An unknown catch_up policy falls back to the global default"""
+        schedule = load_schedule(str(tmp_path / "test.py"), {'catch_up': 'later'}, 300, 'spread')
+        assert schedule['catch_up'] == 'spread'
+
+    def test_run_outside_window_is_skipped(self):
+        """Jobs don't run outside their active windows"""
+        func = Mock(return_value=True)
+        jobs = AdaptiveJobs(MagicMock(), None)
+        jobs.add("python_windowed", "windowed", func, [], 300, datetime.now(),
+                 active_windows=[parse_window(("08:00", "09:00"))])
+
+        with patch('scheduling.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0)
+            jobs.run("python_windowed")
+
+        func.assert_not_called()
+
+
+class TestPriorityDispatcher:
+    """Tests for the priority queue between APScheduler and the workers"""
+
+    def _drain(self, dispatcher):
+        """Runs all ready entries synchronously in the calling thread"""
+        dispatcher._stopping = True
+        dispatcher._worker()
+        dispatcher._stopping = False
+
+    def test_runs_by_priority(self):
+        """More urgent runs start first, regardless of queue order"""
+        order = []
+        dispatcher = PriorityDispatcher()
+        dispatcher.submit("python_docs", "docs", lambda: order.append("docs"), priority=8)
+        dispatcher.submit("python_login", "login", lambda: order.append("login"), priority=1)
+        dispatcher.submit("python_files", "files", lambda: order.append("files"), priority=5)
+
+        self._drain(dispatcher)
+
+        assert order == ["login", "files", "docs"]
+        assert QUEUE_WAIT.labels(usecase="login")._value.get() >= 0
+
+    def test_pending_run_is_not_duplicated(self):
+        """A job that is already queued is not queued a second time"""
+        dispatcher = PriorityDispatcher()
+        before = SKIPPED_RUNS.labels(usecase="dup", reason="overrun")._value.get()
+
+        assert dispatcher.submit("python_dup", "dup", Mock())
+        assert not dispatcher.submit("python_dup", "dup", Mock())
+        assert SKIPPED_RUNS.labels(usecase="dup", reason="overrun")._value.get() == before + 1
+
+    @pytest.mark.parametrize("catch_up,queued", [("skip", False), ("once", True), ("spread", True)])
+    def test_catch_up_while_running(self, catch_up, queued):
+        """While a job runs, 'skip' drops the next run, 'once' and 'spread' keep one"""
+        dispatcher = PriorityDispatcher()
+        dispatcher._running.add("python_busy")
+
+        assert dispatcher.submit("python_busy", "busy", Mock(), catch_up=catch_up, spread_delay=60) == queued
+        if catch_up == "spread":
+            dispatcher._running.discard("python_busy")
+            entry, wait = dispatcher._pop_ready()
+            assert entry is None and wait > 50
+
+    def test_missed_deadline_is_dropped(self):
+        """Runs that wait longer than their deadline are dropped"""
+        func = Mock()
+        dispatcher = PriorityDispatcher()
+        before = SKIPPED_RUNS.labels(usecase="late", reason="deadline")._value.get()
+
+        with patch('scheduling.time.monotonic', return_value=100):
+            dispatcher.submit("python_late", "late", func, deadline=30)
+        with patch('scheduling.time.monotonic', return_value=200):
+            self._drain(dispatcher)
+
+        func.assert_not_called()
+        assert SKIPPED_RUNS.labels(usecase="late", reason="deadline")._value.get() == before + 1
+
+    def test_failing_run_does_not_stop_worker(self):
+        """An exception in a run is logged and the next run still starts"""
+        func = Mock()
+        dispatcher = PriorityDispatcher()
+        dispatcher.submit("python_bad", "bad", Mock(side_effect=RuntimeError("boom")), priority=1)
+        dispatcher.submit("python_good", "good", func, priority=2)
+
+        self._drain(dispatcher)
+
+        func.assert_called_once()
+        assert not dispatcher._running
+
+    def test_worker_threads(self):
+        """Started workers execute submitted runs"""
+        done = threading.Event()
+        dispatcher = PriorityDispatcher(workers=2)
+        dispatcher.start()
+        try:
+            dispatcher.submit("python_thread", "thread", done.set)
+            assert done.wait(timeout=5)
+        finally:
+            dispatcher.stop()
+
+    def test_job_never_runs_twice_at_once(self):
+        """A caught-up run waits for the running instance even when another worker is idle"""
+        release = threading.Event()
+        started = threading.Event()
+        lock = threading.Lock()
+        active, peak, runs = [0], [0], []
+
+        def run():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+                runs.append(active[0])
+            started.set()
+            release.wait(5)
+            with lock:
+                active[0] -= 1
+
+        dispatcher = PriorityDispatcher(workers=2)
+        dispatcher.start()
+        try:
+            dispatcher.submit("python_a", "a", run)
+            assert started.wait(timeout=5)
+            assert dispatcher.submit("python_a", "a", run, catch_up="once")
+            time.sleep(0.2)
+            assert len(runs) == 1
+            assert dispatcher.state("python_a") == "running"
+            release.set()
+            deadline = time.monotonic() + 5
+            while len(runs) < 2 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            dispatcher.stop()
+
+        assert len(runs) == 2
+        assert peak[0] == 1
+
+    def test_stop_waits_for_grace_period(self):
+        """stop() returns False when a run is still in flight after the timeout"""
+        release = threading.Event()
+        started = threading.Event()
+        dispatcher = PriorityDispatcher()
+        dispatcher.start()
+        dispatcher.submit("python_slow", "slow", lambda: (started.set(), release.wait(5)))
+        assert started.wait(timeout=5)
+
+        assert dispatcher.stop(timeout=0.1) is False
+        assert not dispatcher.submit("python_new", "new", Mock())
+        release.set()
+        assert dispatcher.stop(timeout=5) is True
+
+    def test_jobs_enqueue_on_dispatcher(self):
+        """With a dispatcher, APScheduler triggers only queue the run"""
+        dispatcher = Mock()
+        jobs = AdaptiveJobs(MagicMock(), None, dispatcher)
+        jobs.add("python_queued", "queued", Mock(return_value=True), [], 300, datetime.now(),
+                 priority=1, catch_up="spread")
+
+        jobs.trigger("python_queued")
+
+        args, kwargs = dispatcher.submit.call_args
+        assert args[:2] == ("python_queued", "queued")
+        assert kwargs['priority'] == 1
+        assert kwargs['deadline'] == 300
+        assert kwargs['catch_up'] == "spread"
+        assert kwargs['spread_delay'] == 150
+        assert kwargs['rate_group'] is None
+
+    def test_rate_group_defers_to_other_runs(self):
+        """When a rate group is out of tokens, other ready runs start first"""
+        order = []
+        dispatcher = PriorityDispatcher(limiter=RateLimiter({"ionos-id": (1, 60)}))
+        before = RATE_LIMITED.labels(group="ionos-id")._value.get()
+        dispatcher.submit("python_a", "a", lambda: order.append("a"), priority=1, rate_group="ionos-id")
+        dispatcher.submit("python_b", "b", lambda: order.append("b"), priority=2, rate_group="ionos-id")
+        dispatcher.submit("python_c", "c", lambda: order.append("c"), priority=3)
+
+        self._drain(dispatcher)
+
+        assert order == ["a", "c"]
+        assert RATE_LIMITED.labels(group="ionos-id")._value.get() == before + 1
+        entry, wait = dispatcher._pop_ready()
+        assert entry is None and 50 < wait <= 60
+
+
+class TestRateLimiter:
+    """Tests for the per-group token buckets"""
+
+    def test_parse_rate_limits(self):
+        """Limits are parsed per group, invalid entries are ignored"""
+        assert parse_rate_limits("ionos-id:6/60, telekom-idm:4/30,bad") == {
+            'ionos-id': (6, 60.0), 'telekom-idm': (4, 30.0)}
+        assert parse_rate_limits("") == {}
+
+    def test_burst_then_refill(self):
+        """A group allows a burst of 'runs' starts, then refills at runs/period"""
+        limiter = RateLimiter({"ionos-id": (2, 60)})
+        with patch('scheduling.time.monotonic', return_value=0):
+            assert limiter.acquire("ionos-id") == 0
+            assert limiter.acquire("ionos-id") == 0
+            assert limiter.acquire("ionos-id") == pytest.approx(30)
+        with patch('scheduling.time.monotonic', return_value=30):
+            assert limiter.acquire("ionos-id") == 0
+
+    def test_unlimited_groups(self):
+        """Runs without a group or with an unknown group are never held back"""
+        limiter = RateLimiter({"ionos-id": (1, 60)})
+        assert limiter.acquire(None) == 0
+        assert limiter.acquire("other") == 0
+        assert limiter.acquire("other") == 0
+
+
+class TestStateStore:
+    """Tests for scheduler state persisted across restarts"""
+
+    def test_roundtrip(self, tmp_path):
+        """Last runs and adaptive state survive reopening the database"""
+        path = str(tmp_path / "state" / "scheduler.db")
+        store = StateStore(path)
+        store.record_run("python_a", 1000.0)
+        store.save_adaptive("a", {'interval': 60, 'successes': 0, 'failures': 1, 'base': 300})
+        store.close()
+
+        store = StateStore(path)
+        assert store.last_run("python_a") == 1000.0
+        assert store.last_run("python_b") is None
+        assert store.load_adaptive() == {'a': {'interval': 60, 'successes': 0, 'failures': 1, 'base': 300}}
+        store.close()
+
+    def test_baselines_roundtrip(self, tmp_path):
+        path = str(tmp_path / "scheduler.db")
+        store = StateStore(path)
+        state = {'n': 3, 'level': 0.7, 'var': 0.01, 'pos': 0.0, 'neg': 0.0, 'seasonal': {'9': [3, 0.4, []]},
+                 'changed': None}
+        store.save_baselines({("a", "01_Login"): state})
+        store.save_baselines({("a", "01_Login"): {**state, 'n': 4}, ("a", "02_Open"): state})
+        store.close()
+
+        store = StateStore(path)
+        assert store.load_baselines() == {("a", "01_Login"): {**state, 'n': 4}, ("a", "02_Open"): state}
+        store.close()
+
+    def test_slo_buckets(self, tmp_path):
+        """Buckets are upserted, old ones deleted"""
+        store = StateStore(str(tmp_path / "scheduler.db"))
+        store.save_slo_buckets([("next", "availability", 60.0, 1, 0), ("next", "availability", 120.0, 1, 1)], 0)
+        store.save_slo_buckets([("next", "availability", 120.0, 2, 1), ("next", "latency", 180.0, 1, 0)], 100)
+        assert store.load_slo_buckets(0) == [("next", "availability", 120.0, 2, 1), ("next", "latency", 180.0, 1, 0)]
+        assert store.load_slo_buckets(150) == [("next", "latency", 180.0, 1, 0)]
+        store.close()
+
+    def test_restart_resumes_cadence(self, tmp_path):
+        """A job that ran recently is scheduled one interval after its last run"""
+        store = StateStore(str(tmp_path / "scheduler.db"))
+        last_run = datetime.now() - timedelta(seconds=100)
+        store.record_run("python_a", last_run.timestamp())
+        scheduler = MagicMock()
+        jobs = AdaptiveJobs(scheduler, None, store=store)
+
+        jobs.add("python_a", "a", Mock(return_value=True), [], 300, datetime.now())
+
+        next_run = scheduler.add_job.call_args[1]['next_run_time']
+        assert abs((next_run - (last_run + timedelta(seconds=300))).total_seconds()) < 1
+
+    def test_overdue_job_keeps_start_time(self, tmp_path):
+        """A job whose next run passed during downtime uses the given start time"""
+        store = StateStore(str(tmp_path / "scheduler.db"))
+        store.record_run("python_a", (datetime.now() - timedelta(hours=1)).timestamp())
+        scheduler = MagicMock()
+        start_time = datetime.now() + timedelta(seconds=5)
+
+        AdaptiveJobs(scheduler, None, store=store).add("python_a", "a", Mock(), [], 300, start_time)
+
+        assert scheduler.add_job.call_args[1]['next_run_time'] == start_time
+
+    def test_pending_confirmations_survive_restart(self, tmp_path):
+        """A usecase on the re-check lane stays there after a restart"""
+        store = StateStore(str(tmp_path / "scheduler.db"))
+        policy = AdaptiveInterval(recheck=60, maximum=300, confirmations=2)
+        jobs = AdaptiveJobs(MagicMock(), policy, store=store)
+        jobs.add("python_a", "a", Mock(return_value=False), [], 300, datetime.now())
+        jobs.run("python_a")
+        assert store.last_run("python_a") is not None
+
+        restarted = AdaptiveInterval(recheck=60, maximum=300, confirmations=2)
+        AdaptiveJobs(MagicMock(), restarted, store=store)
+
+        assert restarted.register("a", 300) == 60
+        assert restarted.record("a", False) == 60
+        assert restarted.record("a", False) == 300
+
+
+class TestCapacityPlanner:
+    """Tests for utilization and required workers"""
+
+    def test_demand_and_required_workers(self):
+        """Demand is the sum of mean duration / interval over all jobs"""
+        planner = CapacityPlanner(target=0.5)
+        planner.record("python_a", 100, 300, peak_rss=400e6)
+        planner.record("python_a", 200, 300)
+        planner.record("python_b", 60, 300, peak_rss=500e6)
+
+        result = planner.evaluate()
+
+        assert result['demand'] == pytest.approx(0.7)
+        assert result['utilization'] == pytest.approx(0.7)
+        assert result['required_workers'] == 2
+        assert result['required_memory_bytes'] == 2 * 500e6
+
+    def test_window_keeps_recent_runs(self):
+        """Only the last 'window' durations count"""
+        planner = CapacityPlanner(window=2)
+        for duration in (300, 30, 30):
+            planner.record("python_a", duration, 300)
+        assert planner.evaluate()['demand'] == pytest.approx(0.1)
+
+    def test_autoscale_within_bounds(self):
+        """Above the threshold the pool grows to the required size, capped at max_workers"""
+        dispatcher = Mock(workers=1)
+        planner = CapacityPlanner(dispatcher, target=0.5, threshold=0.8, max_workers=3, autoscale=True)
+
+        planner.record("python_a", 290, 300)
+        dispatcher.resize.assert_called_once_with(2)
+
+        dispatcher.reset_mock()
+        planner.record("python_b", 290, 300)
+        planner.record("python_c", 290, 300)
+        dispatcher.resize.assert_called_with(3)
+
+    def test_autoscale_shrinks_idle_pool(self):
+        """Far below the threshold the pool shrinks, but not below min_workers"""
+        dispatcher = Mock(workers=4)
+        planner = CapacityPlanner(dispatcher, threshold=0.8, min_workers=2, max_workers=4, autoscale=True)
+
+        planner.record("python_a", 10, 300)
+
+        dispatcher.resize.assert_called_once_with(2)
+
+    def test_no_autoscale_by_default(self):
+        dispatcher = Mock(workers=1)
+        CapacityPlanner(dispatcher).record("python_a", 600, 300)
+        dispatcher.resize.assert_not_called()
+
+    def test_jobs_report_durations(self):
+        """AdaptiveJobs feeds the duration and interval of every run to the planner"""
+        planner = Mock()
+        jobs = AdaptiveJobs(MagicMock(), None, planner=planner)
+        jobs.add("python_a", "a", Mock(return_value=True), [], 300, datetime.now())
+
+        jobs.run("python_a")
+
+        job_id, duration, interval, _ = planner.record.call_args[0]
+        assert (job_id, interval) == ("python_a", 300)
+        assert duration >= 0
+
+    def test_durations_exclude_admission_wait(self):
+        """Time a run spent deferred by admission control is not counted as demand"""
+        planner = Mock()
+        jobs = AdaptiveJobs(MagicMock(), None, planner=planner)
+        jobs.add("python_a", "a", Mock(return_value=True), [], 300, datetime.now())
+
+        with patch('scheduling.time.monotonic', side_effect=[0, 130]), \
+             patch('scheduling.admission_wait', side_effect=[5, 125]):
+            jobs.run("python_a")
+
+        assert planner.record.call_args[0][1] == 10
+
+    def test_dispatcher_resize(self):
+        """Growing starts workers, shrinking retires them"""
+        dispatcher = PriorityDispatcher(workers=1)
+        dispatcher.start()
+        try:
+            dispatcher.resize(3)
+            assert len(dispatcher._threads) == 3
+            dispatcher.resize(1)
+            deadline = time.monotonic() + 5
+            while len(dispatcher._threads) > 1 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert len(dispatcher._threads) == 1
+            done = threading.Event()
+            dispatcher.submit("python_after", "after", done.set)
+            assert done.wait(timeout=5)
+        finally:
+            dispatcher.stop()
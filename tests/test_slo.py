@@ -0,0 +1,145 @@
+"""
+Unit tests for slo.py
+"""
+import json
+
+import pytest
+
+from slo import SLO_BUDGET_REMAINING, SLO_BURN_RATE, RunCounter, SloTracker, load_slos
+
+NOW = 1_700_000_040.0
+DAY = 86400
+
+
+def load_slos_from(tmp_path, config):
+    (tmp_path / 'slo.json').write_text(json.dumps(config))
+    return load_slos(str(tmp_path / 'slo.json'))
+
+
+@pytest.fixture
+def slos(tmp_path):
+    """hidrive-next: 99% availability, 90% of successful runs under 60s"""
+    return load_slos_from(tmp_path, {'hidrive-next': {'provider': 'hidrive-next', 'availability': 0.99,
+                                                      'latency': {'seconds': 60, 'target': 0.9}}})
+
+
+class TestLoadSlos:
+    """Test parsing slo.json"""
+
+    def test_provider_and_patterns(self, tmp_path):
+        loaded = load_slos_from(tmp_path, {
+            'next': {'provider': 'hidrive-next', 'availability': 0.99},
+            'logins': {'usecases': '*_picture_test', 'latency': {'seconds': 30, 'target': 0.95}, 'window_days': 7},
+        })
+        assert loaded == [
+            {'name': 'logins', 'patterns': ['*_picture_test'], 'objectives': {'latency': 0.95}, 'latency_seconds': 30.0,
+             'window': 7 * DAY},
+            {'name': 'next', 'patterns': ['hidrive-next_*'], 'objectives': {'availability': 0.99},
+             'latency_seconds': None, 'window': 30 * DAY},
+        ]
+
+    def test_invalid_entries_are_skipped(self, tmp_path):
+        loaded = load_slos_from(tmp_path, {
+            'no-target': {'provider': 'magentacloud', 'availability': 99},
+            'no-seconds': {'provider': 'magentacloud', 'availability': 0.99, 'latency': {'target': 0.9}},
+            'no-usecases': {'availability': 0.99},
+        })
+        assert [(slo['name'], slo['objectives']) for slo in loaded] == [('no-seconds', {'availability': 0.99})]
+
+    def test_missing_or_broken_file(self, tmp_path):
+        assert load_slos(str(tmp_path / 'slo.json')) == []
+        (tmp_path / 'slo.json').write_text('{')
+        assert load_slos(str(tmp_path / 'slo.json')) == []
+
+    def test_shipped_config(self):
+        assert [slo['name'] for slo in load_slos('slo.json')] == [
+            'hidrive-legacy', 'hidrive-next', 'ionos-managed-nextcloud', 'ionos-nextcloud-workspace', 'magentacloud'
+        ]
+
+
+class TestRunCounter:
+    """Test the minute buckets with running totals"""
+
+    def test_windows(self):
+        counter = RunCounter(horizon=DAY)
+        counter.add(NOW - 7200, bad=True)
+        counter.add(NOW - 600, bad=False)
+        counter.add(NOW - 590, bad=True)
+        counter.add(NOW, bad=False)
+        assert counter.window(300, NOW) == (1, 0)
+        assert counter.window(3600, NOW) == (3, 1)
+        assert counter.window(DAY, NOW) == (4, 2)
+        assert counter.bucket(NOW - 600) == (2, 1)
+
+    def test_expire_keeps_totals(self):
+        counter = RunCounter(horizon=3600)
+        counter.add(NOW - 7200, bad=True)
+        counter.add(NOW, bad=False)
+        counter.expire(NOW)
+        assert counter.starts() == [NOW - NOW % 60]
+        assert counter.window(3600, NOW) == (1, 0)
+        assert counter.bucket(NOW) == (1, 0)
+
+    def test_out_of_order(self):
+        counter = RunCounter(horizon=DAY)
+        counter.add(NOW, bad=False)
+        counter.add(NOW - 3000, bad=True, runs=2)
+        assert counter.window(600, NOW) == (1, 0)
+        assert counter.window(3600, NOW) == (3, 2)
+
+
+class TestSloTracker:
+    """Test burn rates, budget and persistence"""
+
+    def test_burn_rates_and_budget(self, slos):
+        tracker = SloTracker(slos)
+        # 100 runs a day for 10 days, 5 of them failed a day ago
+        for i in range(1000):
+            timestamp = NOW - 10 * DAY + i * 864
+            failed = NOW - DAY - 3600 < timestamp < NOW - DAY and i % 2 == 0
+            tracker.record('hidrive-next_picture_test', not failed, 30, timestamp)
+        tracker.record('magentacloud_picture_test', False, 30, NOW)
+
+        (availability, latency) = tracker.status(NOW)
+        assert availability['runs'] == 1000 and availability['bad_runs'] == 2
+        # 2 of 1000 bad runs with 1% allowed: 20% of the budget is spent
+        assert availability['budget_remaining'] == pytest.approx(0.8)
+        assert availability['burn_rates']['1h'] == 0
+        assert availability['burn_rates']['3d'] == pytest.approx(2 / 300 / 0.01, rel=0.05)
+        assert latency['bad_runs'] == 0 and latency['runs'] == 998
+
+        tracker.export(NOW)
+        assert SLO_BUDGET_REMAINING.labels(slo='hidrive-next', objective='availability')._value.get() == \
+            pytest.approx(0.8)
+
+    def test_latency_counts_successful_runs(self, slos):
+        tracker = SloTracker(slos)
+        tracker.record('hidrive-next_document_test', True, 75, NOW)
+        tracker.record('hidrive-next_document_test', True, 45, NOW)
+        tracker.record('hidrive-next_document_test', False, 5, NOW)
+        latency = tracker.status(NOW)[1]
+        assert (latency['runs'], latency['bad_runs']) == (2, 1)
+        # Half the runs too slow with 10% allowed
+        assert latency['burn_rates']['5m'] == pytest.approx(5)
+        assert SLO_BURN_RATE.labels(slo='hidrive-next', objective='latency', window='5m')._value.get() == \
+            pytest.approx(5)
+
+    def test_buckets_roundtrip(self, slos):
+        tracker = SloTracker(slos)
+        tracker.record('hidrive-next_picture_test', False, 30, NOW - 120)
+        tracker.record('hidrive-next_picture_test', True, 90, NOW)
+        rows = tracker.buckets(changed_only=True)
+        # The failed run has no latency
+        assert [row[1:] for row in rows] == [('availability', NOW - 120, 1, 1), ('availability', NOW, 1, 0),
+                                             ('latency', NOW, 1, 1)]
+        assert tracker.buckets(changed_only=True) == []
+
+        restored = SloTracker(slos)
+        restored.restore(rows, NOW)
+        # Restoring twice doesn't count twice
+        restored.restore(rows, NOW)
+        assert restored.status(NOW) == tracker.status(NOW)
+        assert restored.buckets(changed_only=True) == []
+        # Buckets older than the SLO window are skipped
+        restored.restore([('hidrive-next', 'availability', NOW - 40 * DAY, 5, 5)], NOW)
+        assert restored.status(NOW) == tracker.status(NOW)
@@ -0,0 +1,117 @@
+"""
+Unit tests for slow_capture.py
+"""
+import json
+from unittest.mock import MagicMock
+
+from slow_capture import SlowStepDetector, StepRecorder, har_entry, parse_rate
+
+
+def request(url="https://example.com/app.js", status=200, failure=None):
+    mock = MagicMock()
+    mock.method = 'GET'
+    mock.url = url
+    mock.headers = {'accept': '*/*'}
+    mock.failure = failure
+    mock.timing = {'startTime': 1700000000000.0, 'domainLookupStart': 0, 'domainLookupEnd': 5,
+                   'connectStart': 5, 'secureConnectionStart': 10, 'connectEnd': 30,
+                   'requestStart': 31, 'responseStart': 131, 'responseEnd': 151}
+    if status:
+        mock.response.return_value.status = status
+        mock.response.return_value.status_text = 'OK'
+        mock.response.return_value.headers = {'content-type': 'text/javascript'}
+    else:
+        mock.response.return_value = None
+    return mock
+
+
+class TestSlowStepDetector:
+    """Test slow step detection, arming and the capture budget"""
+
+    def test_parse_rate(self):
+        assert parse_rate('4/3600') == (4, 3600.0)
+
+    def test_slow_step(self):
+        detector = SlowStepDetector(factor=2)
+        assert not detector.is_slow('u', '01_Step', 1.9, expected=1.0)
+        assert detector.is_slow('u', '01_Step', 2.1, expected=1.0)
+        # Not judged until the baseline expects a duration
+        assert not detector.is_slow('u', '01_Step', 100.0, expected=None)
+
+    def test_off(self):
+        detector = SlowStepDetector(factor=0)
+        assert not detector.is_slow('u', '01_Step', 100.0, expected=1.0)
+
+    def test_budget(self):
+        detector = SlowStepDetector(factor=2, rate=(2, 3600))
+        assert [detector.allow_capture('u') for _ in range(3)] == [True, True, False]
+
+    def test_armed_runs(self):
+        detector = SlowStepDetector(factor=2, armed_runs=2)
+        assert not detector.take_armed('u')
+        detector.arm('u')
+        assert [detector.take_armed('u') for _ in range(3)] == [True, True, False]
+
+
+class TestHarEntry:
+    """Test HAR entries built from Playwright requests"""
+
+    def test_timings_and_headers(self):
+        entry = har_entry(request())
+        assert entry['timings'] == {'blocked': -1, 'dns': 5, 'connect': 25, 'ssl': 20, 'send': 0,
+                                    'wait': 100, 'receive': 20}
+        assert entry['time'] == 150
+        assert entry['startedDateTime'].startswith('2023-11-14T22:13:20')
+        assert entry['request']['headers'] == [{'name': 'accept', 'value': '*/*'}]
+        assert entry['response']['content']['mimeType'] == 'text/javascript'
+
+    def test_failed_request(self):
+        failed = request(status=None, failure='net::ERR_CONNECTION_RESET')
+        failed.timing.update({'responseStart': -1, 'responseEnd': -1})
+        entry = har_entry(failed)
+        assert entry['response']['status'] == 0
+        assert entry['timings']['wait'] == -1
+        assert entry['_failure'] == 'net::ERR_CONNECTION_RESET'
+
+
+class TestStepRecorder:
+    """Test recording the steps of an armed run"""
+
+    def test_keeps_slow_steps_only(self, tmp_path):
+        page = MagicMock()
+        cdp = page.context.new_cdp_session.return_value
+        cdp.send.return_value = {'profile': {'nodes': [], 'samples': []}}
+        recorder = StepRecorder(page, tmp_path, 'usecase')
+        recorder.start()
+        page.context.tracing.start.assert_called_once_with(screenshots=True, snapshots=True)
+        finished = page.on.call_args_list[0][0][1]
+
+        recorder.begin_step('01_Fast')
+        finished(request())
+        assert recorder.end_step('01_Fast', keep=False) == []
+        page.context.tracing.stop_chunk.assert_called_with(path=None)
+        assert list(tmp_path.iterdir()) == []
+
+        recorder.begin_step('02_Slow step')
+        page.context.tracing.start_chunk.assert_called_with(title='02_Slow step')
+        finished(request())
+        paths = recorder.end_step('02_Slow step', keep=True)
+        assert [path.rsplit('.', 1)[-1] for path in paths] == ['cpuprofile', 'zip', 'har']
+        assert '02_Slow_step_slow_step_' in paths[0]
+        page.context.tracing.stop_chunk.assert_called_with(path=paths[1])
+        with open(paths[2]) as f:
+            assert len(json.load(f)['log']['entries']) == 1
+
+        recorder.stop()
+        page.context.tracing.stop.assert_called_once()
+        cdp.detach.assert_called_once()
+
+    def test_errors_are_not_raised(self, tmp_path):
+        page = MagicMock()
+        page.context.tracing.start.side_effect = RuntimeError("tracing unavailable")
+        page.context.new_cdp_session.side_effect = RuntimeError("not chromium")
+        recorder = StepRecorder(page, tmp_path / 'missing', 'usecase')
+        recorder.start()
+        recorder.begin_step('01_Step')
+        assert recorder.end_step('01_Step', keep=True) == []
+        recorder.stop()
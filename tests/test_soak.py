@@ -0,0 +1,175 @@
+"""
+Unit tests for soak.py
+"""
+import os
+import threading
+from collections import Counter
+
+import pytest
+
+from soak import (
+    COMPONENTS,
+    ResourceSampler,
+    Soak,
+    _RunWatcher,
+    analyze,
+    growth,
+    linear_slope,
+    parse_tolerances,
+)
+
+
+def samples(**series):
+    """Samples with the given component series, other components flat"""
+    count = len(next(iter(series.values())))
+    return [{'time': 1000.0 + i * 360, 'run': i + 1, 'job': 'job', 'success': True,
+             **{component: series.get(component, [10] * count)[i] for component in COMPONENTS}}
+            for i in range(count)]
+
+
+class FakeSampler:
+    def __init__(self):
+        self.values = dict.fromkeys(COMPONENTS, 0)
+        self.inventories = []
+
+    def start(self):
+        pass
+
+    def sample(self):
+        return dict(self.values)
+
+    def inventory(self):
+        inventory = {component: Counter() for component in COMPONENTS}
+        inventory['threads']['worker-N'] = len(self.inventories) + 1
+        self.inventories.append(inventory)
+        return inventory
+
+
+class TestSlope:
+    """Test the trend fit"""
+
+    def test_linear_slope(self):
+        assert linear_slope([0, 1, 2, 3], [5, 7, 9, 11]) == 2
+        assert linear_slope([0, 1, 2], [4, 4, 4]) == 0
+        assert linear_slope([0], [4]) == 0
+        assert linear_slope([1, 1], [2, 3]) == 0
+
+    def test_noise_is_not_a_leak(self):
+        """fds that go up and down around a level are within tolerance"""
+        report = analyze(samples(fds=[40, 44, 39, 43, 41, 42, 40, 44]))
+        assert report['fds']['leak'] is False
+        assert abs(report['fds']['growth']) < 8
+
+    def test_steady_growth_is_a_leak(self):
+        report = analyze(samples(processes=[2, 3, 4, 5, 6], threads=[5, 5, 5, 5, 5]))
+        assert report['processes']['leak'] is True
+        assert report['processes']['slope_per_run'] == 1
+        # Samples are 6 minutes apart
+        assert report['processes']['slope_per_hour'] == pytest.approx(10)
+        assert report['threads']['leak'] is False
+
+    def test_warmup_is_excluded(self):
+        """Growth during the warm-up (lazy imports, caches) doesn't count"""
+        report = analyze(samples(modules=[100, 300, 400, 400, 400, 401]), warmup=2)
+        assert report['modules']['samples'] == 4
+        assert report['modules']['first'] == 400
+        assert report['modules']['leak'] is False
+
+    def test_too_few_samples(self):
+        report = analyze(samples(fds=[1, 2, 3, 4]), warmup=2)
+        assert report['fds'] == {'samples': 2, 'leak': None}
+
+    def test_tolerance_override(self):
+        series = samples(fds=[10, 12, 14, 16, 18])
+        assert analyze(series)['fds']['leak'] is False
+        assert analyze(series, tolerance={'fds': 4})['fds']['leak'] is True
+
+    def test_parse_tolerances(self):
+        assert parse_tolerances(['fds=16', 'heap_bytes=1024']) == {'fds': 16.0, 'heap_bytes': 1024.0}
+        with pytest.raises(ValueError):
+            parse_tolerances(['sockets=3'])
+
+
+class TestGrowth:
+    """Test the attribution of growth to keys"""
+
+    def test_growth(self):
+        before = Counter({'socket': 4, 'pipe': 2, '/tmp': 1})
+        after = Counter({'socket': 9, 'pipe': 2, '/tmp': 0, 'anon_inode:[eventpoll]': 1})
+        assert growth(before, after) == [['socket', 5], ['anon_inode:[eventpoll]', 1]]
+        assert growth(before, after, top=1) == [['socket', 5]]
+
+
+class TestResourceSampler:
+    """Test sampling of this process"""
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="needs /proc")
+    def test_open_file_is_counted(self, tmp_path):
+        sampler = ResourceSampler()
+        before = sampler.sample()
+        with open(tmp_path / 'held.txt', 'w'):
+            after = sampler.sample()
+            kinds = sampler.inventory()['fds']
+        assert after['fds'] == before['fds'] + 1
+        assert kinds[str(tmp_path)] == 1
+
+    def test_threads_by_name(self):
+        sampler = ResourceSampler()
+        stop = threading.Event()
+        threads = [threading.Thread(target=stop.wait, name=f"leaky-{i}") for i in range(3)]
+        for thread in threads:
+            thread.start()
+        try:
+            assert sampler.inventory()['threads']['leaky-N'] == 3
+            assert sampler.sample()['threads'] >= 4
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def test_modules(self):
+        sample = ResourceSampler().sample()
+        assert sample['modules'] > 0
+        assert ResourceSampler().inventory()['modules']['soak'] == 1
+
+
+class TestSoak:
+    """Test sampling after runs"""
+
+    def test_baseline_after_warmup(self):
+        sampler = FakeSampler()
+        soak = Soak(sampler, warmup=2)
+        soak.start()
+        assert soak.baseline is None
+        for _ in range(5):
+            soak.record('python_job', True)
+            sampler.values['processes'] += 1
+        soak.record('python_job', False)
+
+        report = soak.report()
+        assert [sample['run'] for sample in report['samples']] == [1, 2, 3, 4, 5, 6]
+        assert report['failed_runs'] == 1
+        assert report['leaks'] == ['processes']
+        # Inventory after run 2 vs. the one taken for the report
+        assert report['components']['threads']['grown'] == [['worker-N', 1]]
+
+    def test_watcher_rearms(self):
+        class Jobs:
+            def __init__(self):
+                self.watched = []
+
+            def watch(self, job_id, watcher):
+                self.watched.append((job_id, watcher))
+
+        jobs = Jobs()
+        soak = Soak(FakeSampler())
+        soak.start()
+        soak.watch(jobs, ['python_a', 'python_b'])
+        assert [job_id for job_id, _ in jobs.watched] == ['python_a', 'python_b']
+
+        watcher = jobs.watched[0][1]
+        assert isinstance(watcher, _RunWatcher)
+        watcher.started()
+        watcher.finished(True)
+        assert jobs.watched[-1] == ('python_a', watcher)
+        assert soak.samples[0]['job'] == 'python_a'
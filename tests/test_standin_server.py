@@ -0,0 +1,288 @@
+"""
+Unit tests for standin_server.py
+"""
+import glob
+import os
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from playwright.sync_api import sync_playwright
+
+from runners.python_runner import PythonRunner
+from standin_server import (
+    NEW_DOCUMENT,
+    PICTURE,
+    PROVIDERS,
+    FaultInjector,
+    FileTree,
+    HiDriveLegacyStandin,
+    NextcloudStandin,
+    environment,
+    start_standin_servers,
+)
+
+TRANSACTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'transactions')
+# Set by `make test-standin`: a missing browser fails the end-to-end tests instead of skipping them
+REQUIRE_BROWSER = os.getenv('STANDIN_E2E', 'false').lower() in ('true', '1', 'yes')
+
+
+def chromium_installed():
+    try:
+        with sync_playwright() as playwright:
+            return os.path.exists(playwright.chromium.executable_path)
+    except Exception:
+        return False
+
+
+def get(app, path, **query):
+    return app.handle('GET', path, {key: [value] for key, value in query.items()}, {})
+
+
+def post(app, path, **form):
+    return app.handle('POST', path, {}, {key: [value] for key, value in form.items()})
+
+
+def location(response):
+    return dict(response[1])['Location']
+
+
+class TestFaultInjector:
+    """Test injected latency and errors"""
+
+    def test_same_seed_fails_same_requests(self):
+        """Two injectors with the same seed fail the same requests"""
+        first = FaultInjector(error_rate=0.3, seed=7)
+        second = FaultInjector(error_rate=0.3, seed=7)
+
+        pattern = [first.should_fail() for _ in range(50)]
+
+        assert pattern == [second.should_fail() for _ in range(50)]
+        assert any(pattern) and not all(pattern)
+
+    def test_delay(self):
+        """Delay is the latency plus up to 'jitter_ms' of seeded jitter"""
+        assert FaultInjector(latency_ms=250).delay() == 0.25
+        delays = [FaultInjector(latency_ms=100, jitter_ms=50, seed=1).delay() for _ in range(3)]
+        assert len(set(delays)) == 1
+        assert 0.1 <= delays[0] <= 0.15
+
+    def test_no_errors_by_default(self):
+        faults = FaultInjector()
+        assert not any(faults.should_fail() for _ in range(100))
+
+
+class TestFileTree:
+    """Test the in-memory folders"""
+
+    def test_listing_folders_first(self):
+        tree = FileTree({"b.docx": None, "Zeta": {}, "alpha": {}, "A.md": None})
+        assert tree.listing('/') == [("alpha", True), ("Zeta", True), ("A.md", False), ("b.docx", False)]
+        assert tree.listing('/missing') is None
+
+    def test_create_numbers_taken_names(self):
+        tree = FileTree({})
+        assert tree.create('/', NEW_DOCUMENT) == NEW_DOCUMENT
+        assert tree.create('/', NEW_DOCUMENT) == "Neues Dokument (2).docx"
+
+    def test_delete(self):
+        tree = FileTree({"Documents": {"a.docx": None}})
+        assert tree.delete('/Documents', "a.docx")
+        assert not tree.delete('/Documents', "a.docx")
+        assert tree.listing('/Documents') == []
+
+    def test_template_is_not_modified(self):
+        template = {"Documents": {}}
+        FileTree(template).create('/Documents', "a.docx")
+        assert template == {"Documents": {}}
+
+
+class TestNextcloudStandin:
+    """Test the Nextcloud pages and logins"""
+
+    def test_login_form(self):
+        status, _, body = get(NextcloudStandin(FaultInjector()), '/login')
+        assert status == '200 OK'
+        for attribute in (b'data-login-form-input-user', b'data-login-form-input-password', b'data-login-form-submit'):
+            assert attribute in body
+
+    def test_login_redirect_chain(self):
+        """Login passes through the configured number of hops before the files page"""
+        app = NextcloudStandin(FaultInjector(redirects=2))
+        response = post(app, '/login', user="u", password="p")
+        hops = []
+        while location(response).startswith('/hop/'):
+            url = urlsplit(location(response))
+            hops.append(url.path)
+            response = app.handle('GET', url.path, parse_qs(url.query), {})
+        assert hops == ['/hop/2', '/hop/1']
+        assert location(response) == '/apps/files/'
+
+    def test_ionos_identifier_flow(self):
+        app = NextcloudStandin(FaultInjector(), 'hidrive-next')
+        body = get(app, '/identifier')[2]
+        assert b'id="selectAll"' in body and b'id="username"' in body and b'id="button--with-loader"' in body
+        assert location(post(app, '/identifier', identifier="u")) == '/password'
+        assert b'type="password" name="password"' in get(app, '/password')[2]
+        assert location(post(app, '/password', password="p")) == '/apps/files/'
+        assert location(get(app, '/logout')) == '/identifier'
+
+    def test_magentacloud_login(self):
+        app = NextcloudStandin(FaultInjector(), 'magentacloud')
+        body = get(app, '/login')[2]
+        assert b'data-action="accept-all"' in body and b'<scale-button type="submit"' in body
+        assert location(post(app, '/login', username="u")) == '/login/password'
+        assert b'name="pw_submit"' in get(app, '/login/password')[2]
+
+    def test_files_list_rows(self):
+        """Rows 2 and 3 are folders, as the picture transactions click them by position"""
+        body = get(NextcloudStandin(FaultInjector()), '/apps/files/')[2].decode()
+        assert 'class="files-list" data-cy-files-list' in body
+        rows = body.split('<tr class="files-list__row" ')[1:]
+        assert ['folder-icon' in row for row in rows[:3]] == [True, True, True]
+        assert 'data-cy-files-list-row-name="Nextcloud intro.docx"' in rows[3]
+        assert 'data-cy-files-list-row-name-link' in rows[3]
+
+    def test_picture_path(self):
+        """Both picture folders hold one subfolder with the picture, magentacloud's nested Norway too"""
+        app = NextcloudStandin(FaultInjector())
+        for folder in ('/Photos', '/pictures'):
+            assert get(app, '/apps/files/', dir=folder)[2].count(b'folder-icon') == 1
+        for folder in ('/pictures/Norway', '/pictures/Norway/Norway'):
+            assert f'data-cy-files-list-row-name="{PICTURE}"'.encode() in get(app, '/apps/files/', dir=folder)[2]
+        body = get(app, '/apps/files/', dir='/Photos/Norway', openfile=PICTURE)[2]
+        assert b'<div class="viewer__file-wrapper"><img' in body and b'button class="header-close" aria-label="Close"' in body
+
+    def test_create_and_delete_document(self):
+        app = NextcloudStandin(FaultInjector())
+        body = get(app, '/apps/files/')[2]
+        assert b'data-cy-upload-picker-menu-entry="template-new-richdocuments-1"' in body
+        assert b'data-cy-files-new-node-dialog-submit' in body
+
+        response = post(app, '/apps/files/new', dir='/', file=NEW_DOCUMENT)
+        url = urlsplit(location(response))
+        body = app.handle('GET', url.path, parse_qs(url.query), {})[2]
+        assert b'<iframe name="collaboraframe_00001"' in body
+        assert b'data-cy-files-list-row-name="Neues Dokument.docx"' in body
+
+        assert location(post(app, '/apps/files/delete', dir='/', file=NEW_DOCUMENT)) == '/apps/files/?dir=%2F'
+        assert b'data-cy-files-list-row-name="Neues Dokument.docx"' not in get(app, '/apps/files/')[2]
+
+    def test_collabora_frame(self):
+        body = get(NextcloudStandin(FaultInjector()), '/collabora', file="a.docx", close='/apps/files/?dir=%2F')[2]
+        for marker in (b'class="leaflet-layer"', b'id="clipboard-area"', b'id="document-canvas"',
+                       b'id="closebutton" data-href="/apps/files/?dir=%2F" data-target="parent"'):
+            assert marker in body
+
+    def test_settings(self):
+        app = NextcloudStandin(FaultInjector())
+        body = get(app, '/settings/user')[2]
+        assert b'<li data-section-id="security"><a href="/settings/user/security">' in body
+        assert b'<a id="settings"' in get(app, '/apps/files/')[2]
+        assert b'<li id="settings">' in get(NextcloudStandin(FaultInjector(), 'magentacloud'), '/apps/files/')[2]
+
+        hidrive = NextcloudStandin(FaultInjector(), 'hidrive-next')
+        assert b'desktop-classic-icon' in get(hidrive, '/settings/user')[2]
+        assert b'<div id="backButton"><a class="app-navigation-entry-link"' in get(hidrive, '/settings/user/classic')[2]
+
+    def test_unknown_path(self):
+        assert get(NextcloudStandin(FaultInjector()), '/nope')[0] == '404 Not Found'
+
+
+class TestHiDriveLegacyStandin:
+    """Test the legacy HiDrive pages"""
+
+    def test_login(self):
+        app = HiDriveLegacyStandin(FaultInjector())
+        body = get(app, '/')[2]
+        assert b'data-qa="privacy_consent_approve_all"' in body and b'data-qa="login_submit"' in body
+        assert location(post(app, '/login', username="u", password="p")) == '/files'
+        assert location(get(app, '/logout')) == '/#login'
+
+    def test_picture_path(self):
+        """First tile is a folder twice, the third tile below is a thumbnail"""
+        app = HiDriveLegacyStandin(FaultInjector())
+        assert b'<tile-item><div class="itemcontent" data-delete="Bilder">' in get(app, '/files')[2]
+        assert b'data-delete="Urlaub"' in get(app, '/files', dir='/Bilder')[2].split(b'</tile-item>')[0]
+        tiles = get(app, '/files', dir='/Bilder/Urlaub')[2].split(b'<tile-item>')[1:]
+        assert b'class="thumbnail"' in tiles[2]
+        assert b'class="imageview"' in get(app, '/files', dir='/Bilder/Urlaub', view=PICTURE)[2]
+
+    def test_create_and_delete_document(self):
+        app = HiDriveLegacyStandin(FaultInjector())
+        response = post(app, '/files/new', dir='/', **{'file-name': 'Test_1'})
+        assert location(response) == '/files?dir=%2F&edit=Test_1.docx'
+        body = get(app, '/files', dir='/', edit='Test_1.docx')[2]
+        assert b'<iframe name="collabora-online-viewer"' in body and b'class="office-editor-close"' in body
+        assert b'data-qa="contextmenu_delete"' in body and b'class="confirm-overlay-ok"' in body
+
+        post(app, '/files/delete', dir='/', file='Test_1.docx')
+        assert b'Test_1.docx' not in get(app, '/files')[2]
+
+
+class TestServers:
+    """Test the servers over HTTP"""
+
+    def test_serves_all_providers(self):
+        servers = start_standin_servers(port=0)
+        try:
+            assert set(servers) == set(PROVIDERS)
+            lines = environment(servers)
+            port = servers['hidrive-next'].server_port
+            assert f"HIDRIVE_NEXT_URL=http://127.0.0.1:{port}/identifier?" in lines
+            assert "MAGENTACLOUD_USER=standin" in lines
+
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/identifier?") as response:
+                assert b'button--with-loader' in response.read()
+            # Redirects are followed to the files page
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/") as response:
+                assert response.url.endswith('/apps/files/')
+                assert b'files-list' in response.read()
+        finally:
+            for server in servers.values():
+                server.shutdown()
+                server.server_close()
+
+    def test_injected_errors_and_latency(self):
+        with patch('standin_server.time.sleep') as sleep:
+            servers = start_standin_servers(port=0, latency_ms=40, error_rate=1)
+            try:
+                port = servers['ionos-managed-nextcloud'].server_port
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/login")
+                    raise AssertionError("expected an injected error")
+                except urllib.error.HTTPError as e:
+                    assert e.code == 503
+            finally:
+                for server in servers.values():
+                    server.shutdown()
+                    server.server_close()
+        sleep.assert_any_call(0.04)
+
+
+@pytest.mark.skipif(not REQUIRE_BROWSER and not chromium_installed(),
+                    reason="Chromium is not installed (playwright install chromium)")
+class TestTransactions:
+    """Drive the real transactions end to end against the stand-in"""
+
+    @pytest.fixture(scope='class')
+    def servers(self):
+        servers = start_standin_servers(port=0)
+        yield servers
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+
+    @pytest.mark.parametrize('file_path', sorted(glob.glob(os.path.join(TRANSACTIONS_DIR, '*', '*_test.py'))),
+                             ids=lambda path: os.path.relpath(path, TRANSACTIONS_DIR))
+    def test_transaction_passes(self, servers, file_path, monkeypatch):
+        for line in environment(servers):
+            key, value = line.split('=', 1)
+            monkeypatch.setenv(key, value)
+        monkeypatch.setenv('HEADLESS', 'true')
+        provider = os.path.basename(os.path.dirname(file_path))
+        usecase = f"standin_{provider}_{os.path.basename(file_path)[:-3]}"
+
+        assert PythonRunner().run(file_path, usecase) is True
@@ -0,0 +1,139 @@
+"""
+Unit tests for step_profiler.py
+"""
+import pstats
+import threading
+import time
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+from step_profiler import (
+    PROFILES,
+    ProfileAggregate,
+    StackSampler,
+    StepProfiler,
+    collapse,
+    frame_label,
+    matches,
+    parse_patterns,
+)
+
+
+def busy_leaf(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def busy_step(seconds=0.15):
+    busy_leaf(seconds)
+
+
+@pytest.fixture(autouse=True)
+def clear_profiles():
+    PROFILES.clear()
+    yield
+    PROFILES.clear()
+
+
+class TestPatterns:
+    """Test usecase and step selection"""
+
+    def test_parse_and_match(self):
+        patterns = parse_patterns(" hidrive_* , magentacloud_document_test,")
+        assert patterns == ['hidrive_*', 'magentacloud_document_test']
+        assert matches('hidrive_next_picture_test', patterns)
+        assert matches('magentacloud_document_test', patterns)
+        assert not matches('magentacloud_picture_test', patterns)
+        assert not matches('anything', [])
+
+    def test_frame_label(self):
+        assert frame_label('/app/transactions/hidrive-next/picture_test.py', 'login_logic') == 'picture_test.py:login_logic'
+        assert ';' not in frame_label('odd;name.py', 'f')
+
+
+class TestStackSampler:
+    """Test sampling another thread's stack"""
+
+    def test_collapse(self):
+        def inner():
+            import sys
+            return collapse(sys._getframe())
+
+        stack = inner()
+        assert stack.endswith('test_step_profiler.py:test_collapse;test_step_profiler.py:inner')
+
+    def test_samples_busy_thread(self):
+        sampler = StackSampler(threading.get_ident(), 0.002)
+        sampler.start()
+        busy_step()
+        sampler.stop()
+
+        assert sum(sampler.stacks.values()) > 5
+        assert any(stack.endswith('busy_step;test_step_profiler.py:busy_leaf') for stack in sampler.stacks)
+        times = sampler.self_times()
+        assert max(times, key=times.__getitem__) == 'test_step_profiler.py:busy_leaf'
+
+
+class TestStepProfiler:
+    """Test profiling a step and its artifacts"""
+
+    def test_sample_mode(self, tmp_path):
+        with StepProfiler('hidrive_next_picture_test', '02_Cookie & Login', tmp_path, 'sample', 2) as profiler:
+            busy_step()
+
+        assert profiler.path.parent == tmp_path
+        assert profiler.path.name.startswith('hidrive_next_picture_test_02_Cookie___Login_profile_')
+        assert profiler.path.suffix == '.collapsed'
+        lines = profiler.path.read_text().splitlines()
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+        [entry] = PROFILES.top('hidrive_next_picture_test')
+        assert (entry['step'], entry['mode'], entry['runs']) == ('02_Cookie & Login', 'sample', 1)
+        assert entry['top'][0]['frame'] == 'test_step_profiler.py:busy_leaf'
+        assert 0 < entry['top'][0]['share'] <= 1.2
+
+    def test_cprofile_mode(self, tmp_path):
+        with StepProfiler('magentacloud_picture_test', '03_Open', tmp_path, 'cprofile') as profiler:
+            busy_step(0.05)
+
+        assert profiler.path.suffix == '.prof'
+        functions = {function for _, _, function in pstats.Stats(str(profiler.path)).stats}
+        assert 'busy_leaf' in functions
+        frames = [row['frame'] for row in PROFILES.top()[0]['top']]
+        assert 'test_step_profiler.py:busy_leaf' in frames
+
+    def test_failed_step_is_profiled(self, tmp_path):
+        with pytest.raises(RuntimeError):
+            with StepProfiler('usecase', '01_Step', tmp_path, 'sample', 2):
+                raise RuntimeError("step failed")
+        assert PROFILES.top()[0]['runs'] == 1
+
+    def test_profiler_errors_are_not_raised(self, tmp_path):
+        with StepProfiler('usecase', '01_Step', tmp_path / 'missing', 'sample', 2):
+            pass
+        assert PROFILES.top() == []
+
+        with patch('step_profiler.cProfile.Profile') as profile:
+            profile.return_value.enable.side_effect = ValueError("Another profiling tool is already active")
+            with StepProfiler('usecase', '01_Step', tmp_path, 'cprofile'):
+                pass
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestProfileAggregate:
+    """Test the top frames served on /profiles"""
+
+    def test_top_frames(self):
+        aggregate = ProfileAggregate()
+        aggregate.record('a', '01_Step', 'sample', Counter({'x.py:f': 0.4, 'y.py:g': 0.1}), 1.0)
+        aggregate.record('a', '01_Step', 'sample', Counter({'x.py:f': 0.2, 'z.py:h': 0.3}), 1.0)
+        aggregate.record('b', '01_Step', 'sample', Counter({'x.py:f': 1.0}), 1.0)
+
+        [entry] = aggregate.top('a', limit=2)
+        assert entry['runs'] == 2 and entry['duration'] == 2.0
+        assert entry['top'] == [{'frame': 'x.py:f', 'seconds': 0.6, 'share': 0.3},
+                                {'frame': 'z.py:h', 'seconds': 0.3, 'share': 0.15}]
+        assert [entry['usecase'] for entry in aggregate.top()] == ['a', 'b']
@@ -0,0 +1,219 @@
+"""
+Unit tests for trigger_api.py
+"""
+import json
+import os
+from datetime import datetime
+from unittest.mock import MagicMock, Mock, patch
+
+import monitor_base
+from scheduling import AdaptiveJobs, PriorityDispatcher
+from trigger_api import ADHOC_PRIORITY, RunRegistry, TriggerApp, artifacts
+
+
+def drain(dispatcher):
+    """Runs all ready dispatcher entries in the calling thread"""
+    dispatcher._stopping = True
+    dispatcher._worker()
+    dispatcher._stopping = False
+
+
+def make_jobs(func=None):
+    dispatcher = PriorityDispatcher()
+    jobs = AdaptiveJobs(MagicMock(), None, dispatcher)
+    jobs.add("python_hidrive-next_picture_test", "hidrive-next_picture_test", func or Mock(return_value=True),
+             [], 300, datetime.now(), active_windows=[(0, 1, set())])
+    jobs.add("python_hidrive-next_document_test", "hidrive-next_document_test", Mock(return_value=False),
+             [], 300, datetime.now())
+    jobs.add("python_magentacloud_picture_test", "magentacloud_picture_test", Mock(return_value=True),
+             [], 300, datetime.now())
+    return jobs, dispatcher
+
+
+class TestRunRegistry:
+    """Test on-demand runs"""
+
+    def test_usecase_run_ignores_active_windows(self):
+        """An on-demand run executes even outside the job's active windows"""
+        func = Mock(return_value=True)
+        jobs, dispatcher = make_jobs(func)
+        runs = RunRegistry(jobs)
+
+        run = runs.trigger(usecase="hidrive-next_picture_test")
+        assert run['status'] == 'queued'
+        assert dispatcher._heap[0][0] == ADHOC_PRIORITY
+
+        drain(dispatcher)
+
+        func.assert_called_once()
+        result = runs.describe(run['run_id'])
+        assert result['status'] == 'success'
+        assert result['jobs'][0]['timings'] == {'hidrive-next_picture_test': {}}
+
+    def test_provider_run(self):
+        """A provider run covers all its usecases and fails if one of them fails"""
+        jobs, dispatcher = make_jobs()
+        runs = RunRegistry(jobs)
+
+        run = runs.trigger(provider="hidrive-next")
+        assert len(run['jobs']) == 2
+        drain(dispatcher)
+
+        assert runs.describe(run['run_id'])['status'] == 'failed'
+        assert runs.list()[0]['run_id'] == run['run_id']
+
+    def test_deduplicates_queued_run(self):
+        """A job that is already queued is promoted instead of queued twice"""
+        func = Mock(return_value=True)
+        jobs, dispatcher = make_jobs()
+        dispatcher.submit("python_magentacloud_picture_test", "magentacloud_picture_test", func, priority=8)
+        runs = RunRegistry(jobs)
+
+        run = runs.trigger(usecase="magentacloud_picture_test")
+
+        assert run['jobs'][0]['deduplicated']
+        assert len(dispatcher._heap) == 1
+        assert dispatcher._heap[0][0] == ADHOC_PRIORITY
+        assert "python_magentacloud_picture_test" in jobs._forced
+
+    def test_deduplicates_running_run(self):
+        """A request while the job runs follows that run"""
+        jobs, dispatcher = make_jobs()
+        runs = RunRegistry(jobs)
+        dispatcher._running.add("python_magentacloud_picture_test")
+        jobs._active["python_magentacloud_picture_test"] = []
+
+        run = runs.trigger(usecase="magentacloud_picture_test")
+
+        assert run['jobs'][0]['deduplicated']
+        assert run['status'] == 'running'
+        assert not dispatcher._heap
+        # The next scheduled run is not on demand and keeps its active windows
+        assert "python_magentacloud_picture_test" not in jobs._forced
+
+    def test_timings_of_the_run(self):
+        """Timings come from the monitors of the watched run, not from the shared gauges"""
+        def run_monitor():
+            monitor = MagicMock(usecase_name="magentacloud_picture_test",
+                                step_timings=[("01_Start", 1.5, True), ("02_Login", 2.0, False)])
+            for observer in list(monitor_base._run_observers):
+                observer(monitor)
+            other = MagicMock(usecase_name="hidrive-next_picture_test", step_timings=[("01_Start", 9.0, True)])
+            for observer in list(monitor_base._run_observers):
+                observer(other)
+            return False
+
+        jobs, dispatcher = make_jobs()
+        jobs._jobs["python_magentacloud_picture_test"]['func'] = run_monitor
+        runs = RunRegistry(jobs)
+        observers = len(monitor_base._run_observers)
+
+        run = runs.trigger(usecase="magentacloud_picture_test")
+        drain(dispatcher)
+
+        job = runs.describe(run['run_id'])['jobs'][0]
+        assert job['timings'] == {'magentacloud_picture_test': {'01_Start': 1.5, '02_Login': 2.0}}
+        assert len(monitor_base._run_observers) == observers
+
+    def test_unknown_target(self):
+        jobs, _ = make_jobs()
+        assert RunRegistry(jobs).trigger(usecase="nope") is None
+
+
+class TestTriggerApp:
+    """Test the HTTP layer"""
+
+    def test_post_and_poll(self):
+        jobs, _ = make_jobs()
+        app = TriggerApp(RunRegistry(jobs))
+
+        status, body = app.handle('POST', '/runs', {'usecase': ['magentacloud_picture_test']})
+        assert status == '202 Accepted'
+        status, polled = app.handle('GET', f"/runs/{body['run_id']}", {})
+        assert status == '200 OK'
+        assert polled['run_id'] == body['run_id']
+
+    def test_errors(self):
+        jobs, _ = make_jobs()
+        app = TriggerApp(RunRegistry(jobs))
+
+        assert app.handle('POST', '/runs', {})[0] == '400 Bad Request'
+        assert app.handle('POST', '/runs', {'provider': ['unknown']})[0] == '404 Not Found'
+        assert app.handle('GET', '/runs/missing', {})[0] == '404 Not Found'
+        assert app.handle('DELETE', '/runs', {})[0] == '405 Method Not Allowed'
+
+    def test_token_required(self):
+        jobs, _ = make_jobs()
+        app = TriggerApp(RunRegistry(jobs), token="secret")
+
+        assert app.handle('POST', '/runs', {'provider': ['magentacloud']})[0] == '401 Unauthorized'
+        assert app.handle('POST', '/runs', {'provider': ['magentacloud']}, 'Bearer secret')[0] == '202 Accepted'
+
+    def test_wsgi_routes(self):
+        """/runs returns JSON, other paths are served by the Prometheus exporter"""
+        jobs, _ = make_jobs()
+        app = TriggerApp(RunRegistry(jobs))
+        start_response = Mock()
+
+        body = b''.join(app({'PATH_INFO': '/runs', 'REQUEST_METHOD': 'GET'}, start_response))
+        assert json.loads(body) == []
+        assert start_response.call_args[0][0] == '200 OK'
+
+        body = b''.join(app({'PATH_INFO': '/metrics', 'REQUEST_METHOD': 'GET', 'QUERY_STRING': ''},
+                            start_response))
+        assert b'transaction_duration_seconds' in body
+
+    def test_profiles(self):
+        """GET /profiles serves the aggregated top frames"""
+        jobs, _ = make_jobs()
+        app = TriggerApp(RunRegistry(jobs))
+        start_response = Mock()
+        top = [{'usecase': 'magentacloud_picture_test', 'step': '02_Login', 'top': []}]
+
+        with patch('trigger_api.PROFILES') as profiles:
+            profiles.top.return_value = top
+            body = b''.join(app({'PATH_INFO': '/profiles', 'REQUEST_METHOD': 'GET',
+                                 'QUERY_STRING': 'usecase=magentacloud_picture_test&limit=5'}, start_response))
+            assert json.loads(body) == top
+            profiles.top.assert_called_once_with('magentacloud_picture_test', 5)
+            assert app.handle('GET', '/profiles', {'limit': ['many']})[0] == '400 Bad Request'
+
+    def test_slos(self):
+        """GET /slos serves the SLO status, optionally of one SLO"""
+        jobs, _ = make_jobs()
+        app = TriggerApp(RunRegistry(jobs))
+        status = [{'slo': 'hidrive-next', 'objective': 'availability'}, {'slo': 'magentacloud', 'objective': 'latency'}]
+
+        with patch('trigger_api.SLO_TRACKER') as tracker:
+            tracker.status.return_value = status
+            assert app.handle('GET', '/slos', {}) == ('200 OK', status)
+            assert app.handle('GET', '/slos', {'slo': ['magentacloud']}) == ('200 OK', status[1:])
+
+
+class TestArtifacts:
+    """Test artifact lookup for finished runs"""
+
+    def test_artifacts_since_run_start(self, tmp_path):
+        """Only files of the usecase written after the run started are listed"""
+        old = tmp_path / "uc_01_Login_step_failure_20260101_120000.png"
+        old.write_text("x")
+        os.utime(old, (1000, 1000))
+        new = tmp_path / "uc_01_Login_step_failure_20260101_130000.png"
+        new.write_text("x")
+        (tmp_path / "other_01_Login_step_failure_20260101_130000.png").write_text("x")
+
+        assert artifacts("uc", ["01_Login"], 2000, str(tmp_path)) == [str(new)]
+
+    def test_artifacts_match_exact_usecase(self, tmp_path):
+        """Files of the warm variant or a longer usecase name are not listed"""
+        names = ["uc_02_Cookie___Login_step_failure_20260101_130000_error.txt",
+                 "uc_02_Cookie___Login_slow_step_20260101_130000.trace.zip",
+                 "uc_warm_02_Cookie___Login_step_failure_20260101_130000.png",
+                 "uc_2_02_Cookie___Login_step_failure_20260101_130000.png",
+                 "uc_02_Cookie___Login_notes.txt"]
+        for name in names:
+            (tmp_path / name).write_text("x")
+
+        found = artifacts("uc", ["01_Start", "02_Cookie & Login"], 0, str(tmp_path))
+
+        assert found == [str(tmp_path / name) for name in sorted(names[:2])]
@@ -6,6 +6,9 @@ from datetime import datetime
 logger = logging.getLogger(__name__)
 
 class HiDriveLegacyDocumentTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("06_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "hidrive_legacy_document_test"
         # Read headless setting from environment (default: True for Docker)
@@ -49,8 +52,7 @@ class HiDriveLegacyDocumentTest(MonitorBase):
             self.page.click('[data-qa="login_submit"]')
             
             # Wait for login to complete
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            self.page.wait_for_selector('.file-item-icon', timeout=30000)
+            self.wait_for_selector('.file-item-icon', timeout=30000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -86,9 +88,9 @@ class HiDriveLegacyDocumentTest(MonitorBase):
             # Close the editor
             self.page.locator('.office-editor-close').click(timeout=30000)
             
-            # Wait for document list to appear and network to be idle
-            self.page.wait_for_selector('tile-item', timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            # The editor is gone once back on the document list
+            self.wait_for_selector('iframe[name="collabora-online-viewer"]', state="detached", timeout=30000)
+            self.wait_for_selector('tile-item', timeout=30000)
 
         self.measure_step("04_Close document", close_document)
 
@@ -107,8 +109,8 @@ class HiDriveLegacyDocumentTest(MonitorBase):
             # Confirm deletion using class (language-independent)
             self.page.locator('button.confirm-overlay-ok').click(timeout=30000)
             
-            # Wait for deletion to complete
-            self.page.wait_for_timeout(1000)
+            # Deleted once its tile is gone
+            self.wait_for_selector(f'tile-item:has-text("{document_name}")', state="detached", timeout=30000)
 
         self.measure_step("05_Delete document", delete_document)
 
@@ -116,7 +118,7 @@ class HiDriveLegacyDocumentTest(MonitorBase):
         def logout_logic():
             # Click logout link
             self.page.locator('a[href="#logout"]').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_selector('[data-qa="login_submit"]', timeout=30000)
 
         self.measure_step("06_Logout", logout_logic)
 
@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class HiDriveLegacyPictureTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("04_Close and Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "hidrive_legacy_picture_test"
         # Read headless setting from environment (default: True for Docker)
@@ -44,7 +47,7 @@ class HiDriveLegacyPictureTest(MonitorBase):
             self.page.click('[data-qa="login_submit"]')
             
             # Wait for file list
-            self.page.wait_for_selector('.file-item-icon', timeout=30000)
+            self.wait_for_selector('.file-item-icon', timeout=30000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -52,20 +55,17 @@ class HiDriveLegacyPictureTest(MonitorBase):
         def browse_logic():
             # First folder - use .first to select the first matching element
             self.page.locator('.file-item-icon > svg > path').first.click()
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_network_quiet(timeout=30000)
             
             # Second folder - again use .first after navigation
             self.page.locator('.file-item-icon > svg > path').first.click()
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_network_quiet(timeout=30000)
             
             # Open picture (3rd item)
             self.page.locator('tile-item:nth-child(3) > .itemcontent > .file-item-icon > .thumbnail').click()
             
-            # Wait for image to load (wait for viewer to be ready)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            
-            # Verify image viewer is open and image is loaded
-            self.page.wait_for_selector('.imageview', timeout=30000)
+            # Verify image viewer is open
+            self.wait_for_selector('.imageview', timeout=30000)
 
         self.measure_step("03_Browse and open picture", browse_logic)
 
@@ -76,7 +76,7 @@ class HiDriveLegacyPictureTest(MonitorBase):
             
             # Logout
             self.page.locator('a[href="#logout"]').click()
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_selector('[data-qa="login_submit"]', timeout=30000)
 
         self.measure_step("04_Close and Logout", logout_logic)
 
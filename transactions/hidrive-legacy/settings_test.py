@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class HiDriveLegacySettingsTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("05_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "hidrive_legacy_settings_test"
         # Read headless setting from environment (default: True for Docker)
@@ -44,8 +47,7 @@ class HiDriveLegacySettingsTest(MonitorBase):
             self.page.click('[data-qa="login_submit"]')
             
             # Wait for login to complete
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            self.page.wait_for_selector('.file-item-icon', timeout=30000)
+            self.wait_for_selector('.file-item-icon', timeout=30000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -53,7 +55,7 @@ class HiDriveLegacySettingsTest(MonitorBase):
         def navigate_to_settings():
             # Click on Settings link using the correct selector
             self.page.locator('li.sj-navigation-item[data-name="settings.account"] a').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_network_quiet(timeout=30000)
 
         self.measure_step("03_Navigate to Settings", navigate_to_settings)
 
@@ -61,7 +63,7 @@ class HiDriveLegacySettingsTest(MonitorBase):
         def navigate_to_private():
             # Click on Personal/Private link using the correct selector
             self.page.locator('li.sj-navigation-item[data-name="my.files"] a').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_selector('.file-item-icon', timeout=30000)
 
         self.measure_step("04_Navigate to Private", navigate_to_private)
 
@@ -69,7 +71,7 @@ class HiDriveLegacySettingsTest(MonitorBase):
         def logout_logic():
             # Logout
             self.page.locator('a[href="#logout"]').click()
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_selector('[data-qa="login_submit"]', timeout=30000)
 
         self.measure_step("05_Logout", logout_logic)
 
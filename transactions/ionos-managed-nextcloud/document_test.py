@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class IonosManagedNextcloudDocumentTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Login")
+    logout_steps = ("06_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "ionos_managed_nextcloud_document_test"
         # Read headless setting from environment (default: True for Docker)
@@ -29,11 +32,8 @@ class IonosManagedNextcloudDocumentTest(MonitorBase):
             self.page.locator('input[data-login-form-input-password]').fill(password, timeout=30000)
             self.page.locator('button[data-login-form-submit]').click(timeout=30000)
             
-            # Wait for dashboard to load completely
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            self.page.wait_for_selector(".files-list", timeout=30000)
-            # Ensure UI is fully interactive before proceeding
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            # Wait for dashboard to load (the next clicks wait for their elements to be actionable)
+            self.wait_for_selector(".files-list", timeout=30000)
 
         self.measure_step("02_Login", login_logic)
 
@@ -70,21 +70,25 @@ class IonosManagedNextcloudDocumentTest(MonitorBase):
             iframe_locator = self.page.frame_locator('iframe[name^="collaboraframe"]')
             iframe_locator.locator('#closebutton').click(timeout=30000)
             
-            # Wait for return to file list
-            self.page.wait_for_selector('.files-list', timeout=30000)
+            # The editor is gone once back on the file list
+            self.wait_for_selector('iframe[name^="collaboraframe"]', state="detached", timeout=30000)
+            self.wait_for_selector('.files-list', timeout=30000)
 
         self.measure_step("04_Close document", close_document_logic)
 
         # Step 5: Delete document
         def delete_document_logic():
+            document_rows = 'tr[data-cy-files-list-row]:has-text("Neues")'
+            remaining = self.page.locator(document_rows).count() - 1
+
             # Click actions menu for the document (language-independent)
-            self.page.locator('tr[data-cy-files-list-row]:has-text("Neues") button.action-item__menutoggle').first.click(timeout=30000)
+            self.page.locator(f'{document_rows} button.action-item__menutoggle').first.click(timeout=30000)
             
             # Click delete using data-cy (language-independent)
             self.page.locator('[data-cy-files-list-row-action="delete"]').click(timeout=30000)
             
-            # Wait for deletion to complete
-            self.page.wait_for_timeout(1000)
+            # Deleted once the list has one such row less (older test documents may be left over)
+            self.wait_for_selector(f'{document_rows} >> nth={remaining}', state="detached", timeout=30000)
 
         self.measure_step("05_Delete document", delete_document_logic)
 
@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class IonosManagedNextcloudPictureTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("04_Close and Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "ionos_managed_nextcloud_picture_test"
         # Read headless setting from environment (default: True for Docker)
@@ -30,8 +33,7 @@ class IonosManagedNextcloudPictureTest(MonitorBase):
             self.page.locator('button[data-login-form-submit]').click(timeout=30000)
             
             # Wait for dashboard to load
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            self.page.wait_for_selector(".files-list", timeout=30000)
+            self.wait_for_selector(".files-list", timeout=30000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -39,18 +41,17 @@ class IonosManagedNextcloudPictureTest(MonitorBase):
         def browse_logic():
             # Click folder 'pictures'
             self.page.locator('tr:nth-child(3) > .files-list__row-name > .files-list__row-icon > .material-design-icon > .material-design-icon__svg > path').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            # Its listing shows the 'norway' folder; the folder icon below would also match the previous listing
+            self.wait_for_selector('tr[data-cy-files-list-row-name="norway" i]', timeout=30000)
             
-            # Click folder 'norway'
+            # Click folder 'norway' (the picture row clicked next waits for its listing)
             self.page.locator('.material-design-icon.folder-icon > .material-design-icon__svg > path').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
             # Open picture - click on the row name to avoid canvas overlay issues
             self.page.locator('tr[data-cy-files-list-row-name="abhishek-umrao-qsvNYg6iMGk-unsplash.jpg"] .files-list__row-name-text').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
             # Verify image viewer is open and image is loaded
-            self.page.wait_for_selector('.viewer__file-wrapper img.loaded', timeout=30000)
+            self.wait_for_selector('.viewer__file-wrapper img.loaded', timeout=30000)
 
         self.measure_step("03_Browse and open picture", browse_logic)
 
@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class IonosManagedNextcloudSettingsTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("05_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "ionos_managed_nextcloud_settings_test"
         # Read headless setting from environment (default: True for Docker)
@@ -29,9 +32,8 @@ class IonosManagedNextcloudSettingsTest(MonitorBase):
             self.page.locator('input[data-login-form-input-password]').fill(password, timeout=30000)
             self.page.locator('button[data-login-form-submit]').click(timeout=30000)
             
-            # Wait for dashboard to load (increased timeout for networkidle due to background requests)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            self.page.wait_for_selector(".files-list", timeout=30000)
+            # Wait for dashboard to load
+            self.wait_for_selector(".files-list", timeout=30000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -42,11 +44,10 @@ class IonosManagedNextcloudSettingsTest(MonitorBase):
             
             # Navigate to Personal Settings using ID (language-independent)
             self.page.locator('a#settings').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
             # Navigate to Security - use href to distinguish between user and admin security (language-independent)
             self.page.locator('li[data-section-id="security"] a[href*="/settings/user/security"]').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_url("**/settings/user/security", timeout=30000)
         
         self.measure_step("03_Navigate to Settings & Security", navigate_to_settings_and_security)
 
@@ -54,7 +55,7 @@ class IonosManagedNextcloudSettingsTest(MonitorBase):
         def go_back_to_files():
             # Go back to files using ID (language-independent)
             self.page.locator('a#nextcloud').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_selector(".files-list", timeout=30000)
         
         self.measure_step("04_Go back to files", go_back_to_files)
 
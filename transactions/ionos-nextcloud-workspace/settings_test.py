@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class IonosNextcloudWorkspaceSettingsTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("05_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "ionos_nextcloud_workspace_settings_test"
         # Read headless setting from environment (default: True for Docker)
@@ -30,8 +33,7 @@ class IonosNextcloudWorkspaceSettingsTest(MonitorBase):
             self.page.locator('button[data-login-form-submit]').click(timeout=30000)
             
             # Wait for dashboard to load
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            self.page.wait_for_selector(".files-list", timeout=30000)
+            self.wait_for_selector(".files-list", timeout=30000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -42,11 +44,10 @@ class IonosNextcloudWorkspaceSettingsTest(MonitorBase):
             
             # Navigate to Settings using ID (language-independent)
             self.page.locator('a#settings').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
             # Navigate to Security using data-section-id (language-independent)
             self.page.locator('li[data-section-id="security"] a').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_url("**/settings/user/security", timeout=30000)
         
         self.measure_step("03_Navigate to Settings & Security", navigate_to_settings_and_security)
 
@@ -54,7 +55,7 @@ class IonosNextcloudWorkspaceSettingsTest(MonitorBase):
         def go_back_to_files():
             # Use ID (language-independent)
             self.page.locator('a#nextcloud').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_selector(".files-list", timeout=30000)
         
         self.measure_step("04_Go back to files", go_back_to_files)
 
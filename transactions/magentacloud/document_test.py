@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class MagentaCloudDocumentTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("06_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "magentacloud_document_test"
         headless = os.getenv('HEADLESS', 'true').lower() in ('true', '1', 'yes')
@@ -44,16 +47,18 @@ class MagentaCloudDocumentTest(MonitorBase):
             # Submit password (scale-button)
             self.page.locator('scale-button[type="submit"], scale-button[name="pw_submit"]').first.click(timeout=30000)
 
-            # Wait for navigation after password submit
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            # After the password: the files list, or the OIDC error page / 2FA setup prompt in between
+            files_list = '.files-list, [data-cy-files-list]'
+            later_selector = 'scale-button[variant="secondary"]:has-text("Später"), scale-button:has-text("Später")'
+            self.wait_for_selector(f'{files_list}, .guest-box:has-text("Zugriff verboten"), {later_selector}', timeout=30000)
             
             # Check for OIDC error and retry if needed
             try:
                 error_box = self.page.locator('.guest-box:has-text("Zugriff verboten")')
-                if error_box.is_visible(timeout=2000):
+                if error_box.is_visible():
                     logger.warning("OIDC error detected, clicking 'Zurück zu MagentaCLOUD' to retry")
                     self.page.locator('a.button.primary[href="/"]').click(timeout=10000)
-                    self.page.wait_for_load_state("networkidle", timeout=30000)
+                    self.wait_for_selector(f'{files_list}, {later_selector}', timeout=30000)
             except Exception:
                 pass
             
@@ -63,21 +68,19 @@ class MagentaCloudDocumentTest(MonitorBase):
                 logger.warning("2FA setup page detected, clicking 'Später' to skip")
                 try:
                     # Click "Später" button (scale-button with variant="secondary")
-                    later_button = self.page.locator('scale-button[variant="secondary"]:has-text("Später"), scale-button:has-text("Später")')
-                    later_button.first.click(timeout=10000)
-                    self.page.wait_for_load_state("networkidle", timeout=30000)
+                    self.page.locator(later_selector).first.click(timeout=10000)
                 except Exception as e:
                     logger.error(f"Could not click 'Später' button: {e}")
                     raise
             
             # Wait for files list with multiple possible selectors
             try:
-                self.page.wait_for_selector('.files-list', timeout=30000)
+                self.wait_for_selector('.files-list', timeout=30000)
             except Exception as e:
                 # Try alternative selector or log current URL for debugging
                 logger.error(f"Files list not found. Current URL: {self.page.url}")
                 # Try waiting for the file list wrapper
-                self.page.wait_for_selector('[data-cy-files-list]', timeout=10000)
+                self.wait_for_selector('[data-cy-files-list]', timeout=10000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -113,21 +116,25 @@ class MagentaCloudDocumentTest(MonitorBase):
             iframe_locator = self.page.frame_locator('iframe[name^="collaboraframe"]')
             iframe_locator.locator('button#closebutton').click(timeout=30000)
             
-            # Wait for return to file list
-            self.page.wait_for_selector('.files-list', timeout=30000)
+            # The editor is gone once back on the file list
+            self.wait_for_selector('iframe[name^="collaboraframe"]', state="detached", timeout=30000)
+            self.wait_for_selector('.files-list', timeout=30000)
 
         self.measure_step("04_Close document", close_document_logic)
 
         # Step 5: Delete document
         def delete_document_logic():
+            document_rows = 'tr[data-cy-files-list-row]:has-text("Neues")'
+            remaining = self.page.locator(document_rows).count() - 1
+
             # Click actions menu for the document (language-independent)
-            self.page.locator('tr[data-cy-files-list-row]:has-text("Neues") button.action-item__menutoggle').first.click(timeout=30000)
+            self.page.locator(f'{document_rows} button.action-item__menutoggle').first.click(timeout=30000)
             
             # Click delete using data-cy (language-independent)
             self.page.locator('[data-cy-files-list-row-action="delete"]').click(timeout=30000)
             
-            # Wait for deletion to complete
-            self.page.wait_for_timeout(1000)
+            # Deleted once the list has one such row less (older test documents may be left over)
+            self.wait_for_selector(f'{document_rows} >> nth={remaining}', state="detached", timeout=30000)
 
         self.measure_step("05_Delete document", delete_document_logic)
 
@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class MagentaCloudPictureTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("04_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "magentacloud_picture_test"
         headless = os.getenv('HEADLESS', 'true').lower() in ('true', '1', 'yes')
@@ -44,16 +47,18 @@ class MagentaCloudPictureTest(MonitorBase):
             # Submit password (scale-button)
             self.page.locator('scale-button[type="submit"], scale-button[name="pw_submit"]').first.click(timeout=30000)
 
-            # Wait for navigation after password submit
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            # After the password: the files list, or the OIDC error page / 2FA setup prompt in between
+            files_list = '.files-list, [data-cy-files-list]'
+            later_selector = 'scale-button[variant="secondary"]:has-text("Später"), scale-button:has-text("Später")'
+            self.wait_for_selector(f'{files_list}, .guest-box:has-text("Zugriff verboten"), {later_selector}', timeout=30000)
             
             # Check for OIDC error and retry if needed
             try:
                 error_box = self.page.locator('.guest-box:has-text("Zugriff verboten")')
-                if error_box.is_visible(timeout=2000):
+                if error_box.is_visible():
                     logger.warning("OIDC error detected, clicking 'Zurück zu MagentaCLOUD' to retry")
                     self.page.locator('a.button.primary[href="/"]').click(timeout=10000)
-                    self.page.wait_for_load_state("networkidle", timeout=30000)
+                    self.wait_for_selector(f'{files_list}, {later_selector}', timeout=30000)
             except Exception:
                 pass
             
@@ -63,21 +68,19 @@ class MagentaCloudPictureTest(MonitorBase):
                 logger.warning("2FA setup page detected, clicking 'Später' to skip")
                 try:
                     # Click "Später" button (scale-button with variant="secondary")
-                    later_button = self.page.locator('scale-button[variant="secondary"]:has-text("Später"), scale-button:has-text("Später")')
-                    later_button.first.click(timeout=10000)
-                    self.page.wait_for_load_state("networkidle", timeout=30000)
+                    self.page.locator(later_selector).first.click(timeout=10000)
                 except Exception as e:
                     logger.error(f"Could not click 'Später' button: {e}")
                     raise
             
             # Wait for files list with multiple possible selectors
             try:
-                self.page.wait_for_selector('.files-list', timeout=30000)
+                self.wait_for_selector('.files-list', timeout=30000)
             except Exception as e:
                 # Try alternative selector or log current URL for debugging
                 logger.error(f"Files list not found. Current URL: {self.page.url}")
                 # Try waiting for the file list wrapper
-                self.page.wait_for_selector('[data-cy-files-list]', timeout=10000)
+                self.wait_for_selector('[data-cy-files-list]', timeout=10000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -85,19 +88,16 @@ class MagentaCloudPictureTest(MonitorBase):
         def browse_logic():
             # Click folder 'pictures' - click on the text/name directly
             self.page.locator('tr[data-cy-files-list-row-name="pictures"] .files-list__row-name-text').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
-            # Click folder 'Norway' - click on the text/name directly
+            # Click folder 'Norway' - click on the text/name directly (each click waits for its row)
             self.page.locator('tr[data-cy-files-list-row-name="Norway"] .files-list__row-name-text').click(timeout=30000)
             self.page.locator('tr[data-cy-files-list-row-name="Norway"] .files-list__row-name-text').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
-            # Open picture - click on the text/name directly
+            # Open picture - click on the text/name directly (waits for the row in the 'Norway' listing)
             self.page.locator('tr[data-cy-files-list-row-name="abhishek-umrao-qsvNYg6iMGk-unsplash.jpg"] .files-list__row-name-text').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
             # Verify image viewer is open and image is loaded
-            self.page.wait_for_selector('.viewer__file-wrapper img.loaded', timeout=30000)
+            self.wait_for_selector('.viewer__file-wrapper img.loaded', timeout=30000)
 
         self.measure_step("03_Browse and open picture", browse_logic)
 
@@ -5,6 +5,9 @@ import os
 logger = logging.getLogger(__name__)
 
 class MagentaCloudSettingsTest(MonitorBase):
+    login_steps = ("01_Go to start URL", "02_Cookie & Login")
+    logout_steps = ("05_Logout",)
+
     def __init__(self, usecase_name: str = None) -> None:
         name = usecase_name or "magentacloud_settings_test"
         headless = os.getenv('HEADLESS', 'true').lower() in ('true', '1', 'yes')
@@ -44,16 +47,18 @@ class MagentaCloudSettingsTest(MonitorBase):
             # Submit password (scale-button)
             self.page.locator('scale-button[type="submit"], scale-button[name="pw_submit"]').first.click(timeout=30000)
 
-            # Wait for navigation after password submit
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            # After the password: the files list, or the OIDC error page / 2FA setup prompt in between
+            files_list = '.files-list, [data-cy-files-list]'
+            later_selector = 'scale-button[variant="secondary"]:has-text("Später"), scale-button:has-text("Später")'
+            self.wait_for_selector(f'{files_list}, .guest-box:has-text("Zugriff verboten"), {later_selector}', timeout=30000)
             
             # Check for OIDC error and handle gracefully
             try:
                 error_box = self.page.locator('.guest-box:has-text("Zugriff verboten")')
-                if error_box.is_visible(timeout=2000):
+                if error_box.is_visible():
                     logger.warning("OIDC error detected: Zugriff verboten. Klicke 'Zurück zu MagentaCLOUD' und fahre fort.")
                     self.page.locator('a.button.primary[href="/"]').click(timeout=10000)
-                    self.page.wait_for_load_state("networkidle", timeout=30000)
+                    self.wait_for_selector(f'{files_list}, {later_selector}', timeout=30000)
             except Exception:
                 pass
             
@@ -63,21 +68,19 @@ class MagentaCloudSettingsTest(MonitorBase):
                 logger.warning("2FA setup page detected, clicking 'Später' to skip")
                 try:
                     # Click "Später" button (scale-button with variant="secondary")
-                    later_button = self.page.locator('scale-button[variant="secondary"]:has-text("Später"), scale-button:has-text("Später")')
-                    later_button.first.click(timeout=10000)
-                    self.page.wait_for_load_state("networkidle", timeout=30000)
+                    self.page.locator(later_selector).first.click(timeout=10000)
                 except Exception as e:
                     logger.error(f"Could not click 'Später' button: {e}")
                     raise
             
             # Wait for files list with multiple possible selectors
             try:
-                self.page.wait_for_selector('.files-list', timeout=30000)
+                self.wait_for_selector('.files-list', timeout=30000)
             except Exception as e:
                 # Try alternative selector or log current URL for debugging
                 logger.error(f"Files list not found. Current URL: {self.page.url}")
                 # Try waiting for the file list wrapper
-                self.page.wait_for_selector('[data-cy-files-list]', timeout=10000)
+                self.wait_for_selector('[data-cy-files-list]', timeout=10000)
 
         self.measure_step("02_Cookie & Login", login_logic)
 
@@ -85,15 +88,14 @@ class MagentaCloudSettingsTest(MonitorBase):
         def navigate_to_settings_and_security():
             # Open user menu
             self.page.locator('#user-menu button.header-menu__trigger').click(timeout=30000)
-            self.page.wait_for_timeout(500)
+            self.wait_for_selector('li#settings a', timeout=30000)
             
             # Click on Settings link (the <a> inside the <li id="settings">)
             self.page.locator('li#settings a').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
             
             # Navigate to Security using data-section-id (language-independent)
             self.page.locator('li[data-section-id="sessions"] a').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
+            self.wait_for_url("**/settings/user/sessions", timeout=30000)
         
         self.measure_step("03_Navigate to Settings & Security", navigate_to_settings_and_security)
 
@@ -101,8 +103,7 @@ class MagentaCloudSettingsTest(MonitorBase):
         def go_back_to_files():
             # Click on "Dateien" link in app menu
             self.page.locator('a[href="/apps/files/"]').click(timeout=30000)
-            self.page.wait_for_load_state("networkidle", timeout=30000)
-            self.page.wait_for_selector('.files-list', timeout=30000)
+            self.wait_for_selector('.files-list', timeout=30000)
         
         self.measure_step("04_Go back to files", go_back_to_files)
 
@@ -0,0 +1,227 @@
+"""
+HTTP API on the metrics port for on-demand runs during incidents:
+
+    POST /runs?usecase=<usecase>    queue a run of one usecase
+    POST /runs?provider=<provider>  queue runs of all usecases of a provider directory
+    GET  /runs                      recent on-demand runs
+    GET  /runs/<run_id>             status, step timings and artifacts of one run
+    GET  /profiles?usecase=<usecase> top frames of the profiled steps (PROFILE_USECASES)
+    GET  /slos?slo=<name>           SLI, burn rates and remaining error budget (slo.json)
+
+Every other path is served by the Prometheus exporter (/metrics).
+"""
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from prometheus_client import REGISTRY, make_wsgi_app
+from prometheus_client.exposition import ThreadingWSGIServer
+from prometheus_client.registry import CollectorRegistry
+
+from monitor_base import SLO_TRACKER, MonitorBase, add_run_observer, remove_run_observer
+from scheduling import AdaptiveJobs
+from step_profiler import PROFILES
+
+logger = logging.getLogger(__name__)
+
+# Priority of on-demand runs (lower = more urgent, scheduled runs default to 5)
+ADHOC_PRIORITY = 0
+# Number of finished on-demand runs kept for polling
+MAX_RUNS = 100
+
+
+def artifacts(usecase: str, steps: Iterable[str], since: float, directory: str = 'screenshots') -> list[str]:
+    """
+    Screenshots, error stacks and captures written for the steps of the usecase since
+    'since'. Names are matched exactly (<usecase>_<step>_<kind>_<timestamp>), so the
+    files of the usecase's warm variant or of longer usecase names are not picked up.
+    """
+    safe_steps = ["".join(c if c.isalnum() or c in ('-', '_') else '_' for c in step) for step in steps]
+    if not safe_steps:
+        return []
+    pattern = re.compile(rf"{re.escape(usecase)}_(?:{'|'.join(map(re.escape, safe_steps))})"
+                         r"_[a-z_]+_\d{8}_\d{6}(?:_error\.txt|\.[a-z.]+)")
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    found = []
+    for name in sorted(names):
+        path = os.path.join(directory, name)
+        try:
+            if pattern.fullmatch(name) and os.path.getmtime(path) >= since:
+                found.append(path)
+        except OSError:
+            continue
+    return found
+
+
+class JobWatch:
+    """Follows one job of an on-demand run (see AdaptiveJobs.watch)"""
+
+    def __init__(self, job_id: str, usecases: list[str]) -> None:
+        self.job_id = job_id
+        self.usecases = usecases
+        self.status = 'queued'
+        self.deduplicated = False
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        # Step durations of this run per usecase, taken from the finished monitors
+        self.timings: dict[str, dict[str, float]] = {}
+
+    def started(self) -> None:
+        self.status = 'running'
+        self.started_at = time.time()
+        add_run_observer(self._record)
+
+    def _record(self, monitor: MonitorBase) -> None:
+        if monitor.usecase_name in self.usecases:
+            self.timings[monitor.usecase_name] = {step: duration for step, duration, _ in monitor.step_timings}
+
+    def finished(self, success: bool) -> None:
+        remove_run_observer(self._record)
+        self.status = 'success' if success else 'failed'
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict[str, Any]:
+        result: dict[str, Any] = {
+            'job_id': self.job_id,
+            'status': self.status,
+            'deduplicated': self.deduplicated,
+            'started': self.started_at,
+            'finished': self.finished_at,
+        }
+        if self.finished_at is not None:
+            since = self.started_at or self.finished_at
+            result['timings'] = {usecase: self.timings.get(usecase, {}) for usecase in self.usecases}
+            result['artifacts'] = [path for usecase in self.usecases
+                                   for path in artifacts(usecase, result['timings'][usecase], since)]
+        return result
+
+
+class RunRegistry:
+    """Creates on-demand runs on AdaptiveJobs and keeps them for polling"""
+
+    def __init__(self, jobs: AdaptiveJobs) -> None:
+        self.jobs = jobs
+        self._lock = threading.Lock()
+        self._runs: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    def trigger(self, usecase: str | None = None, provider: str | None = None) -> dict[str, Any] | None:
+        """Queues the matching jobs at top priority; None if nothing matches"""
+        job_ids = self.jobs.find_jobs(usecase=usecase, provider=provider)
+        if not job_ids:
+            return None
+        run: dict[str, Any] = {
+            'run_id': uuid.uuid4().hex[:12],
+            'target': {'usecase': usecase} if usecase else {'provider': provider},
+            'created': time.time(),
+            'watches': [],
+        }
+        for job_id in job_ids:
+            watch = JobWatch(job_id, self.jobs.usecases(job_id))
+            watch.deduplicated = not self.jobs.run_now(job_id, watch, priority=ADHOC_PRIORITY)
+            run['watches'].append(watch)
+        with self._lock:
+            self._runs[run['run_id']] = run
+            while len(self._runs) > MAX_RUNS:
+                self._runs.popitem(last=False)
+        logger.info(f"On-demand run {run['run_id']} queued for {', '.join(job_ids)}")
+        return self.describe(run['run_id'])
+
+    def describe(self, run_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            run = self._runs.get(run_id)
+        if run is None:
+            return None
+        jobs = [watch.to_dict() for watch in run['watches']]
+        statuses = {job['status'] for job in jobs}
+        if statuses <= {'success', 'failed'}:
+            status = 'failed' if 'failed' in statuses else 'success'
+        else:
+            status = 'running' if statuses & {'running', 'success', 'failed'} else 'queued'
+        return {'run_id': run_id, 'target': run['target'], 'created': run['created'],
+                'status': status, 'jobs': jobs}
+
+    def list(self) -> list[dict[str, Any]]:
+        with self._lock:
+            run_ids = list(self._runs)
+        return [description for description in (self.describe(run_id) for run_id in reversed(run_ids))
+                if description]
+
+
+class TriggerApp:
+    """WSGI app: /runs, /profiles and /slos API, everything else is passed to the Prometheus exporter"""
+
+    def __init__(self, runs: RunRegistry, registry: CollectorRegistry = REGISTRY,
+                 token: str | None = None) -> None:
+        self.runs = runs
+        self.token = token
+        self.metrics_app = make_wsgi_app(registry)
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        path = environ.get('PATH_INFO', '')
+        if path not in ('/runs', '/profiles', '/slos') and not path.startswith('/runs/'):
+            response: Iterable[bytes] = self.metrics_app(environ, start_response)
+            return response
+        status, body = self.handle(environ.get('REQUEST_METHOD', 'GET'), path,
+                                   parse_qs(environ.get('QUERY_STRING', '')),
+                                   environ.get('HTTP_AUTHORIZATION', ''))
+        payload = json.dumps(body).encode('utf-8')
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(payload)))])
+        return [payload]
+
+    def handle(self, method: str, path: str, query: dict[str, list[str]],
+               authorization: str = '') -> tuple[str, Any]:
+        if method == 'POST' and path == '/runs':
+            if self.token and not hmac.compare_digest(authorization, f"Bearer {self.token}"):
+                return '401 Unauthorized', {'error': 'missing or invalid token'}
+            usecase = query.get('usecase', [None])[0]
+            provider = query.get('provider', [None])[0]
+            if not usecase and not provider:
+                return '400 Bad Request', {'error': 'usecase or provider is required'}
+            run = self.runs.trigger(usecase=usecase, provider=provider)
+            if run is None:
+                return '404 Not Found', {'error': f"no job for {usecase or provider}"}
+            return '202 Accepted', run
+        if method == 'GET' and path == '/runs':
+            return '200 OK', self.runs.list()
+        if method == 'GET' and path.startswith('/runs/'):
+            run = self.runs.describe(path[len('/runs/'):])
+            if run is None:
+                return '404 Not Found', {'error': 'unknown run id'}
+            return '200 OK', run
+        if method == 'GET' and path == '/profiles':
+            try:
+                limit = int(query.get('limit', ['20'])[0])
+            except ValueError:
+                return '400 Bad Request', {'error': 'limit must be a number'}
+            return '200 OK', PROFILES.top(query.get('usecase', [None])[0], limit)
+        if method == 'GET' and path == '/slos':
+            name = query.get('slo', [None])[0]
+            return '200 OK', [entry for entry in SLO_TRACKER.status() if not name or entry['slo'] == name]
+        return '405 Method Not Allowed', {'error': f"{method} not supported on {path}"}
+
+
+class _SilentHandler(WSGIRequestHandler):
+    """Keeps Prometheus scrapes out of the logs"""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_api_server(port: int, app: TriggerApp, addr: str = '0.0.0.0') -> None:
+    """Serves the app in a daemon thread, replaces prometheus_client.start_http_server()"""
+    server = make_server(addr, port, app, ThreadingWSGIServer, handler_class=_SilentHandler)
+    thread = threading.Thread(target=server.serve_forever, name="trigger-api", daemon=True)
+    thread.start()